@@ -1,18 +1,260 @@
 
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data.db")
 
-# For SQLite in multithreaded FastAPI
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+IS_POSTGRES = DATABASE_URL.startswith(("postgresql", "postgres://"))
+# :memory: / empty path: SQLAlchemy picks a single-connection pool, keep it
+_SQLITE_MEMORY = IS_SQLITE and (":memory:" in DATABASE_URL or DATABASE_URL.rstrip("/") in ("sqlite:", "sqlite+pysqlite:"))
+
+# --- SQLite: applied to every new connection -----------------------------
+# WAL: readers no longer wait for an admin write (and the write not for them)
+SQLITE_WAL = os.getenv("DB_SQLITE_WAL", "1") != "0"
+# NORMAL is safe with WAL (a power loss can only drop the last commits)
+SQLITE_SYNCHRONOUS = os.getenv("DB_SQLITE_SYNCHRONOUS", "NORMAL").upper()
+SQLITE_CACHE_MB = int(os.getenv("DB_SQLITE_CACHE_MB", "32"))
+SQLITE_MMAP_MB = int(os.getenv("DB_SQLITE_MMAP_MB", "128"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("DB_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# --- Pool (Postgres and file SQLite) ---------------------------------------
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Checks a connection before handing it out (Render Postgres drops idle ones); off for SQLite
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1" if IS_POSTGRES else "0") != "0"
+
+# Compiled SQL kept per engine (SQLAlchemy default 500) and prepared
+# statements kept per DB connection by the driver
+DB_QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", "1000"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+
+_SQLITE_SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+class PoolMetrics:
+    """Checkout counts and time spent getting a pooled connection (waiting for a free one or opening a new one)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.connects = 0
+        self.timeouts = 0
+        self.invalidated = 0
+        self.wait_total_s = 0.0
+        self.wait_max_s = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total_s += seconds
+            if seconds > self.wait_max_s:
+                self.wait_max_s = seconds
+
+    def snapshot(self, pool) -> Dict[str, Any]:
+        out = {
+            "checkouts": self.checkouts,
+            "connects": self.connects,
+            "timeouts": self.timeouts,
+            "invalidated": self.invalidated,
+            "wait_total_ms": round(self.wait_total_s * 1000, 3),
+            "wait_avg_ms": round(self.wait_total_s * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+            "wait_max_ms": round(self.wait_max_s * 1000, 3),
+            "pool": type(pool).__name__,
+        }
+        if isinstance(pool, QueuePool):
+            out.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                idle=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+                max_overflow=pool._max_overflow,
+            )
+        return out
+
+
+class _TimedGetMixin:
+    # _do_get is where QueuePool blocks when every connection is in use.
+    # It can call itself again (overflow races), so only the outer call is timed.
+    metrics: PoolMetrics
+    _depth = threading.local()
+
+    def _do_get(self):
+        depth = getattr(self._depth, "n", 0)
+        if depth:
+            return super()._do_get()
+        self._depth.n = 1
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            self._depth.n = 0
+            self.metrics.record_wait(time.perf_counter() - started)
+
+
+class InstrumentedQueuePool(_TimedGetMixin, QueuePool):
+    metrics = PoolMetrics()
+
+
+class InstrumentedAsyncQueuePool(_TimedGetMixin, AsyncAdaptedQueuePool):
+    metrics = PoolMetrics()
+
+
+def _engine_options(async_driver: bool) -> Dict[str, Any]:
+    options: Dict[str, Any] = {"query_cache_size": DB_QUERY_CACHE_SIZE}
+    connect_args: Dict[str, Any] = {}
+    if IS_SQLITE:
+        # For SQLite in multithreaded FastAPI
+        connect_args["check_same_thread"] = False
+        if not async_driver:
+            connect_args["cached_statements"] = DB_STATEMENT_CACHE_SIZE
+    elif async_driver and IS_POSTGRES:
+        connect_args["prepared_statement_cache_size"] = DB_STATEMENT_CACHE_SIZE  # asyncpg
+    if not _SQLITE_MEMORY:
+        options.update(
+            poolclass=InstrumentedAsyncQueuePool if async_driver else InstrumentedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+        )
+    options["connect_args"] = connect_args
+    return options
+
+
+def _apply_sqlite_pragmas(dbapi_conn, _record) -> None:
+    cur = dbapi_conn.cursor()
+    try:
+        if SQLITE_WAL and not _SQLITE_MEMORY:
+            cur.execute("PRAGMA journal_mode=WAL")
+        if SQLITE_SYNCHRONOUS in _SQLITE_SYNCHRONOUS_MODES:
+            cur.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cur.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}")  # negative = KiB
+        cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}")
+        cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cur.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cur.close()
+
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args, future=True)
+def _instrument(sync_engine, metrics: PoolMetrics) -> None:
+    if IS_SQLITE:
+        event.listen(sync_engine, "connect", _apply_sqlite_pragmas)
+
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_conn, record):
+        metrics.connects += 1
+
+    @event.listens_for(sync_engine, "invalidate")
+    def _on_invalidate(dbapi_conn, record, exception):
+        # pre-ping found a dead connection, or the driver reported a disconnect
+        metrics.invalidated += 1
+
+
+engine = create_engine(DATABASE_URL, future=True, **_engine_options(async_driver=False))
+_instrument(engine, InstrumentedQueuePool.metrics)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
 
+
+def _async_url(url: str) -> str:
+    # Same database through an asyncio driver (aiosqlite / asyncpg)
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+# Async engine for the hot read paths (/, /result, /label.pdf, search)
+async_engine = create_async_engine(_async_url(DATABASE_URL), **_engine_options(async_driver=True))
+_instrument(async_engine.sync_engine, InstrumentedAsyncQueuePool.metrics)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
+def pool_stats() -> Dict[str, Any]:
+    return {
+        "dialect": engine.dialect.name,
+        "sync": InstrumentedQueuePool.metrics.snapshot(engine.pool),
+        "async": InstrumentedAsyncQueuePool.metrics.snapshot(async_engine.sync_engine.pool),
+    }
+
+
+def sqlite_settings() -> Dict[str, Any]:
+    """Pragmas as SQLite reports them on a pooled connection (empty for Postgres)."""
+    if not IS_SQLITE:
+        return {}
+    names = ["journal_mode", "synchronous", "cache_size", "mmap_size", "busy_timeout", "temp_store"]
+    with engine.connect() as conn:
+        return {name: conn.exec_driver_sql(f"PRAGMA {name}").scalar() for name in names}
+
 Base = declarative_base()
 
 def init_db():
     from . import models  # noqa
+    from .services.fulltext import ensure_search_index
+
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    ensure_search_index(engine)
+
+    with SessionLocal() as db:
+        _backfill_sort_keys(db, models)
+
+
+def _add_missing_columns():
+    # create_all() never alters existing tables, so columns added to a model
+    # after the DB was created are added here (plus their indexes).
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in existing:
+                    continue
+                col_type = col.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {col.name} {col_type}'))
+
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            # Own transaction each: a unique index can fail on existing duplicates
+            try:
+                with engine.begin() as conn:
+                    index.create(conn, checkfirst=True)
+            except SQLAlchemyError as e:
+                print(f"⚠️ 인덱스 {index.name} 생성 실패 (중복 데이터 정리 필요): {e.__class__.__name__}")
+
+
+def has_unique_index(table_name: str, index_name: str) -> bool:
+    """Whether the unique index exists (_add_missing_columns skips it when the table holds duplicates)."""
+    try:
+        indexes = inspect(engine).get_indexes(table_name)
+    except SQLAlchemyError:
+        return False
+    return any(ix["name"] == index_name and ix.get("unique") for ix in indexes)
+
+
+def _backfill_sort_keys(db, models):
+    Ingredient = models.Ingredient
+    missing = db.query(Ingredient).filter((Ingredient.sort_key == None) | (Ingredient.sort_key == "")).all()  # noqa: E711
+    if not missing:
+        return
+    for ing in missing:
+        ing.sort_key = models.make_sort_key(ing.display_name)
+    db.commit()
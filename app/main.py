@@ -1,6 +1,10 @@
 
 import os
 import re
+import json
+import hashlib
+import threading
+import time
 
 from datetime import datetime
 from typing import List, Optional, Dict, Any
@@ -10,20 +14,48 @@ load_dotenv()
 
 
 
-from fastapi import FastAPI, Request, Depends, Form, HTTPException
+from fastapi import BackgroundTasks, FastAPI, Request, Depends, Form, HTTPException
 from fastapi import Response
-from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.sessions import SessionMiddleware
 
-from .db import SessionLocal, init_db
-from .models import Ingredient
+from .db import SessionLocal, AsyncSessionLocal, async_engine, engine, init_db, pool_stats, sqlite_settings
+from .models import ImpactReport, Ingredient, Recipe, make_sort_key
 from .auth import require_admin, verify_admin_password
-from .schemas import IngredientIn
-from .services.calc import compute_totals
-from .services.pdf import build_label_pdf
-from sqlalchemy import case, func
+from .schemas import OptimizeIn, ProfilingIn, RecipeIn
+from .services import calc
+from .services.calc import compute_totals, compute_totals_batch
+from .services.pdf import preload_fonts
+from .services.export import EXPORT_FORMATS, parquet_available
+from .services.label_cache import label_cache, label_cache_key
+from .services.label_batch import (
+    LabelRenderBusy, batch_window, label_pool_busy, merge_labels_pdf, render_label_async, shutdown_label_pool,
+    stream_labels_zip,
+)
+from .services.catalog import (
+    Catalog, get_catalog, get_catalog_async, get_nutrient_matrix, mark_catalog_changed, catalog_stats,
+    invalidate_catalog, read_ingredient_changes,
+)
+from .services.search import get_search_index
+from .services.fulltext import search_page
+from .services.recipe_store import MAX_INGREDIENT_ID, empty_recipe, recipe_store
+from .services.recipes import (
+    apply_ingredient_change, ingredient_values, recipe_totals, recompute_all_recipes, save_recipe,
+    substitution_impact,
+)
+from .services.similar import get_similarity_index
+from .services.impact import enqueue_impact_analysis, impact_report_out, run_impact_job, run_pending_impact_jobs
+from .services.metrics import (
+    METRICS_ENABLED, METRICS_TOKEN, TimingMiddleware, instrument_queries, profiler, render_metrics, span,
+)
+from .services.optimizer import OptimizeError, Target, optimize_recipe, optimizer_available
+from .services.compression import CompressionMiddleware, choose_encoding, etag_matches
+from .services.snapshot import get_catalog_snapshot
+from .services.assets import StaticAssets
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
 
 BRAND_NAME = os.getenv("BRAND_NAME", "영양성분 계산기")
 
@@ -32,13 +64,46 @@ BRAND_NAME = os.getenv("BRAND_NAME", "영양성분 계산기")
 app = FastAPI(title=BRAND_NAME)
 
 app.add_middleware(SessionMiddleware, secret_key=os.getenv("SESSION_SECRET", "change-me-please"))
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+# 텍스트 응답 gzip(brotli 설치 시 br) 압축. 정적 파일은 미리 압축해 둔 것을 그대로 보냄
+app.add_middleware(CompressionMiddleware)
+# 가장 바깥 미들웨어: 요청별 단계 시간(Server-Timing), /metrics 히스토그램, 샘플링 프로파일
+app.add_middleware(TimingMiddleware)
+if METRICS_ENABLED:
+    instrument_queries(engine)
+    instrument_queries(async_engine.sync_engine)
+# 템플릿에서는 static_url('style.css') → /static/style.<내용 해시>.css (1년 캐시)
+static_assets = StaticAssets(directory="app/static")
+app.mount("/static", static_assets, name="static")
 templates = Jinja2Templates(directory="app/templates")
+templates.env.globals["static_url"] = static_assets.url
+
+
+def _warm_up():
+    # 무거운 모듈(reportlab, numpy)과 원재료 캐시·검색 인덱스는 요청 경로에서 처음 쓰일 때 로드되는데,
+    # 서버가 포트를 열고 난 뒤 백그라운드에서 미리 채워 첫 요청이 그 비용을 내지 않게 한다.
+    try:
+        preload_fonts()
+        with SessionLocal() as db:
+            catalog = get_catalog(db)
+            get_nutrient_matrix(catalog)
+            get_search_index(catalog)
+            recipe_store.prune(db)
+        # 워커가 멈춰 실행되지 못한 표시값 변화 분석
+        run_pending_impact_jobs()
+    except Exception as e:
+        print(f"[warm-up] 건너뜀: {e}")
 
 
 @app.on_event("startup")
 def _startup():
     init_db()
+    if os.getenv("STARTUP_WARM_UP", "1") != "0":
+        threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+
+
+@app.on_event("shutdown")
+def _shutdown():
+    shutdown_label_pool()
 
 
 def get_db():
@@ -49,66 +114,183 @@ def get_db():
         db.close()
 
 
-def _get_recipe_session(request: Request) -> Dict[str, Any]:
-    if "recipe" not in request.session:
-        request.session["recipe"] = {
-            "recipe_name": "",
-            "unit_weight_g": 0.0,
-            "items": []  # list of {"ingredient_id": int, "amount_g": float}
-        }
-    return request.session["recipe"]
+async def get_async_db():
+    # Only connects if the catalog cache actually needs to check/reload
+    async with AsyncSessionLocal() as adb:
+        yield adb
 
 
-import re
+async def _load_recipe(request: Request, adb) -> Dict[str, Any]:
+    # 쿠키에는 레시피 id만 있고 내용은 서버 저장소(recipe_drafts)에 있음
+    legacy = request.session.get("recipe")
+    if legacy is not None:
+        # 이전 버전 쿠키(레시피 전체 저장): 다음 저장 때 서버 저장소로 옮겨짐
+        return legacy
+    with span("recipe"):
+        recipe = await recipe_store.get_async(adb, request.session.get("recipe_id"))
+    return recipe or empty_recipe()  # items: list of {"ingredient_id": int, "amount_g": float}
 
-@app.get("/", response_class=HTMLResponse)
-def recipe_form(request: Request, db=Depends(get_db)):
-    recipe = _get_recipe_session(request)
 
-    # DB에서 전부 가져온 뒤, Python에서 정렬(로컬/배포 동일 결과)
-    ingredients = db.query(Ingredient).all()
+def _hydrate_items(recipe: Dict[str, Any], catalog: Catalog) -> List[Dict[str, Any]]:
+    hydrated = []
+    for it in recipe.get("items", []):
+        ing = catalog.get(it["ingredient_id"])
+        if ing:
+            hydrated.append({"ingredient": ing, "amount_g": it["amount_g"]})
+    return hydrated
+
+
+_site_version: Optional[str] = None
+
 
-    def sort_name(display_name: str) -> str:
-        s = (display_name or "").strip()
-        # '이눌린|OO' 같은 형태면 앞부분만 정렬 기준으로 사용
-        if "|" in s:
-            s = s.split("|", 1)[0].strip()
-        return s
+def _page_etag(page: str, recipe: Dict[str, Any], catalog_version: int) -> str:
+    # 페이지 내용을 결정하는 값만 해시: 레시피, 원재료 카탈로그 버전, 템플릿/정적 파일, 반올림 설정/계산 방식
+    global _site_version
+    if _site_version is None:
+        digest = hashlib.sha256()
+        for directory in ("app/templates", "app/static"):
+            for root, _, files in sorted(os.walk(directory)):
+                for filename in sorted(files):
+                    with open(os.path.join(root, filename), "rb") as f:
+                        digest.update(filename.encode("utf-8") + f.read())
+        _site_version = digest.hexdigest()
+    payload = [
+        page, _site_version, catalog_version, BRAND_NAME,
+        [calc.ROUND_KCAL, calc.ROUND_MG, calc.ROUND_G, calc.CALC_MODE, calc.CALC_ROUNDING],
+        recipe.get("recipe_name") or "", recipe.get("unit_weight_g") or 0.0,
+        [[it["ingredient_id"], it["amount_g"]] for it in recipe.get("items", [])],
+    ]
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    # 약한 ETag: 압축 여부와 관계없이 같은 내용이면 같은 값
+    return f'W/"{hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]}"'
 
-    def strip_leading_symbols(s: str) -> str:
-        # 공백/기호가 앞에 있으면 정렬을 망치니 제거
-        return re.sub(r"^[^0-9A-Za-z가-힣]+", "", s)
 
-    def is_english_start(s: str) -> bool:
-        return bool(s) and s[0].isascii() and s[0].isalpha()
+def _page_cache_headers(etag: str) -> Dict[str, str]:
+    # 세션(쿠키)마다 내용이 다르므로 브라우저에만 저장하고 매번 ETag로 확인
+    return {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Cookie"}
 
-    def key(ing: Ingredient):
-        s = strip_leading_symbols(sort_name(ing.display_name))
 
-        # 그룹: 영문 먼저(0), 그 외(한글 포함) 다음(1)
-        group = 0 if is_english_start(s) else 1
+@app.get("/", response_class=HTMLResponse)
+async def recipe_form(request: Request, adb=Depends(get_async_db)):
+    recipe = await _load_recipe(request, adb)
+
+    # 원재료 목록 전체 대신, 저장된 행의 이름/메모만 채워서 렌더링 (검색은 /api/ingredients/search)
+    with span("catalog"):
+        catalog = await get_catalog_async(adb)
+    etag = _page_etag("recipe", recipe, catalog.version)
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=_page_cache_headers(etag))
+    items = []
+    for it in recipe.get("items", []):
+        ing = catalog.get(it["ingredient_id"])
+        items.append({
+            "ingredient_id": it["ingredient_id"],
+            "amount_g": it["amount_g"],
+            "ingredient_name": ing.display_name if ing else "",
+            "memo": ing.memo if ing else "",
+        })
 
-        # 영문은 A-Z(대소문자 무시)
-        primary = s.lower() if group == 0 else s
+    with span("render"):
+        return templates.TemplateResponse(
+            "recipe.html",
+            {
+                "request": request,
+                "recipe": recipe,
+                "items": items,
+                "brand_name": BRAND_NAME,
+            },
+            headers=_page_cache_headers(etag),
+        )
+
+
+# /api/ingredients/search 검색 방식: memory(워커별 메모리 색인, 기본) / db(관리자 목록과 같은 전문 검색 인덱스)
+INGREDIENT_SEARCH_BACKEND = os.getenv("INGREDIENT_SEARCH_BACKEND", "memory")
+
+
+@app.get("/api/ingredients/search")
+async def ingredient_search(q: str = "", limit: int = 20, adb=Depends(get_async_db)):
+    limit = max(1, min(limit, 50))
+    if INGREDIENT_SEARCH_BACKEND == "db":
+        if not q.strip():
+            return {"q": q, "items": []}
+        page = await adb.run_sync(lambda db: search_page(db, q=q.strip(), limit=limit, with_total=False))
+        results = page.items
+    else:
+        with span("catalog"):
+            catalog = await get_catalog_async(adb)
+        # 색인 생성(10만 건 기준 수 초)·패치는 이벤트 루프 밖에서
+        index = await run_in_threadpool(get_search_index, catalog)
+        with span("search"):
+            results = index.search(q, limit=limit)
+    return {
+        "q": q,
+        "items": [
+            {"id": ing.id, "display_name": ing.display_name, "memo": ing.memo}
+            for ing in results
+        ],
+    }
 
-        # tie-breaker 포함
-        return (group, primary, s)
 
-    ingredients.sort(key=key)
+@app.get("/api/ingredients/changes")
+async def ingredient_changes(since: Optional[int] = None, limit: int = 1000, adb=Depends(get_async_db)):
+    """
+    원재료 변경분 동기화: since(마지막으로 받은 next) 이후 변경만 반환.
+    since 없이 처음 요청하거나 reset=true면 전체 목록(/admin/ingredients/export 등)을 다시 받은 뒤 next부터 이어서 요청.
+    """
+    return await adb.run_sync(lambda db: read_ingredient_changes(db, since, limit))
+
+
+@app.get("/api/catalog/snapshot")
+async def catalog_snapshot(request: Request, adb=Depends(get_async_db)):
+    """
+    브라우저 계산용 원재료 카탈로그 스냅샷 (app/services/snapshot.py 바이너리 형식, gzip).
+    카탈로그 버전마다 한 번 만들고, 바뀌지 않았으면 ETag로 304
+    """
+    with span("catalog"):
+        catalog = await get_catalog_async(adb)
+        snapshot = await run_in_threadpool(get_catalog_snapshot, catalog)
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""), ("gzip",)) or "identity"
+    etag = f'"{snapshot.digest}-{encoding}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, no-cache",
+        "Vary": "Accept-Encoding",
+        "X-Catalog-Version": str(snapshot.version),
+    }
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(snapshot.bodies[encoding], media_type="application/octet-stream", headers=headers)
 
-    return templates.TemplateResponse(
-        "recipe.html",
-        {
-            "request": request,
-            "recipe": recipe,
-            "ingredients": ingredients,
-            "brand_name": BRAND_NAME,
-        },
-    )
 
 @app.head("/")
 def head_root():
     return Response(status_code=200)
+
+
+@app.get("/healthz")
+async def healthz():
+    # 로드밸런서/모니터링용: DB 왕복 시간 + 커넥션 풀 대기 현황
+    started = time.perf_counter()
+    try:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    except Exception as e:
+        return Response(
+            json.dumps({"status": "error", "error": e.__class__.__name__}),
+            status_code=503,
+            media_type="application/json",
+        )
+    stats = pool_stats()
+    return {
+        "status": "ok",
+        "db_ms": round((time.perf_counter() - started) * 1000, 3),
+        "pool": {
+            name: {k: stats[name].get(k) for k in ("checked_out", "overflow", "wait_avg_ms", "wait_max_ms", "timeouts")}
+            for name in ("sync", "async")
+        },
+    }
     
 @app.post("/recipe/save")
 def recipe_save(
@@ -117,6 +299,7 @@ def recipe_save(
     unit_weight_g: float = Form(0.0),
     ingredient_id: List[int] = Form([]),
     amount_g: List[float] = Form([]),
+    db=Depends(get_db),
 ):
     if len(ingredient_id) != len(amount_g):
         raise HTTPException(status_code=400, detail="ingredient_id and amount_g length mismatch")
@@ -127,71 +310,272 @@ def recipe_save(
             amt_val = float(amt)
         except Exception:
             amt_val = 0.0
-        if iid and amt_val and amt_val > 0:
+        if 0 < iid <= MAX_INGREDIENT_ID and amt_val and amt_val > 0:
             items.append({"ingredient_id": int(iid), "amount_g": float(amt_val)})
 
-    request.session["recipe"] = {
-        "recipe_name": recipe_name.strip(),
-        "unit_weight_g": float(unit_weight_g or 0.0),
-        "items": items,
-    }
+    request.session.pop("recipe", None)
+    request.session["recipe_id"] = recipe_store.save(
+        db,
+        {
+            "recipe_name": recipe_name.strip(),
+            "unit_weight_g": float(unit_weight_g or 0.0),
+            "items": items,
+        },
+        replaces=request.session.get("recipe_id"),
+    )
     return RedirectResponse(url="/result", status_code=303)
 
 
 @app.post("/recipe/reset")
-def recipe_reset(request: Request):
+def recipe_reset(request: Request, db=Depends(get_db)):
     request.session.pop("recipe", None)
+    recipe_store.delete(db, request.session.pop("recipe_id", None))
     return RedirectResponse(url="/", status_code=303)
 
 
 @app.get("/result", response_class=HTMLResponse)
-def result_page(request: Request, db=Depends(get_db)):
-    recipe = _get_recipe_session(request)
+async def result_page(request: Request, adb=Depends(get_async_db)):
+    recipe = await _load_recipe(request, adb)
+    with span("catalog"):
+        catalog = await get_catalog_async(adb)
+    etag = _page_etag("result", recipe, catalog.version)
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=_page_cache_headers(etag))
     # Hydrate items with ingredient data
-    ing_map = {i.id: i for i in db.query(Ingredient).all()}
-    hydrated = []
-    for it in recipe.get("items", []):
-        ing = ing_map.get(it["ingredient_id"])
-        if ing:
-            hydrated.append({"ingredient": ing, "amount_g": it["amount_g"]})
+    hydrated = _hydrate_items(recipe, catalog)
+
+    with span("calc"):
+        totals = compute_totals(hydrated, unit_weight_g=recipe.get("unit_weight_g", 0.0))
+    with span("render"):
+        return templates.TemplateResponse(
+            "result.html",
+            {
+                "request": request,
+                "recipe": recipe,
+                "items": hydrated,
+                "totals": totals,
+                "brand_name": BRAND_NAME,
+            },
+            headers=_page_cache_headers(etag),
+        )
 
-    totals = compute_totals(hydrated, unit_weight_g=recipe.get("unit_weight_g", 0.0))
-    return templates.TemplateResponse(
-        "result.html",
-        {
-            "request": request,
-            "recipe": recipe,
-            "items": hydrated,
-            "totals": totals,
-            "brand_name": BRAND_NAME,
-        },
+
+@app.get("/label.pdf")
+async def label_pdf(request: Request, adb=Depends(get_async_db)):
+    recipe = await _load_recipe(request, adb)
+    with span("catalog"):
+        hydrated = _hydrate_items(recipe, await get_catalog_async(adb))
+    return await _label_response(
+        request, recipe, hydrated,
+        lambda: compute_totals(hydrated, unit_weight_g=recipe.get("unit_weight_g", 0.0)),
     )
 
 
-@app.get("/label.pdf")
-def label_pdf(request: Request, db=Depends(get_db)):
-    recipe = _get_recipe_session(request)
-    ing_map = {i.id: i for i in db.query(Ingredient).all()}
-    hydrated = []
-    for it in recipe.get("items", []):
-        ing = ing_map.get(it["ingredient_id"])
-        if ing:
-            hydrated.append({"ingredient": ing, "amount_g": it["amount_g"]})
+def _label_busy() -> HTTPException:
+    # 라벨 워커 풀이 가득 찼을 때: 대기열에 쌓지 않고 바로 503
+    return HTTPException(
+        status_code=503,
+        detail="PDF 생성 요청이 많습니다. 잠시 후 다시 시도해 주세요.",
+        headers={"Retry-After": "2"},
+    )
+
 
-    totals = compute_totals(hydrated, unit_weight_g=recipe.get("unit_weight_g", 0.0))
-    pdf_bytes = build_label_pdf(
-        recipe_name=recipe.get("recipe_name") or "레시피",
-        unit_weight_g=float(recipe.get("unit_weight_g") or 0.0),
-        totals=totals,
-        items=hydrated,
-        generated_at=datetime.now(),
+async def _label_response(request: Request, recipe: Dict[str, Any], hydrated: List[Dict[str, Any]], get_totals) -> Response:
+    # get_totals: 캐시에 없을 때만 호출
+    now = datetime.now()
+    key = label_cache_key(recipe, hydrated, now.date())
+    etag = f'"{key}"'
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=cache_headers)
+
+    pdf_bytes = label_cache.get(key)
+    if pdf_bytes is None:
+        with span("calc"):
+            totals = get_totals()
+        job = {
+            "recipe_name": recipe.get("recipe_name") or "레시피",
+            "unit_weight_g": float(recipe.get("unit_weight_g") or 0.0),
+            "totals": totals,
+            "items": hydrated,
+            "generated_at": now,
+        }
+        try:
+            # 렌더링은 워커 프로세스에서; 대기열이 가득 차면 쌓지 않고 바로 503
+            with span("pdf"):
+                pdf_bytes = await render_label_async(job)
+        except LabelRenderBusy:
+            raise _label_busy()
+        label_cache.put(key, pdf_bytes)
+
+    filename = f"nutrition_label_{now.strftime('%Y%m%d_%H%M%S')}.pdf"
+    return Response(
+        pdf_bytes,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', **cache_headers},
+    )
+
+
+# Recipes per compute_totals_batch call / NDJSON flush in /api/recipes/calculate
+CALC_BATCH_SIZE = 256
+
+
+@app.post("/api/recipes/calculate")
+async def recipes_calculate(recipes: List[RecipeIn], adb=Depends(get_async_db)):
+    """
+    Stateless bulk calculation: one NDJSON line per recipe, in request order.
+    Ingredients come from the cached catalog (no per-recipe queries).
+    """
+    catalog = await get_catalog_async(adb)
+    matrix = await run_in_threadpool(get_nutrient_matrix, catalog)
+
+    def lines():
+        for start in range(0, len(recipes), CALC_BATCH_SIZE):
+            chunk = recipes[start:start + CALC_BATCH_SIZE]
+            batch = []
+            missing = []
+            for recipe in chunk:
+                ids = [it.ingredient_id for it in recipe.items]
+                rows = matrix.rows(ids)
+                batch.append((rows, [it.amount_g for it in recipe.items]))
+                missing.append([iid for iid, row in zip(ids, rows) if row < 0])
+
+            totals = compute_totals_batch(matrix, batch, [r.unit_weight_g for r in chunk])
+            out = []
+            for i, (recipe, t) in enumerate(zip(chunk, totals)):
+                out.append(json.dumps({
+                    "index": start + i,
+                    "recipe_name": recipe.recipe_name,
+                    "unit_weight_g": recipe.unit_weight_g,
+                    "per_unit": t["per_unit"],
+                    "per_100g": t["per_100g"],
+                    "missing_ingredient_ids": missing[i],
+                }, ensure_ascii=False))
+            yield "\n".join(out) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+# 최적화 후보 재료(대체 원재료) 최대 개수
+OPTIMIZE_MAX_CANDIDATES = 200
+
+
+@app.post("/api/recipes/optimize")
+async def recipes_optimize(body: OptimizeIn, adb=Depends(get_async_db)):
+    """
+    What-if: smallest change to the recipe amounts that meets the targets
+    (e.g. sodium_mg per_unit max 120, kcal per_100g between 350 and 400),
+    optionally moving grams to candidate_ids (substitutes). Unit weight is fixed.
+    """
+    if not optimizer_available():
+        raise HTTPException(status_code=501, detail="Recipe optimization requires scipy")
+    if len(body.candidate_ids) > OPTIMIZE_MAX_CANDIDATES:
+        raise HTTPException(status_code=400, detail=f"at most {OPTIMIZE_MAX_CANDIDATES} candidate_ids")
+    catalog = await get_catalog_async(adb)
+    matrix = await run_in_threadpool(get_nutrient_matrix, catalog)
+    recipe = body.recipe
+    try:
+        # LP + 후보 일괄 평가는 CPU 작업이라 이벤트 루프 밖(스레드풀)에서
+        with span("optimize"):
+            result = await run_in_threadpool(
+                optimize_recipe,
+                matrix, catalog,
+                [(it.ingredient_id, it.amount_g) for it in recipe.items],
+                recipe.unit_weight_g,
+                [Target(t.nutrient, t.basis, t.min, t.max) for t in body.targets],
+                bounds={b.ingredient_id: (b.min_g, b.max_g) for b in body.bounds},
+                candidate_ids=body.candidate_ids,
+                keep_total=body.keep_total,
+                step_g=body.step_g,
+                minimize=body.minimize,
+            )
+    except OptimizeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    out: Dict[str, Any] = {
+        "status": result.status,
+        "recipe_name": recipe.recipe_name,
+        "unit_weight_g": recipe.unit_weight_g,
+        "candidates_evaluated": result.candidates_evaluated,
+        "solve_ms": result.solve_ms,
+        "evaluate_ms": result.evaluate_ms,
+    }
+    if result.totals is not None:
+        out["items"] = [
+            {
+                "ingredient_id": iid,
+                "ingredient_name": catalog.get(iid).display_name,
+                "original_g": orig,
+                "amount_g": round(amt, 6),
+                "change_g": round(amt - orig, 6),
+            }
+            for iid, orig, amt in zip(result.ingredient_ids, result.original_g, result.amounts_g)
+            if orig or amt
+        ]
+        out["per_unit"] = result.totals["per_unit"]
+        out["per_100g"] = result.totals["per_100g"]
+    return out
+
+
+_UNSAFE_FILENAME = re.compile(r'[\\/:*?"<>|]+')
+
+# /api/labels/batch 한 번에 받는 레시피 수 상한 (넘으면 400)
+LABEL_BATCH_MAX_RECIPES = int(os.getenv("LABEL_BATCH_MAX_RECIPES", "500"))
+
+
+@app.post("/api/labels/batch")
+def labels_batch(recipes: List[RecipeIn], format: str = "zip", db=Depends(get_db)):
+    """
+    Labels for many recipes at once, rendered across the worker process pool.
+    format=zip: one PDF per recipe, streamed as each finishes.
+    format=pdf: one multi-page PDF in request order.
+    """
+    if format not in ("zip", "pdf"):
+        raise HTTPException(status_code=400, detail="format must be 'zip' or 'pdf'")
+    if len(recipes) > LABEL_BATCH_MAX_RECIPES:
+        raise HTTPException(status_code=400, detail=f"at most {LABEL_BATCH_MAX_RECIPES} recipes per batch")
+    # /label.pdf와 같은 한도: 풀이 가득 차 있으면 렌더링을 시작하지 않고 503
+    if label_pool_busy(batch_window(len(recipes))):
+        raise _label_busy()
+
+    catalog = get_catalog(db)
+    matrix = get_nutrient_matrix(catalog)
+    all_totals = compute_totals_batch(
+        matrix,
+        [(matrix.rows(it.ingredient_id for it in r.items), [it.amount_g for it in r.items]) for r in recipes],
+        [r.unit_weight_g for r in recipes],
     )
 
-    filename = f"nutrition_label_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    generated_at = datetime.now()
+    jobs = []
+    filenames = []
+    for i, (recipe, totals) in enumerate(zip(recipes, all_totals)):
+        items = []
+        for it in recipe.items:
+            ing = catalog.get(it.ingredient_id)
+            if ing:
+                items.append({"ingredient": ing, "amount_g": it.amount_g})
+        name = recipe.recipe_name.strip() or "레시피"
+        jobs.append({
+            "recipe_name": name,
+            "unit_weight_g": float(recipe.unit_weight_g or 0.0),
+            "totals": totals,
+            "items": items,
+            "generated_at": generated_at,
+        })
+        filenames.append(f"{i + 1:04d}_{_UNSAFE_FILENAME.sub('_', name)}.pdf")
+
+    stamp = generated_at.strftime('%Y%m%d_%H%M%S')
+    if format == "pdf":
+        return Response(
+            merge_labels_pdf(jobs),
+            media_type="application/pdf",
+            headers={"Content-Disposition": f'attachment; filename="nutrition_labels_{stamp}.pdf"'},
+        )
     return StreamingResponse(
-        iter([pdf_bytes]),
-        media_type="application/pdf",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        stream_labels_zip(jobs, filenames),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="nutrition_labels_{stamp}.zip"'},
     )
 
 
@@ -218,53 +602,50 @@ def admin_logout(request: Request):
     return RedirectResponse(url="/", status_code=303)
 
 
+# 관리자 원재료 목록 한 페이지 행 수
+ADMIN_PAGE_SIZE = int(os.getenv("ADMIN_PAGE_SIZE", "50"))
+
 @app.get(
     "/admin/ingredients",
     response_class=HTMLResponse,
     dependencies=[Depends(require_admin)]
 )
-def admin_ingredients(request: Request, q: str = "", db=Depends(get_db)):
-    query = db.query(Ingredient)
-
-    if q:
-        like = f"%{q}%"
-        query = query.filter(Ingredient.display_name.ilike(like))
-
-    # ① DB에서 모두 가져오기
-    ingredients = query.all()
-
-    # ② 정렬 (영문 먼저 / 영문 A–Z / 한글 가나다)
-    import re
-
-    def sort_name(display_name: str) -> str:
-        s = (display_name or "").strip()
-        if "|" in s:
-            s = s.split("|", 1)[0].strip()
-        return s
+def admin_ingredients(
+    request: Request,
+    q: str = "",
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    db=Depends(get_db),
+):
+    # 정렬 (영문 먼저 / 영문 A–Z / 한글 가나다): (sort_key, id) 인덱스 순서로 한 페이지씩
+    # 검색은 원재료명/브랜드/선택명/메모 전문 검색 인덱스 사용 (SQLite FTS5, Postgres pg_trgm)
+    page = search_page(db, q=q.strip(), after=after, before=before, limit=ADMIN_PAGE_SIZE)
 
-    def strip_leading_symbols(s: str) -> str:
-        return re.sub(r"^[^0-9A-Za-z가-힣]+", "", s)
+    with span("render"):
+        return templates.TemplateResponse(
+            "admin/ingredients.html",
+            {
+                "request": request,
+                "ingredients": page.items,
+                "total": page.total,
+                "next_cursor": page.next_cursor,
+                "prev_cursor": page.prev_cursor,
+                "q": q,
+                "brand_name": BRAND_NAME,
+            },
+        )
 
-    def is_english_start(s: str) -> bool:
-        return bool(s) and s[0].isascii() and s[0].isalpha()
 
-    def key(ing: Ingredient):
-        s = strip_leading_symbols(sort_name(ing.display_name))
-        group = 0 if is_english_start(s) else 1
-        primary = s.lower() if group == 0 else s
-        return (group, primary, s)
+DUPLICATE_INGREDIENT_ERROR = "같은 원재료명/브랜드 조합이 이미 등록되어 있습니다."
 
-    ingredients.sort(key=key)
 
-    return templates.TemplateResponse(
-        "admin/ingredients.html",
-        {
-            "request": request,
-            "ingredients": ingredients,
-            "q": q,
-            "brand_name": BRAND_NAME,
-        },
-    )
+def _is_duplicate_ingredient(db, name: str, brand: str, exclude_id: Optional[int] = None) -> bool:
+    # 유니크 인덱스(IntegrityError)에만 맡기면, 기존 중복 데이터 때문에 인덱스가 없는 DB에서는
+    # 중복이 그대로 저장되므로 먼저 직접 확인한다.
+    query = db.query(Ingredient.id).filter(Ingredient.name == name, Ingredient.brand == brand)
+    if exclude_id is not None:
+        query = query.filter(Ingredient.id != exclude_id)
+    return db.query(query.exists()).scalar()
 
 
 @app.get("/admin/ingredients/new", response_class=HTMLResponse, dependencies=[Depends(require_admin)])
@@ -276,6 +657,7 @@ def admin_new_ingredient_form(request: Request):
 @app.post("/admin/ingredients/new", dependencies=[Depends(require_admin)])
 def admin_new_ingredient(
     request: Request,
+    background_tasks: BackgroundTasks,
     name: str = Form(""),
     brand: str = Form(""),
     base_g: float = Form(100.0),
@@ -297,10 +679,14 @@ def admin_new_ingredient(
     if not name:
         return templates.TemplateResponse("admin/edit.html", {"request": request, "ingredient": None, "error": "원재료명은 필수입니다.",
                                                               "brand_name": BRAND_NAME,})
+    if _is_duplicate_ingredient(db, name, brand):
+        return templates.TemplateResponse("admin/edit.html", {"request": request, "ingredient": None, "error": DUPLICATE_INGREDIENT_ERROR,
+                                                              "brand_name": BRAND_NAME,})
 
     display_name = f"{name} | {brand}" if brand else name
     ing = Ingredient(
         display_name=display_name,
+        sort_key=make_sort_key(display_name),
         name=name,
         brand=brand,
         base_g=float(base_g or 100.0),
@@ -317,7 +703,21 @@ def admin_new_ingredient(
         memo=memo.strip(),
     )
     db.add(ing)
-    db.commit()
+    try:
+        db.flush()
+        # 삭제된 원재료 id가 재사용된 경우, 그 id를 쓰던 레시피 합계에 반영
+        report = None
+        if apply_ingredient_change(db, ing.id, None, ingredient_values(ing)):
+            report = enqueue_impact_analysis(db, "new", {ing.id: None})
+        mark_catalog_changed(db, upserted=[ing.id])
+        db.commit()
+    except IntegrityError:
+        # (원재료명, 브랜드) 유니크 인덱스
+        db.rollback()
+        return templates.TemplateResponse("admin/edit.html", {"request": request, "ingredient": None, "error": DUPLICATE_INGREDIENT_ERROR,
+                                                              "brand_name": BRAND_NAME,})
+    if report is not None:
+        background_tasks.add_task(run_impact_job, report.id)
     return RedirectResponse(url="/admin/ingredients", status_code=303)
 
 
@@ -334,6 +734,7 @@ def admin_edit_form(ingredient_id: int, request: Request, db=Depends(get_db)):
 def admin_edit(
     ingredient_id: int,
     request: Request,
+    background_tasks: BackgroundTasks,
     name: str = Form(""),
     brand: str = Form(""),
     base_g: float = Form(100.0),
@@ -359,10 +760,15 @@ def admin_edit(
     if not name:
         return templates.TemplateResponse("admin/edit.html", {"request": request, "ingredient": ing, "error": "원재료명은 필수입니다.",
                                                               "brand_name": BRAND_NAME,})
+    if _is_duplicate_ingredient(db, name, brand, exclude_id=ing.id):
+        return templates.TemplateResponse("admin/edit.html", {"request": request, "ingredient": ing, "error": DUPLICATE_INGREDIENT_ERROR,
+                                                              "brand_name": BRAND_NAME,})
 
+    old_values = ingredient_values(ing)
     ing.name = name
     ing.brand = brand
     ing.display_name = f"{name} | {brand}" if brand else name
+    ing.sort_key = make_sort_key(ing.display_name)
     ing.base_g = float(base_g or 100.0)
 
     ing.sodium_mg_100g = float(sodium_mg_100g or 0.0)
@@ -377,56 +783,291 @@ def admin_edit(
     ing.protein_g_100g = float(protein_g_100g or 0.0)
     ing.memo = memo.strip()
 
-    db.commit()
+    # 이 원재료를 쓰는 저장 레시피만, 바뀐 값의 차이만큼 합계를 갱신
+    # 레시피가 있으면 표시값 변화 분석은 응답 후 백그라운드에서 (/admin/impact-reports)
+    report = None
+    if apply_ingredient_change(db, ing.id, old_values, ingredient_values(ing)):
+        report = enqueue_impact_analysis(db, "edit", {ing.id: old_values})
+    mark_catalog_changed(db, upserted=[ing.id])
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return templates.TemplateResponse("admin/edit.html", {"request": request, "ingredient": ing, "error": DUPLICATE_INGREDIENT_ERROR,
+                                                              "brand_name": BRAND_NAME,})
+    if report is not None:
+        background_tasks.add_task(run_impact_job, report.id)
     return RedirectResponse(url="/admin/ingredients", status_code=303)
 
 
 @app.post("/admin/ingredients/{ingredient_id}/delete", dependencies=[Depends(require_admin)])
-def admin_delete(ingredient_id: int, db=Depends(get_db)):
+def admin_delete(ingredient_id: int, background_tasks: BackgroundTasks, db=Depends(get_db)):
     ing = db.query(Ingredient).get(ingredient_id)
     if not ing:
         raise HTTPException(status_code=404, detail="Not found")
+    old_values = ingredient_values(ing)
+    report = None
+    if apply_ingredient_change(db, ing.id, old_values, None):
+        report = enqueue_impact_analysis(db, "delete", {ing.id: old_values})
     db.delete(ing)
+    mark_catalog_changed(db, deleted=[ingredient_id])
     db.commit()
+    if report is not None:
+        background_tasks.add_task(run_impact_job, report.id)
     return RedirectResponse(url="/admin/ingredients", status_code=303)
-import pandas as pd
-from io import BytesIO
 
-@app.get("/admin/ingredients/export", dependencies=[Depends(require_admin)])
-def export_ingredients(db=Depends(get_db)):
-    ingredients = db.query(Ingredient).all()
-
-    rows = []
-    for ing in ingredients:
-        rows.append({
-            "display_name": ing.display_name,
-            "name": ing.name,
-            "brand": ing.brand,
-            "base_g": ing.base_g,
-            "sodium_mg_100g": ing.sodium_mg_100g,
-            "carbs_g_100g": ing.carbs_g_100g,
-            "sugars_g_100g": ing.sugars_g_100g,
-            "fiber_g_100g": ing.fiber_g_100g,
-            "allulose_g_100g": ing.allulose_g_100g,
-            "fat_g_100g": ing.fat_g_100g,
-            "trans_fat_g_100g": ing.trans_fat_g_100g,
-            "sat_fat_g_100g": ing.sat_fat_g_100g,
-            "chol_mg_100g": ing.chol_mg_100g,
-            "protein_g_100g": ing.protein_g_100g,
-            "memo": ing.memo,
-        })
 
-    df = pd.DataFrame(rows)
+SIMILAR_MAX_K = 100
+
+
+@app.get("/admin/ingredients/{ingredient_id}/similar", dependencies=[Depends(require_admin)])
+async def admin_similar_ingredients(ingredient_id: int, k: int = 10, impact: bool = False, adb=Depends(get_async_db)):
+    """
+    대체 원재료 후보: 영양성분 프로필(100g당, 항목별 표준편차로 정규화)이 가장 가까운 k개.
+    impact=true면 이 원재료를 쓰는 저장 레시피마다 같은 g으로 바꿨을 때 달라지는 표시값도 함께
+    """
+    k = max(1, min(k, SIMILAR_MAX_K))
+    catalog = await get_catalog_async(adb)
+    ing = catalog.get(ingredient_id)
+    if ing is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    with span("search"):
+        # 색인은 카탈로그 버전마다 한 번 만들고, 관리자 수정분은 바뀐 행만 반영(patch)
+        index = await run_in_threadpool(get_similarity_index, catalog)
+        t0 = time.perf_counter()
+        nearest = index.nearest(ingredient_id, k)
+        search_ms = (time.perf_counter() - t0) * 1000.0
+
+    def out(snapshot, distance=None):
+        row = {"id": snapshot.id, "display_name": snapshot.display_name}
+        if distance is not None:
+            row["distance"] = round(distance, 6)
+        row.update({col: getattr(snapshot, col) for _, col in calc.NUTRIENT_FIELDS})
+        return row
+
+    items = [out(catalog.get(iid), distance) for iid, distance in nearest]
+    if impact and nearest:
+        matrix = await run_in_threadpool(get_nutrient_matrix, catalog)
+        by_substitute = await adb.run_sync(
+            lambda db: substitution_impact(db, matrix, ingredient_id, [iid for iid, _ in nearest])
+        )
+        for item in items:
+            recipes = by_substitute[item["id"]]
+            item["impact"] = {
+                "recipes": len(recipes),
+                "changed_labels": sum(1 for r in recipes if r["per_unit"] or r["per_100g"]),
+                "items": recipes,
+            }
+    return {
+        "ingredient": out(ing),
+        "items": items,
+        "search_ms": round(search_ms, 3),
+        "index": {"catalog_version": catalog.version, **index.stats()},
+    }
+
+
+@app.get("/admin/catalog/stats", dependencies=[Depends(require_admin)])
+def admin_catalog_stats():
+    return catalog_stats()
+
+
+@app.get("/admin/db/stats", dependencies=[Depends(require_admin)])
+def admin_db_stats():
+    return {**pool_stats(), "sqlite": sqlite_settings()}
+
+
+@app.get("/admin/label-cache/stats", dependencies=[Depends(require_admin)])
+def admin_label_cache_stats():
+    return label_cache.stats()
+
 
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="ingredients")
-    output.seek(0)
+@app.get("/admin/recipe-store/stats", dependencies=[Depends(require_admin)])
+def admin_recipe_store_stats():
+    return recipe_store.stats()
+
+
+@app.get("/admin/profiling", dependencies=[Depends(require_admin)])
+def admin_profiling():
+    return {**profiler.stats(), "items": profiler.captures()}
+
+
+@app.post("/admin/profiling", dependencies=[Depends(require_admin)])
+def admin_profiling_configure(body: ProfilingIn):
+    # 예: {"sample_rate": 0.1, "slow_ms": 300, "duration_s": 600} → 10분 동안 요청 10%를 프로파일, 300ms 이상만 보관
+    if body.profiler not in (None, "cprofile", "pyinstrument"):
+        raise HTTPException(status_code=400, detail="profiler must be cprofile or pyinstrument")
+    profiler.configure(body.sample_rate, slow_ms=body.slow_ms, duration_s=body.duration_s, kind=body.profiler)
+    return profiler.stats()
+
+
+@app.get("/admin/profiling/{capture_id}", dependencies=[Depends(require_admin)])
+def admin_profiling_capture(capture_id: int):
+    capture = profiler.capture(capture_id)
+    if not capture:
+        raise HTTPException(status_code=404, detail="Not found")
+    header = f"{capture['method']} {capture['path']} -> {capture['status']} in {capture['ms']} ms ({capture['profiler']}, {capture['captured_at']})"
+    return PlainTextResponse(header + "\n\n" + capture["report"])
+
+
+def _metrics_samples() -> Dict[str, Any]:
+    samples = {}
+    pools = pool_stats()
+    for name in ("sync", "async"):
+        pool = pools[name]
+        samples[f"db_pool_{name}_checked_out"] = ("gauge", "Connections in use.", pool.get("checked_out", 0))
+        samples[f"db_pool_{name}_wait_max_seconds"] = ("gauge", "Longest wait for a pooled connection.", pool["wait_max_ms"] / 1000)
+        samples[f"db_pool_{name}_timeouts_total"] = ("counter", "Pool checkouts that timed out.", pool["timeouts"])
+    catalog = catalog_stats()
+    samples["catalog_version"] = ("gauge", "Loaded ingredient catalog version.", catalog["version"] or 0)
+    samples["catalog_size"] = ("gauge", "Ingredients in the loaded catalog.", catalog["size"])
+    labels = label_cache.stats()
+    samples["label_cache_hits_total"] = ("counter", "Label PDFs served from the cache.", labels["hits"] + labels["disk_hits"])
+    samples["label_cache_misses_total"] = ("counter", "Label PDFs rendered.", labels["misses"])
+    return samples
+
+
+@app.get("/metrics")
+def metrics(request: Request):
+    # Prometheus 수집용 (METRICS_ENABLED=1일 때만). METRICS_TOKEN이 있으면 Authorization: Bearer 필요
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not found")
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return PlainTextResponse(render_metrics(_metrics_samples), media_type="text/plain; version=0.0.4")
+
+
+def _recipe_out(recipe: Recipe, with_items: bool = False) -> Dict[str, Any]:
+    totals = recipe_totals(recipe)
+    out = {
+        "id": recipe.id,
+        "recipe_name": recipe.recipe_name,
+        "unit_weight_g": recipe.unit_weight_g,
+        "per_unit": totals["per_unit"],
+        "per_100g": totals["per_100g"],
+        "updated_at": recipe.updated_at.isoformat(),
+    }
+    if with_items:
+        out["items"] = [{"ingredient_id": it.ingredient_id, "amount_g": it.amount_g} for it in recipe.items]
+    return out
+
+
+def _save_recipe_or_400(db, body: RecipeIn, recipe: Optional[Recipe] = None) -> Recipe:
+    recipe, unknown = save_recipe(
+        db, body.recipe_name, body.unit_weight_g,
+        [(it.ingredient_id, it.amount_g) for it in body.items],
+        recipe=recipe,
+    )
+    if unknown:
+        raise HTTPException(status_code=400, detail={"unknown_ingredient_ids": unknown})
+    db.commit()
+    return recipe
+
+
+@app.get("/admin/recipes", dependencies=[Depends(require_admin)])
+def admin_recipes(db=Depends(get_db)):
+    # 합계는 저장된 값 사용 (원재료 조회/재계산 없음)
+    recipes = db.query(Recipe).order_by(Recipe.recipe_name, Recipe.id).all()
+    return {"items": [_recipe_out(r) for r in recipes]}
+
+
+@app.post("/admin/recipes", dependencies=[Depends(require_admin)], status_code=201)
+def admin_create_recipe(body: RecipeIn, db=Depends(get_db)):
+    return _recipe_out(_save_recipe_or_400(db, body), with_items=True)
+
+
+@app.get("/admin/recipes/{recipe_id}", dependencies=[Depends(require_admin)])
+def admin_get_recipe(recipe_id: int, db=Depends(get_db)):
+    recipe = db.get(Recipe, recipe_id)
+    if not recipe:
+        raise HTTPException(status_code=404, detail="Not found")
+    return _recipe_out(recipe, with_items=True)
+
+
+@app.put("/admin/recipes/{recipe_id}", dependencies=[Depends(require_admin)])
+def admin_update_recipe(recipe_id: int, body: RecipeIn, db=Depends(get_db)):
+    recipe = db.get(Recipe, recipe_id)
+    if not recipe:
+        raise HTTPException(status_code=404, detail="Not found")
+    return _recipe_out(_save_recipe_or_400(db, body, recipe), with_items=True)
+
+
+@app.delete("/admin/recipes/{recipe_id}", dependencies=[Depends(require_admin)], status_code=204)
+def admin_delete_recipe(recipe_id: int, db=Depends(get_db)):
+    recipe = db.get(Recipe, recipe_id)
+    if not recipe:
+        raise HTTPException(status_code=404, detail="Not found")
+    db.delete(recipe)
+    db.commit()
+    return Response(status_code=204)
+
+
+@app.get("/admin/recipes/{recipe_id}/label.pdf", dependencies=[Depends(require_admin)])
+async def admin_recipe_label(recipe_id: int, request: Request, adb=Depends(get_async_db)):
+    def load(db):
+        recipe = db.get(Recipe, recipe_id)
+        if not recipe:
+            return None
+        items = [{"ingredient_id": it.ingredient_id, "amount_g": it.amount_g} for it in recipe.items]
+        return recipe.recipe_name, recipe.unit_weight_g, items
+
+    loaded = await adb.run_sync(load)
+    if loaded is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    recipe_name, unit_weight_g, items = loaded
+    recipe = {"recipe_name": recipe_name, "unit_weight_g": unit_weight_g, "items": items}
+    hydrated = _hydrate_items(recipe, await get_catalog_async(adb))
+    # 캐시 키가 /label.pdf와 같으므로 합계도 같은 방식(재료 행에서 다시 계산)으로:
+    # 누적 갱신된 합계는 재계산값과 미세하게 달라 같은 키에 다른 PDF가 들어갈 수 있다.
+    return await _label_response(
+        request, recipe, hydrated,
+        lambda: compute_totals(hydrated, unit_weight_g=unit_weight_g or 0.0),
+    )
+
+
+@app.post("/admin/recipes/recompute", dependencies=[Depends(require_admin)])
+def admin_recompute_recipes(db=Depends(get_db)):
+    # 전체 재계산 (DB를 직접 수정한 뒤 사용). max_drift: 누적 갱신값과 재계산값의 최대 차이
+    result = recompute_all_recipes(db)
+    db.commit()
+    return result
+
+
+@app.get("/admin/impact-reports", dependencies=[Depends(require_admin)])
+def admin_impact_reports(limit: int = 50, db=Depends(get_db)):
+    # 원재료 수정/삭제·엑셀 적재 후 저장 레시피 표시값 변화 분석 (최근 순, 요약만)
+    reports = db.query(ImpactReport).order_by(ImpactReport.id.desc()).limit(max(1, min(limit, 500))).all()
+    return {"items": [impact_report_out(r) for r in reports]}
+
+
+@app.get("/admin/impact-reports/{report_id}", dependencies=[Depends(require_admin)])
+def admin_impact_report(report_id: int, db=Depends(get_db)):
+    report = db.get(ImpactReport, report_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Not found")
+    return impact_report_out(report, with_recipes=True)
+
+
+@app.post("/admin/catalog/invalidate", dependencies=[Depends(require_admin)])
+def admin_catalog_invalidate(db=Depends(get_db)):
+    # 다른 워커까지 다시 읽도록 버전을 올림 (DB를 직접 수정한 뒤 사용, 변경 기록에는 reset으로 남음)
+    mark_catalog_changed(db)
+    db.commit()
+    invalidate_catalog()
+    return catalog_stats()
+
+
+@app.get("/admin/ingredients/export", dependencies=[Depends(require_admin)])
+def export_ingredients(format: str = "xlsx"):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be one of: xlsx, csv, parquet")
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
 
-    filename = f"ingredients_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    stream, media_type = EXPORT_FORMATS[format]
+    filename = f"ingredients_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
 
     return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        stream(),
+        media_type=media_type,
         headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
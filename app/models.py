@@ -1,9 +1,41 @@
 
-from sqlalchemy import Column, Integer, Float, String, Text
+import re
+
+from sqlalchemy import Column, Integer, Float, String, Text, Index, LargeBinary, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
 from .db import Base
 
+_LEADING_SYMBOLS = re.compile(r"^[^0-9A-Za-z가-힣]+")
+
+
+def make_sort_key(display_name: str) -> str:
+    """
+    목록 정렬 키 (영문 먼저 / 영문 A–Z 대소문자 무시 / 한글 가나다).
+    DB에 저장해 두고 ORDER BY로 그대로 사용하므로, 문자열 비교 결과가
+    (그룹, 정렬명, 원래 이름) 튜플 비교와 같도록 만든다.
+    """
+    s = (display_name or "").strip()
+    # '이눌린|OO' 같은 형태면 앞부분만 정렬 기준으로 사용
+    if "|" in s:
+        s = s.split("|", 1)[0].strip()
+    # 공백/기호가 앞에 있으면 정렬을 망치니 제거
+    s = _LEADING_SYMBOLS.sub("", s)
+
+    english = bool(s) and s[0].isascii() and s[0].isalpha()
+    group = "0" if english else "1"
+    primary = s.lower() if english else s
+    # "\x01" 구분자: 정렬명이 다른 정렬명의 접두어일 때 더 짧은 쪽이 먼저 오도록
+    return f"{group}{primary}\x01{s}"
+
+
 class Ingredient(Base):
     __tablename__ = "ingredients"
+    __table_args__ = (
+        # 엑셀 적재 시 (원재료명, 브랜드) 기준 upsert
+        Index("uq_ingredients_name_brand", "name", "brand", unique=True),
+        # 목록 정렬 + 키셋 페이지네이션 ((sort_key, id) > 커서)
+        Index("ix_ingredients_sort_key_id", "sort_key", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -24,3 +56,105 @@ class Ingredient(Base):
     protein_g_100g = Column(Float, default=0.0)
 
     memo = Column(Text, default="")
+
+    # make_sort_key(display_name) — 쓰기 시점에 계산해 저장 (Postgres는 바이트 순서 비교)
+    sort_key = Column(
+        String(512).with_variant(String(512, collation="C"), "postgresql"),
+        default="",
+    )
+
+
+class CatalogMeta(Base):
+    __tablename__ = "catalog_meta"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)            # 원재료 DB 변경 버전
+
+
+class IngredientChange(Base):
+    """원재료 변경 기록 (seq 순서 = 커밋 순서, 지우지 않음)"""
+    __tablename__ = "ingredient_changes"
+    __table_args__ = {"sqlite_autoincrement": True}  # 삭제된 seq 재사용 방지
+
+    seq = Column(Integer, primary_key=True)
+    catalog_version = Column(Integer, index=True, nullable=False)   # 이 변경으로 올라간 CatalogMeta.version
+    ingredient_id = Column(Integer, nullable=True)                  # reset이면 None
+    op = Column(String(8), nullable=False)                          # upsert / delete / reset(전체 다시 받기)
+    changed_at = Column(DateTime, nullable=False)
+
+
+class RecipeDraft(Base):
+    """작성 중인 레시피 (쿠키에는 id만 저장)"""
+    __tablename__ = "recipe_drafts"
+
+    id = Column(String(32), primary_key=True)                       # 추측 불가능한 토큰
+    recipe_name = Column(String(255), default="")
+    unit_weight_g = Column(Float, default=0.0)
+    # 항목은 같은 길이의 두 배열로 압축 저장 (int32 원재료 id / float64 g, little-endian)
+    ingredient_ids = Column(LargeBinary, nullable=False, default=b"")
+    amounts_g = Column(LargeBinary, nullable=False, default=b"")
+    updated_at = Column(DateTime, index=True, nullable=False)
+
+
+class Recipe(Base):
+    """저장된 제품 레시피. 영양성분 합계를 캐시해 두고 원재료가 바뀌면 차이만 반영"""
+    __tablename__ = "recipes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    recipe_name = Column(String(255), nullable=False, default="")
+    unit_weight_g = Column(Float, default=0.0)
+
+    # 1개(레시피 전체) 기준 합계, 반올림 전 (calc.NUTRIENT_FIELDS 키와 같은 이름)
+    sodium_mg = Column(Float, nullable=False, default=0.0)
+    carbs_g = Column(Float, nullable=False, default=0.0)
+    sugars_g = Column(Float, nullable=False, default=0.0)
+    fiber_g = Column(Float, nullable=False, default=0.0)
+    allulose_g = Column(Float, nullable=False, default=0.0)
+    fat_g = Column(Float, nullable=False, default=0.0)
+    trans_fat_g = Column(Float, nullable=False, default=0.0)
+    sat_fat_g = Column(Float, nullable=False, default=0.0)
+    chol_mg = Column(Float, nullable=False, default=0.0)
+    protein_g = Column(Float, nullable=False, default=0.0)
+
+    updated_at = Column(DateTime, nullable=False)
+
+    items = relationship(
+        "RecipeItem",
+        order_by="RecipeItem.position",
+        cascade="all, delete-orphan",
+        back_populates="recipe",
+    )
+
+
+class RecipeItem(Base):
+    __tablename__ = "recipe_items"
+
+    id = Column(Integer, primary_key=True)
+    recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"), index=True, nullable=False)
+    position = Column(Integer, nullable=False, default=0)
+    # 원재료가 삭제돼도 행은 남김 (계산에서 제외, compute_totals와 동일)
+    # 이 인덱스가 원재료 -> 사용 레시피 역색인
+    ingredient_id = Column(Integer, index=True, nullable=False)
+    amount_g = Column(Float, nullable=False, default=0.0)
+
+    recipe = relationship("Recipe", back_populates="items")
+
+
+class ImpactReport(Base):
+    """원재료 수정/엑셀 적재 후 저장 레시피의 표시값(반올림 후) 변화 분석 결과"""
+    __tablename__ = "impact_reports"
+
+    id = Column(Integer, primary_key=True)
+    trigger = Column(String(16), nullable=False)                    # edit / delete / new / seed
+    status = Column(String(8), nullable=False, default="pending")   # pending / running / done / failed
+    # 바뀐 원재료의 변경 전 값: {"원재료 id": [NUTRIENT_FIELDS 순서 값] 또는 null(없던 원재료)} JSON
+    before_values = Column(Text, nullable=False, default="{}")
+    ingredients_changed = Column(Integer, nullable=False, default=0)
+    recipes_checked = Column(Integer, nullable=False, default=0)
+    labels_changed = Column(Integer, nullable=False, default=0)
+    thresholds_crossed = Column(Integer, nullable=False, default=0)
+    report = Column(Text, nullable=True)                            # 결과 JSON (레시피별 바뀐 값)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, index=True, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+    duration_ms = Column(Float, nullable=True)
@@ -1,4 +1,6 @@
 
+from typing import List, Optional
+
 from pydantic import BaseModel
 
 class IngredientIn(BaseModel):
@@ -16,3 +18,44 @@ class IngredientIn(BaseModel):
     chol_mg_100g: float = 0.0
     protein_g_100g: float = 0.0
     memo: str = ""
+
+
+class RecipeItemIn(BaseModel):
+    ingredient_id: int
+    amount_g: float
+
+
+class RecipeIn(BaseModel):
+    recipe_name: str = ""
+    unit_weight_g: float = 0.0
+    items: List[RecipeItemIn] = []
+
+
+class ProfilingIn(BaseModel):
+    sample_rate: float = 0.0
+    slow_ms: Optional[float] = None
+    duration_s: Optional[float] = 600.0
+    profiler: Optional[str] = None
+
+
+class NutrientTargetIn(BaseModel):
+    nutrient: str
+    basis: str = "per_unit"
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+
+class AmountBoundIn(BaseModel):
+    ingredient_id: int
+    min_g: Optional[float] = None
+    max_g: Optional[float] = None
+
+
+class OptimizeIn(BaseModel):
+    recipe: RecipeIn
+    targets: List[NutrientTargetIn]
+    bounds: List[AmountBoundIn] = []
+    candidate_ids: List[int] = []
+    keep_total: bool = True
+    step_g: float = 0.1
+    minimize: Optional[str] = None
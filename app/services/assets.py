@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import hashlib
+import mimetypes
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+from .compression import brotli_module, choose_encoding, compress, etag_matches
+
+# Fingerprinted URLs change with the content, so browsers may keep them for a year
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+# Plain URLs (old pages, bookmarks): revalidate with the ETag each time
+REVALIDATE_CACHE = "public, no-cache"
+
+_PRECOMPRESSED = {".br": "br", ".gz": "gzip"}
+
+
+@dataclass
+class Asset:
+    name: str
+    fingerprinted: str
+    media_type: str
+    digest: str
+    # encoding ("identity", "gzip", "br") -> bytes
+    bodies: Dict[str, bytes] = field(default_factory=dict)
+
+
+def _fingerprinted_name(name: str, digest: str) -> str:
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{digest}{ext}"
+
+
+class StaticAssets(StaticFiles):
+    """
+    StaticFiles with fingerprinted URLs (static_url("style.css") ->
+    /static/style.<hash>.css) served from memory, precompressed (gzip, and
+    brotli if installed; a style.css.br / .gz next to the file is used as is).
+    Anything not in the manifest falls back to plain StaticFiles.
+    """
+
+    def __init__(self, directory: str, prefix: str = "/static", **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.prefix = prefix.rstrip("/")
+        self._lock = threading.Lock()
+        self._by_name: Optional[Dict[str, Asset]] = None
+        self._by_path: Dict[str, Asset] = {}
+
+    def _load(self) -> Dict[str, Asset]:
+        by_name = self._by_name
+        if by_name is not None:
+            return by_name
+        with self._lock:
+            if self._by_name is not None:
+                return self._by_name
+            by_name, by_path = {}, {}
+            for root, _, files in os.walk(self.directory):
+                for filename in sorted(files):
+                    if os.path.splitext(filename)[1] in _PRECOMPRESSED:
+                        continue
+                    path = os.path.join(root, filename)
+                    name = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                    with open(path, "rb") as f:
+                        body = f.read()
+                    digest = hashlib.sha256(body).hexdigest()[:12]
+                    asset = Asset(
+                        name=name,
+                        fingerprinted=_fingerprinted_name(name, digest),
+                        media_type=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+                        digest=digest,
+                        bodies={"identity": body},
+                    )
+                    for ext, encoding in _PRECOMPRESSED.items():
+                        if os.path.exists(path + ext):
+                            with open(path + ext, "rb") as f:
+                                asset.bodies[encoding] = f.read()
+                    if "gzip" not in asset.bodies:
+                        asset.bodies["gzip"] = compress(body, "gzip", best=True)
+                    if "br" not in asset.bodies and brotli_module() is not None:
+                        asset.bodies["br"] = compress(body, "br", best=True)
+                    by_name[name] = asset
+                    by_path[name] = by_path[asset.fingerprinted] = asset
+            self._by_path = by_path
+            self._by_name = by_name
+            return by_name
+
+    def url(self, name: str) -> str:
+        """URL of a static file for templates: fingerprinted if known, plain otherwise."""
+        asset = self._load().get(name)
+        return f"{self.prefix}/{asset.fingerprinted if asset else name}"
+
+    async def get_response(self, path: str, scope) -> Response:
+        self._load()
+        path = path.replace(os.sep, "/")
+        asset = self._by_path.get(path)
+        if asset is None or scope["method"] not in ("GET", "HEAD"):
+            return await super().get_response(path, scope)
+
+        request_headers = Headers(scope=scope)
+        available = tuple(e for e in ("br", "gzip") if e in asset.bodies)
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""), available) or "identity"
+        etag = f'"{asset.digest}-{encoding}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE_CACHE if path != asset.name else REVALIDATE_CACHE,
+            "Vary": "Accept-Encoding",
+        }
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        if etag_matches(request_headers.get("if-none-match", ""), etag):
+            return Response(status_code=304, headers=headers)
+        body = asset.bodies[encoding]
+        if scope["method"] == "HEAD":
+            headers["Content-Length"] = str(len(body))
+            return Response(status_code=200, headers=headers, media_type=asset.media_type)
+        return Response(body, headers=headers, media_type=asset.media_type)
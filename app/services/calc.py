@@ -1,14 +1,52 @@
 
 from __future__ import annotations
 
+import os
 from dataclasses import dataclass
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Dict, Any, Iterable, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np  # imported on first use below (keeps `import app.main` light)
 
 # Rounding rules (aligned to your Excel "설정" intent)
 ROUND_KCAL = 0
 ROUND_MG = 0
 ROUND_G = 1
 
+# Arithmetic of compute_totals / compute_totals_batch:
+#   "float"    binary floats, rounded with round() (_r; .5 ties on the binary value)
+#   "decimal"  exact scaled integers, rounded by CALC_ROUNDING
+CALC_MODE = os.getenv("CALC_MODE", "float")
+# Rounding of the decimal mode:
+#   "half_up"     Excel ROUND: ROUND_KCAL / ROUND_MG / ROUND_G decimals, .5 away from zero
+#   "half_even"   same decimals, .5 to the even digit
+#   "regulatory"  labeling rounding bands per nutrient (REGULATORY_BANDS)
+CALC_ROUNDING = os.getenv("CALC_ROUNDING", "half_up")
+
+# Decimal mode: per-100g values are integers of 10^-VALUE_DECIMALS, amounts
+# and unit weights integers of 10^-AMOUNT_DECIMALS g. An input with more
+# decimals is rounded half-up to them first.
+VALUE_DECIMALS = 4
+AMOUNT_DECIMALS = 3
+
+# 식품등의 표시기준 rounding, decided on the exact value:
+# key -> (below this: 0, [(up to and including this: step), ..., (None: step)]).
+# Steps round half-up; "less than" wordings (e.g. "1g 미만") are not produced.
+REGULATORY_BANDS = {
+    "kcal": ("5", [(None, "5")]),
+    "sodium_mg": ("5", [("120", "5"), (None, "10")]),
+    "carbs_g": ("0.5", [(None, "1")]),
+    "sugars_g": ("0.5", [(None, "1")]),
+    "fiber_g": ("0.5", [(None, "1")]),
+    "allulose_g": ("0.5", [(None, "1")]),
+    "fat_g": ("0.5", [("5", "0.1"), (None, "1")]),
+    "trans_fat_g": ("0.2", [("5", "0.1"), (None, "1")]),
+    "sat_fat_g": ("0.5", [("5", "0.1"), (None, "1")]),
+    "chol_mg": ("2", [(None, "5")]),
+    "protein_g": ("0.5", [(None, "1")]),
+}
+
 NUTRIENTS_ORDER = [
     ("kcal", "열량(kcal)", "kcal"),
     ("sodium_mg", "나트륨(mg)", "mg"),
@@ -23,6 +61,23 @@ NUTRIENTS_ORDER = [
     ("protein_g", "단백질(g)", "g"),
 ]
 
+# Summed nutrient -> Ingredient column (per 100g), in compute_totals order
+NUTRIENT_FIELDS = [
+    ("sodium_mg", "sodium_mg_100g"),
+    ("carbs_g", "carbs_g_100g"),
+    ("sugars_g", "sugars_g_100g"),
+    ("fiber_g", "fiber_g_100g"),
+    ("allulose_g", "allulose_g_100g"),
+    ("fat_g", "fat_g_100g"),
+    ("trans_fat_g", "trans_fat_g_100g"),
+    ("sat_fat_g", "sat_fat_g_100g"),
+    ("chol_mg", "chol_mg_100g"),
+    ("protein_g", "protein_g_100g"),
+]
+
+# Keys of per_unit / per_100g (kcal first, then NUTRIENT_FIELDS)
+TOTAL_KEYS = ["kcal"] + [key for key, _ in NUTRIENT_FIELDS]
+
 def _r(value: float, unit: str) -> float:
     if unit == "kcal":
         return round(value, ROUND_KCAL)
@@ -39,12 +94,21 @@ def calc_kcal(carbs_g: float, fiber_g: float, allulose_g: float, protein_g: floa
     kcal = 4.0 * digestible + 2.0 * fiber_g + 4.0 * protein_g + 9.0 * fat_g
     return kcal
 
-def compute_totals(items: List[Dict[str, Any]], unit_weight_g: float) -> Dict[str, Any]:
+def compute_totals(
+    items: List[Dict[str, Any]],
+    unit_weight_g: float,
+    mode: Optional[str] = None,
+    rounding: Optional[str] = None,
+) -> Dict[str, Any]:
     """
     items: [{"ingredient": Ingredient, "amount_g": float}, ...]
     unit_weight_g: baked product weight per unit (g)
+    mode / rounding: CALC_MODE / CALC_ROUNDING when None
     Returns dict containing per_unit and per_100g values.
     """
+    if _decimal_mode(mode):
+        return _compute_totals_decimal(items, unit_weight_g, rounding or CALC_ROUNDING)
+
     sums = {
         "sodium_mg": 0.0,
         "carbs_g": 0.0,
@@ -73,6 +137,14 @@ def compute_totals(items: List[Dict[str, Any]], unit_weight_g: float) -> Dict[st
         sums["chol_mg"] += factor * float(ing.chol_mg_100g or 0.0)
         sums["protein_g"] += factor * float(ing.protein_g_100g or 0.0)
 
+    return totals_from_sums(sums, unit_weight_g)
+
+
+def totals_from_sums(sums: Dict[str, float], unit_weight_g: float) -> Dict[str, Any]:
+    """
+    compute_totals from already summed per-unit nutrients
+    (sums: one value per NUTRIENT_FIELDS key).
+    """
     kcal = calc_kcal(
         carbs_g=sums["carbs_g"],
         fiber_g=sums["fiber_g"],
@@ -93,6 +165,10 @@ def compute_totals(items: List[Dict[str, Any]], unit_weight_g: float) -> Dict[st
         for k in per_unit.keys():
             per_100g[k] = 0.0
 
+    return _rounded_totals(per_unit, per_100g)
+
+
+def _rounded_totals(per_unit: Dict[str, float], per_100g: Dict[str, float]) -> Dict[str, Any]:
     # Apply rounding
     rounded_unit = {}
     rounded_100g = {}
@@ -107,3 +183,348 @@ def compute_totals(items: List[Dict[str, Any]], unit_weight_g: float) -> Dict[st
         "raw_per_unit": per_unit,
         "raw_per_100g": per_100g,
     }
+
+
+class NutrientMatrix:
+    """
+    Column-major (ingredients x NUTRIENT_FIELDS) matrix of per-100g values.
+    Build once per catalog; row i belongs to the ingredient with id ids[i].
+    """
+
+    def __init__(self, ingredients: Iterable[Any]):
+        import numpy as np
+
+        ingredients = list(ingredients)
+        values = np.array(
+            [[float(getattr(ing, col) or 0.0) for _, col in NUTRIENT_FIELDS] for ing in ingredients],
+            dtype=np.float64,
+        ).reshape(len(ingredients), len(NUTRIENT_FIELDS))
+        self.values = np.asfortranarray(values)
+        self.ids = np.array([ing.id for ing in ingredients], dtype=np.int64)
+        self.row_of = {int(iid): i for i, iid in enumerate(self.ids)}
+
+    @classmethod
+    def from_values(cls, values: Dict[int, Sequence[float]]) -> "NutrientMatrix":
+        """Matrix from {ingredient_id: per-100g values in NUTRIENT_FIELDS order}."""
+        import numpy as np
+
+        matrix = cls.__new__(cls)
+        ids = list(values)
+        matrix.values = np.asfortranarray(
+            np.array([values[iid] for iid in ids], dtype=np.float64).reshape(len(ids), len(NUTRIENT_FIELDS))
+        )
+        matrix.ids = np.array(ids, dtype=np.int64)
+        matrix.row_of = {int(iid): i for i, iid in enumerate(ids)}
+        return matrix
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def rows(self, ingredient_ids: Iterable[int]) -> np.ndarray:
+        """Row index per ingredient id (-1 if not in the catalog)."""
+        import numpy as np
+
+        return np.array([self.row_of.get(int(i), -1) for i in ingredient_ids], dtype=np.intp)
+
+    def fixed_values(self) -> np.ndarray:
+        """values as int64 units of 10^-VALUE_DECIMALS (decimal mode), built on first use."""
+        fixed = getattr(self, "_fixed", None)
+        if fixed is None:
+            fixed = self._fixed = _to_fixed_array(self.values, VALUE_DECIMALS)
+        return fixed
+
+
+def batch_sums(
+    matrix: NutrientMatrix,
+    recipes: Sequence[Tuple[Sequence[int], Sequence[float]]],
+) -> np.ndarray:
+    """
+    recipes: [(row_indices, amounts_g), ...] with rows from NutrientMatrix.rows()
+    (rows < 0 are skipped, like missing ingredients in compute_totals).
+    Returns a (len(recipes) x NUTRIENT_FIELDS) array of per-unit sums.
+
+    Recipes are padded to the longest one and accumulated item position by
+    item position, so every recipe is summed in the same left-to-right order
+    as compute_totals and the results are bit-identical to it. A single
+    matrix product would reorder the additions.
+    """
+    import numpy as np
+
+    n = len(recipes)
+    length = max((len(rows) for rows, _ in recipes), default=0)
+    idx = np.zeros((n, length), dtype=np.intp)
+    factors = np.zeros((n, length), dtype=np.float64)
+    for r, (rows, amounts) in enumerate(recipes):
+        rows = np.asarray(rows, dtype=np.intp)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        keep = rows >= 0
+        k = int(keep.sum())
+        idx[r, :k] = rows[keep]
+        factors[r, :k] = amounts[keep] / 100.0  # per 100g basis
+
+    sums = np.zeros((n, len(NUTRIENT_FIELDS)), dtype=np.float64)
+    if len(matrix) == 0:
+        return sums
+    values = matrix.values
+    for j in range(length):
+        # padding adds 0.0 * value, which leaves a sum unchanged
+        sums += factors[:, j, None] * values[idx[:, j]]
+    return sums
+
+
+def batch_values(
+    matrix: NutrientMatrix,
+    recipes: Sequence[Tuple[Sequence[int], Sequence[float]]],
+    unit_weights_g: Sequence[float],
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Unrounded (per_unit, per_100g) arrays, one row per recipe and one column
+    per TOTAL_KEYS entry; the raw_per_unit / raw_per_100g of compute_totals.
+    """
+    import numpy as np
+
+    sums = batch_sums(matrix, recipes)
+    col = {key: j for j, (key, _) in enumerate(NUTRIENT_FIELDS)}
+    carbs, fiber, allulose = sums[:, col["carbs_g"]], sums[:, col["fiber_g"]], sums[:, col["allulose_g"]]
+    protein, fat = sums[:, col["protein_g"]], sums[:, col["fat_g"]]
+
+    # calc_kcal, vectorized with the same operation order
+    digestible = np.maximum(carbs - fiber - allulose, 0.0)
+    kcal = 4.0 * digestible + 2.0 * fiber + 4.0 * protein + 9.0 * fat
+    per_unit = np.column_stack([kcal, sums])
+
+    weights = np.asarray(unit_weights_g, dtype=np.float64).reshape(-1)
+    valid = weights > 0
+    ratio = np.divide(100.0, weights, out=np.zeros_like(weights), where=valid)
+    per_100g = np.where(valid[:, None], per_unit * ratio[:, None], 0.0)
+    return per_unit, per_100g
+
+
+def compute_totals_batch(
+    matrix: NutrientMatrix,
+    recipes: Sequence[Tuple[Sequence[int], Sequence[float]]],
+    unit_weights_g: Sequence[float],
+    mode: Optional[str] = None,
+    rounding: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Batched compute_totals: same result dict per recipe, same values bit for bit
+    (in either mode).
+    recipes: [(row_indices, amounts_g), ...], unit_weights_g: one per recipe.
+    """
+    if _decimal_mode(mode):
+        return _decimal_totals(batch_fixed_sums(matrix, recipes), unit_weights_g, rounding or CALC_ROUNDING)
+    per_unit, per_100g = batch_values(matrix, recipes, unit_weights_g)
+    results = []
+    for unit_row, row_100g in zip(per_unit.tolist(), per_100g.tolist()):
+        results.append(_rounded_totals(dict(zip(TOTAL_KEYS, unit_row)), dict(zip(TOTAL_KEYS, row_100g))))
+    return results
+
+
+# --- decimal mode ----------------------------------------------------------------
+# Every input is an integer (value x 10^VALUE_DECIMALS, amount x 10^AMOUNT_DECIMALS),
+# so a per-unit nutrient is exactly X / 10^_SCALE with
+#   X = sum(amount_i * value_i)    (the / 100 of the per-100g basis is in _SCALE)
+# kcal is the same integer combination of X as calc_kcal, and per 100g is
+#   X * 100 / W = X / (W_fixed * 10^VALUE_DECIMALS).
+# Rounding divides those integers, so no binary fraction is ever rounded.
+_SCALE = VALUE_DECIMALS + AMOUNT_DECIMALS + 2
+# Sums stay int64 below this (headroom for the kcal combination); above, Python ints
+_INT64_SAFE = 2.0 ** 58
+
+
+def _decimal_mode(mode: Optional[str]) -> bool:
+    mode = mode or CALC_MODE
+    if mode not in ("float", "decimal"):
+        raise ValueError(f"unknown calculation mode: {mode!r}")
+    return mode == "decimal"
+
+
+def _to_fixed(x: float, decimals: int) -> int:
+    """x as it was typed (its shortest repr) in units of 10^-decimals, half-up beyond them."""
+    scale = 10 ** decimals
+    k = round(x * scale)
+    # k / 10^d is the nearest double to the decimal k / 10^d: equal means x is that decimal
+    if k / scale == x:
+        return k
+    from decimal import ROUND_HALF_UP, Decimal
+
+    return int(Decimal(repr(float(x))).scaleb(decimals).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def _to_fixed_array(values, decimals: int) -> np.ndarray:
+    """_to_fixed for every element, vectorized for values with at most `decimals` decimals."""
+    import numpy as np
+
+    values = np.asarray(values, dtype=np.float64)
+    scale = float(10 ** decimals)
+    with np.errstate(invalid="ignore"):
+        k = np.round(values * scale)
+        exact = k / scale == values
+    out = np.where(exact, k, 0.0).astype(np.int64)
+    for i in np.flatnonzero(~exact).tolist():
+        out.flat[i] = _to_fixed(float(values.flat[i]), decimals)
+    return out
+
+
+def _fixed(text: str) -> int:
+    """"0.5" -> 5000: a limit or step in units of 10^-VALUE_DECIMALS."""
+    whole, _, frac = text.partition(".")
+    if len(frac) > VALUE_DECIMALS:
+        raise ValueError(f"rounding finer than 10^-{VALUE_DECIMALS}: {text}")
+    return int(whole + frac.ljust(VALUE_DECIMALS, "0"))
+
+
+@lru_cache(maxsize=None)
+def _rounding_rules(rounding: str) -> tuple:
+    """
+    (zero limits, [(band upper limits, band steps), ...]) as int64 arrays with
+    one entry per TOTAL_KEYS column, all in units of 10^-VALUE_DECIMALS. A
+    column without a zero limit has 0; the last band has no upper limit and
+    padding bands have -1 (never chosen).
+    """
+    import numpy as np
+
+    units = {key: unit for key, _, unit in NUTRIENTS_ORDER}
+    if rounding in ("half_up", "half_even"):
+        decimals = {"kcal": ROUND_KCAL, "mg": ROUND_MG}
+        bands = {}
+        for key in TOTAL_KEYS:
+            d = decimals.get(units[key], ROUND_G)
+            bands[key] = ("0", [(None, f"{10 ** -d:.{d}f}")])
+    elif rounding == "regulatory":
+        bands = REGULATORY_BANDS
+    else:
+        raise ValueError(f"unknown rounding rule: {rounding!r}")
+    depth = max(len(bands[key][1]) for key in TOTAL_KEYS)
+    zero = np.array([_fixed(bands[key][0]) for key in TOTAL_KEYS], dtype=np.int64)
+    # Padded at the front, so the last band of every column lines up
+    padded = [[(None, bands[key][1][0][1])] * (depth - len(bands[key][1])) + bands[key][1] for key in TOTAL_KEYS]
+    table = []
+    for b in range(depth):
+        upper = np.array([-1 if rows[b][0] is None else _fixed(rows[b][0]) for rows in padded], dtype=np.int64)
+        step = np.array([_fixed(rows[b][1]) for rows in padded], dtype=np.int64)
+        table.append((upper, step))
+    return zero, table
+
+
+def _round_fixed(x: np.ndarray, q: np.ndarray, rounding: str) -> np.ndarray:
+    """
+    Label values x / (q * 10^VALUE_DECIMALS) as floats; x: (rows x TOTAL_KEYS)
+    integers, q: one positive integer per row. Limits and steps are compared
+    and divided on the integers, so the value is never a binary fraction.
+    """
+    import numpy as np
+
+    zero, table = _rounding_rules(rounding)
+    a = np.abs(x)
+    q = q[:, None]
+    # The last band applies above every earlier limit; go down through the rest
+    step = np.broadcast_to(table[-1][1], a.shape)
+    for upper, band_step in reversed(table[:-1]):
+        step = np.where(a <= upper * q, band_step, step)
+    den = step * q
+    n = a // den
+    twice = 2 * (a - n * den)
+    if rounding == "half_even":
+        n = n + ((twice > den) | ((twice == den) & (n % 2 == 1)))
+    else:
+        n = n + (twice >= den)
+    # n * step and 10^VALUE_DECIMALS are exact doubles: one correctly rounded division
+    out = np.asarray(n * step, dtype=np.float64) / float(10 ** VALUE_DECIMALS)
+    out = np.where(a < zero * q, 0.0, out)
+    return np.where(x < 0, -out, out)
+
+
+def _decimal_totals(sums: np.ndarray, unit_weights_g: Sequence[float], rounding: str) -> List[Dict[str, Any]]:
+    """compute_totals result dicts from fixed sums (recipes x NUTRIENT_FIELDS integers)."""
+    import numpy as np
+
+    col = {key: j for j, (key, _) in enumerate(NUTRIENT_FIELDS)}
+    carbs, fiber, allulose = sums[:, col["carbs_g"]], sums[:, col["fiber_g"]], sums[:, col["allulose_g"]]
+    protein, fat = sums[:, col["protein_g"]], sums[:, col["fat_g"]]
+    # calc_kcal on exact integers
+    digestible = np.maximum(carbs - fiber - allulose, 0)
+    kcal = 4 * digestible + 2 * fiber + 4 * protein + 9 * fat
+    x = np.column_stack([kcal, sums])
+
+    n = len(x)
+    weights = _to_fixed_array(np.asarray(unit_weights_g, dtype=np.float64).reshape(-1), AMOUNT_DECIMALS)
+    valid = weights > 0
+    # per unit: x / 10^_SCALE; per 100g: x * 100 / W = x / (W_fixed * 10^VALUE_DECIMALS)
+    q = np.concatenate([np.full(n, 10 ** (_SCALE - VALUE_DECIMALS), dtype=np.int64), np.where(valid, weights, 1)])
+    both = np.concatenate([x, np.where(valid[:, None], x, 0)])
+    rounded = _round_fixed(both, q, rounding)
+    raw = np.asarray(both, dtype=np.float64) / (q * 10 ** VALUE_DECIMALS).astype(np.float64)[:, None]
+
+    results = []
+    for unit_row, row_100g, raw_unit_row, raw_100g_row in zip(
+        rounded[:n].tolist(), rounded[n:].tolist(), raw[:n].tolist(), raw[n:].tolist()
+    ):
+        results.append({
+            "order": NUTRIENTS_ORDER,
+            "per_unit": dict(zip(TOTAL_KEYS, unit_row)),
+            "per_100g": dict(zip(TOTAL_KEYS, row_100g)),
+            "raw_per_unit": dict(zip(TOTAL_KEYS, raw_unit_row)),
+            "raw_per_100g": dict(zip(TOTAL_KEYS, raw_100g_row)),
+        })
+    return results
+
+
+def _exact_ints(amounts: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fixed amounts (recipes x items) and values (rows x NUTRIENT_FIELDS) as
+    int64, or as Python ints (object arrays) if a recipe's sum could overflow int64.
+    """
+    import numpy as np
+
+    bound = float(np.abs(amounts).sum(axis=1).max(initial=0)) * float(np.abs(values).max(initial=0))
+    if bound >= _INT64_SAFE:
+        return amounts.astype(object), values.astype(object)
+    return amounts, values
+
+
+def _compute_totals_decimal(items: List[Dict[str, Any]], unit_weight_g: float, rounding: str) -> Dict[str, Any]:
+    import numpy as np
+
+    values = np.array(
+        [[float(getattr(it["ingredient"], col) or 0.0) for _, col in NUTRIENT_FIELDS] for it in items],
+        dtype=np.float64,
+    ).reshape(len(items), len(NUTRIENT_FIELDS))
+    amounts = np.array([[float(it["amount_g"] or 0.0) for it in items]], dtype=np.float64)
+    amounts, values = _exact_ints(
+        _to_fixed_array(amounts, AMOUNT_DECIMALS), _to_fixed_array(values, VALUE_DECIMALS)
+    )
+    return _decimal_totals(amounts @ values, [float(unit_weight_g or 0.0)], rounding)[0]
+
+
+def batch_fixed_sums(
+    matrix: NutrientMatrix,
+    recipes: Sequence[Tuple[Sequence[int], Sequence[float]]],
+) -> np.ndarray:
+    """
+    batch_sums in decimal mode: exact per-unit sums as integers X (the sum is
+    X / 10^_SCALE). int64, or Python ints (object array) if one could overflow.
+    """
+    import numpy as np
+
+    n = len(recipes)
+    length = max((len(rows) for rows, _ in recipes), default=0)
+    idx = np.zeros((n, length), dtype=np.intp)
+    amounts_g = np.zeros((n, length), dtype=np.float64)
+    for r, (rows, amounts) in enumerate(recipes):
+        rows = np.asarray(rows, dtype=np.intp)
+        keep = rows >= 0
+        k = int(keep.sum())
+        idx[r, :k] = rows[keep]
+        amounts_g[r, :k] = np.asarray(amounts, dtype=np.float64)[keep]
+    amounts_fixed = _to_fixed_array(amounts_g, AMOUNT_DECIMALS)
+
+    if len(matrix) == 0:
+        return np.zeros((n, len(NUTRIENT_FIELDS)), dtype=np.int64)
+    amounts_fixed, values = _exact_ints(amounts_fixed, matrix.fixed_values())
+    sums = np.zeros((n, len(NUTRIENT_FIELDS)), dtype=amounts_fixed.dtype)
+    for j in range(length):
+        # integer products: any order gives the same sum
+        sums += amounts_fixed[:, j, None] * values[idx[:, j]]
+    return sums
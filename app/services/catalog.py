@@ -0,0 +1,423 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import MappingProxyType
+from typing import Callable, Dict, Any, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import event, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..models import Ingredient, CatalogMeta, IngredientChange
+from .calc import NutrientMatrix
+
+# How often (seconds) a worker re-reads the catalog version from the DB.
+# Between checks the cached catalog is served without touching the DB at all;
+# edits made in this process invalidate immediately, edits in other uvicorn
+# workers are picked up within this interval.
+CATALOG_CHECK_INTERVAL = float(os.getenv("CATALOG_CHECK_INTERVAL", "2.0"))
+
+# A reload that covers at most this many journal entries only re-reads the
+# changed rows and patches the cached catalog; more than that reloads it all.
+CATALOG_PATCH_MAX_CHANGES = int(os.getenv("CATALOG_PATCH_MAX_CHANGES", "1000"))
+
+# Most journal entries returned by one read_ingredient_changes() call
+CHANGES_PAGE_MAX = 5000
+
+_META_ID = 1
+
+# derived() keys built with a patch function: carried over to a patched catalog
+_PATCHABLE_KEYS: set = set()
+
+
+@dataclass(frozen=True)
+class IngredientSnapshot:
+    """Read-only copy of an Ingredient row (same attribute names as the model)."""
+
+    id: int
+    display_name: str
+    name: str
+    brand: str
+    base_g: float
+    sodium_mg_100g: float
+    carbs_g_100g: float
+    sugars_g_100g: float
+    fiber_g_100g: float
+    allulose_g_100g: float
+    fat_g_100g: float
+    trans_fat_g_100g: float
+    sat_fat_g_100g: float
+    chol_mg_100g: float
+    protein_g_100g: float
+    memo: str
+
+    @classmethod
+    def from_row(cls, ing: Ingredient) -> "IngredientSnapshot":
+        return cls(
+            id=ing.id,
+            display_name=ing.display_name or "",
+            name=ing.name or "",
+            brand=ing.brand or "",
+            base_g=float(ing.base_g or 100.0),
+            sodium_mg_100g=float(ing.sodium_mg_100g or 0.0),
+            carbs_g_100g=float(ing.carbs_g_100g or 0.0),
+            sugars_g_100g=float(ing.sugars_g_100g or 0.0),
+            fiber_g_100g=float(ing.fiber_g_100g or 0.0),
+            allulose_g_100g=float(ing.allulose_g_100g or 0.0),
+            fat_g_100g=float(ing.fat_g_100g or 0.0),
+            trans_fat_g_100g=float(ing.trans_fat_g_100g or 0.0),
+            sat_fat_g_100g=float(ing.sat_fat_g_100g or 0.0),
+            chol_mg_100g=float(ing.chol_mg_100g or 0.0),
+            protein_g_100g=float(ing.protein_g_100g or 0.0),
+            memo=ing.memo or "",
+        )
+
+
+@dataclass(frozen=True)
+class Catalog:
+    version: int
+    # Display order (Ingredient.sort_key)
+    ingredients: Tuple[IngredientSnapshot, ...]
+    by_id: Mapping[int, IngredientSnapshot]
+    # (Ingredient.sort_key, id) per entry of ingredients, for patching in place
+    order_keys: Tuple[Tuple[str, int], ...] = ()
+    # Structures built from this snapshot (search index, ...), see derived()
+    _derived: Dict[str, Any] = field(default_factory=dict, repr=False, compare=False)
+    # Patchable derived values of the catalog this one was patched from:
+    # key -> (value, ids changed since that value was built)
+    _carried: Dict[str, Tuple[Any, FrozenSet[int]]] = field(default_factory=dict, repr=False, compare=False)
+
+    def get(self, ingredient_id: int) -> Optional[IngredientSnapshot]:
+        return self.by_id.get(ingredient_id)
+
+    def derived(
+        self,
+        key: str,
+        build: Callable[["Catalog"], Any],
+        patch: Optional[Callable[[Any, "Catalog", FrozenSet[int]], Any]] = None,
+    ) -> Any:
+        """
+        Build-once value tied to this catalog version (dropped with it on reload).
+        With patch, a value built for an older version is carried over when the
+        catalog is patched and patch(old_value, catalog, changed_ids) is called
+        instead of build; it must not modify old_value (readers may still use it).
+        """
+        value = self._derived.get(key)
+        if value is None:
+            carried = None
+            if patch is not None:
+                _PATCHABLE_KEYS.add(key)
+                carried = self._carried.get(key)
+            if carried is not None:
+                value = patch(carried[0], self, carried[1])
+            else:
+                value = build(self)
+            value = self._derived.setdefault(key, value)
+            self._carried.pop(key, None)
+        return value
+
+
+class CatalogCache:
+    """
+    Process-wide cache of the ingredient catalog, keyed by CatalogMeta.version.
+    Writers call mark_catalog_changed() inside their transaction; readers call get().
+    """
+
+    def __init__(self, check_interval: float = CATALOG_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._async_lock = asyncio.Lock()
+        self._catalog: Optional[Catalog] = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.patches = 0
+        self.version_checks = 0
+        self.invalidations = 0
+
+    def _fresh(self) -> Optional[Catalog]:
+        catalog = self._catalog
+        if catalog is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return catalog
+        return None
+
+    def _refresh(self, db: Session) -> Catalog:
+        # Callers serialize this (thread lock for sync, asyncio lock for async).
+        catalog = self._fresh()
+        if catalog is not None:
+            self.hits += 1
+            return catalog
+
+        catalog = self._catalog
+        if catalog is not None:
+            self.version_checks += 1
+            if read_catalog_version(db) == catalog.version:
+                self._checked_at = time.monotonic()
+                self.hits += 1
+                return catalog
+            self.reloads += 1
+            patched = _patch_catalog(db, catalog)
+            if patched is not None:
+                self.patches += 1
+                self._catalog = patched
+                self._checked_at = time.monotonic()
+                return patched
+
+        self.misses += 1
+        catalog = _load_catalog(db)
+        self._catalog = catalog
+        self._checked_at = time.monotonic()
+        return catalog
+
+    def get(self, db: Session) -> Catalog:
+        catalog = self._fresh()
+        if catalog is not None:
+            self.hits += 1
+            return catalog
+        with self._lock:
+            return self._refresh(db)
+
+    async def get_async(self, adb: AsyncSession) -> Catalog:
+        catalog = self._fresh()
+        if catalog is not None:
+            self.hits += 1
+            return catalog
+        # Not the thread lock: it would be held across awaits on the event loop thread.
+        # A sync and an async refresh may overlap; both load the same rows.
+        async with self._async_lock:
+            return await adb.run_sync(self._refresh)
+
+    def expire(self) -> None:
+        """Check the version on the next get(); a journaled change is then patched in."""
+        with self._lock:
+            if self._catalog is not None:
+                self.invalidations += 1
+            self._checked_at = float("-inf")
+
+    def invalidate(self) -> None:
+        """Drop the cached catalog; the next get() reloads from the DB."""
+        with self._lock:
+            if self._catalog is not None:
+                self.invalidations += 1
+            self._catalog = None
+
+    def stats(self) -> Dict[str, Any]:
+        catalog = self._catalog
+        return {
+            "version": catalog.version if catalog is not None else None,
+            "size": len(catalog.ingredients) if catalog is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+            "patches": self.patches,
+            "version_checks": self.version_checks,
+            "invalidations": self.invalidations,
+            "check_interval": self.check_interval,
+        }
+
+
+def read_catalog_version(db: Session) -> int:
+    version = db.execute(select(CatalogMeta.version).where(CatalogMeta.id == _META_ID)).scalar()
+    return int(version or 0)
+
+
+def _load_catalog(db: Session) -> Catalog:
+    # Version first: if a writer commits between the two reads we cache newer rows
+    # under the older version, which only costs one extra reload later.
+    version = read_catalog_version(db)
+    rows = db.query(Ingredient).order_by(Ingredient.sort_key, Ingredient.id).all()
+    ingredients = tuple(IngredientSnapshot.from_row(ing) for ing in rows)
+    by_id = MappingProxyType({ing.id: ing for ing in ingredients})
+    order_keys = tuple((ing.sort_key or "", ing.id) for ing in rows)
+    return Catalog(version=version, ingredients=ingredients, by_id=by_id, order_keys=order_keys)
+
+
+def _patch_catalog(db: Session, catalog: Catalog) -> Optional[Catalog]:
+    """
+    Bring catalog up to date from the change journal: only the ingredients
+    changed since catalog.version are read. None when that is not possible
+    (a reset entry, a version without journal entries, too many changes);
+    the caller then reloads everything.
+    """
+    changes = db.execute(
+        select(IngredientChange.catalog_version, IngredientChange.ingredient_id, IngredientChange.op)
+        .where(IngredientChange.catalog_version > catalog.version)
+        .order_by(IngredientChange.seq)
+        .limit(CATALOG_PATCH_MAX_CHANGES + 1)
+    ).all()
+    if not changes or len(changes) > CATALOG_PATCH_MAX_CHANGES:
+        return None
+    versions = {version for version, _, _ in changes}
+    version = max(versions)
+    if versions != set(range(catalog.version + 1, version + 1)):
+        return None
+    if any(op == "reset" or iid is None for _, iid, op in changes):
+        return None
+
+    changed = {iid for _, iid, _ in changes}
+    rows = db.query(Ingredient).filter(Ingredient.id.in_(changed)).all()
+    fresh = sorted(((ing.sort_key or "", ing.id), IngredientSnapshot.from_row(ing)) for ing in rows)
+
+    kept = (
+        (key, ing) for key, ing in zip(catalog.order_keys, catalog.ingredients) if ing.id not in changed
+    )
+    merged = list(heapq.merge(kept, fresh, key=lambda pair: pair[0]))
+    ingredients = tuple(ing for _, ing in merged)
+    by_id = dict(catalog.by_id)
+    for iid in changed:
+        by_id.pop(iid, None)
+    for _, ing in fresh:
+        by_id[ing.id] = ing
+
+    changed = frozenset(changed)
+    carried = {}
+    for key in tuple(_PATCHABLE_KEYS):
+        value = catalog._derived.get(key)
+        if value is not None:
+            carried[key] = (value, changed)
+            continue
+        earlier = catalog._carried.get(key)
+        if earlier is not None:
+            carried[key] = (earlier[0], earlier[1] | changed)
+    return Catalog(
+        version=version,
+        ingredients=ingredients,
+        by_id=MappingProxyType(by_id),
+        order_keys=tuple(key for key, _ in merged),
+        _carried=carried,
+    )
+
+
+_cache = CatalogCache()
+
+
+def get_catalog(db: Session) -> Catalog:
+    return _cache.get(db)
+
+
+async def get_catalog_async(adb: AsyncSession) -> Catalog:
+    return await _cache.get_async(adb)
+
+
+def get_nutrient_matrix(catalog: Catalog) -> NutrientMatrix:
+    return catalog.derived("nutrient_matrix", lambda c: NutrientMatrix(c.ingredients))
+
+
+def invalidate_catalog() -> None:
+    _cache.invalidate()
+
+
+def expire_catalog() -> None:
+    _cache.expire()
+
+
+def catalog_stats() -> Dict[str, Any]:
+    return _cache.stats()
+
+
+def mark_catalog_changed(db: Session, upserted: Iterable[int] = (), deleted: Iterable[int] = ()) -> int:
+    """
+    Bump the shared catalog version inside the caller's transaction and append
+    the changed ingredient ids to the change journal under that version.
+    Without ids the change is journaled as a reset (everything may have
+    changed, e.g. after editing the DB by hand).
+
+    Call it after the ingredient rows are written (new rows need their id)
+    and right before committing. The version row stays locked until commit,
+    so journal seq numbers are handed out in commit order.
+
+    Once that transaction commits, the local cache re-checks the version on
+    its next use; other workers notice the new version on their next check.
+    """
+    result = db.execute(
+        update(CatalogMeta).where(CatalogMeta.id == _META_ID).values(version=CatalogMeta.version + 1)
+    )
+    if result.rowcount == 0:
+        db.add(CatalogMeta(id=_META_ID, version=1))
+        db.flush()
+    version = read_catalog_version(db)
+
+    now = datetime.utcnow()
+    entries = [
+        {"catalog_version": version, "ingredient_id": int(iid), "op": "upsert", "changed_at": now}
+        for iid in upserted
+    ]
+    entries += [
+        {"catalog_version": version, "ingredient_id": int(iid), "op": "delete", "changed_at": now}
+        for iid in deleted
+    ]
+    if not entries:
+        entries = [{"catalog_version": version, "ingredient_id": None, "op": "reset", "changed_at": now}]
+    db.execute(insert(IngredientChange), entries)
+
+    db.info["catalog_changed"] = True
+    return version
+
+
+def read_ingredient_changes(db: Session, since: Optional[int], limit: int = 1000) -> Dict[str, Any]:
+    """
+    Journal entries after seq `since`, collapsed per ingredient to its current
+    state: "upserted" holds full rows (IngredientSnapshot fields), "deleted"
+    ingredient ids. Continue from "next" while "has_more" is true.
+    "reset" means the changes cannot be replayed (since=None for a client that
+    has not synced yet, or a reset entry in range): fetch the whole catalog,
+    then continue from "next".
+    """
+    limit = max(1, min(limit, CHANGES_PAGE_MAX))
+    latest = int(db.execute(select(func.max(IngredientChange.seq))).scalar() or 0)
+    if since is None:
+        return {"since": since, "next": latest, "latest": latest, "has_more": False,
+                "reset": True, "upserted": [], "deleted": []}
+
+    changes = db.execute(
+        select(IngredientChange.seq, IngredientChange.ingredient_id, IngredientChange.op)
+        .where(IngredientChange.seq > since)
+        .order_by(IngredientChange.seq)
+        .limit(limit + 1)
+    ).all()
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    next_seq = changes[-1][0] if changes else since
+    latest = max(latest, next_seq)
+    if any(op == "reset" for _, _, op in changes):
+        return {"since": since, "next": next_seq, "latest": latest, "has_more": has_more,
+                "reset": True, "upserted": [], "deleted": []}
+
+    # Last entry per ingredient wins; upserts are answered with the row as it is now
+    last_op: Dict[int, str] = {}
+    for _, iid, op in changes:
+        last_op[iid] = op
+    upsert_ids = [iid for iid, op in last_op.items() if op == "upsert"]
+    rows = db.query(Ingredient).filter(Ingredient.id.in_(upsert_ids)).all() if upsert_ids else []
+    upserted = [IngredientSnapshot.from_row(ing) for ing in rows]
+    found = {ing.id for ing in upserted}
+    deleted: List[int] = sorted(
+        iid for iid, op in last_op.items() if op == "delete" or (op == "upsert" and iid not in found)
+    )
+    return {
+        "since": since,
+        "next": next_seq,
+        "latest": latest,
+        "has_more": has_more,
+        "reset": False,
+        "upserted": sorted(upserted, key=lambda ing: ing.id),
+        "deleted": deleted,
+    }
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    if session.info.pop("catalog_changed", False):
+        expire_catalog()
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session) -> None:
+    session.info.pop("catalog_changed", None)
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import csv
+import io
+import tempfile
+from typing import Iterator, Tuple
+
+from sqlalchemy import select
+
+from ..db import SessionLocal
+from ..models import Ingredient
+
+EXPORT_COLUMNS = [
+    "display_name",
+    "name",
+    "brand",
+    "base_g",
+    "sodium_mg_100g",
+    "carbs_g_100g",
+    "sugars_g_100g",
+    "fiber_g_100g",
+    "allulose_g_100g",
+    "fat_g_100g",
+    "trans_fat_g_100g",
+    "sat_fat_g_100g",
+    "chol_mg_100g",
+    "protein_g_100g",
+    "memo",
+]
+
+# Rows fetched per DB round trip / written per chunk
+EXPORT_BATCH_SIZE = 1000
+# Bytes per chunk when streaming a finished file (xlsx, parquet)
+_FILE_CHUNK = 64 * 1024
+
+
+def iter_ingredient_rows(batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Tuple]:
+    """
+    Plain column tuples in id order, fetched batch_size at a time (server-side
+    cursor on Postgres). Opens its own session: a StreamingResponse body runs
+    after the request's dependencies have been closed.
+    """
+    stmt = (
+        select(*[getattr(Ingredient, c) for c in EXPORT_COLUMNS])
+        .order_by(Ingredient.id)
+        .execution_options(yield_per=batch_size)
+    )
+    with SessionLocal() as db:
+        for row in db.execute(stmt):
+            yield tuple(row)
+
+
+def stream_csv() -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    # BOM so Excel opens the Korean text as UTF-8
+    yield "\ufeff".encode("utf-8")
+    writer.writerow(EXPORT_COLUMNS)
+    pending = 0
+    for row in iter_ingredient_rows():
+        writer.writerow(row)
+        pending += 1
+        if pending >= EXPORT_BATCH_SIZE:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+            pending = 0
+    yield buf.getvalue().encode("utf-8")
+
+
+def _stream_file(f) -> Iterator[bytes]:
+    f.seek(0)
+    try:
+        while True:
+            chunk = f.read(_FILE_CHUNK)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        f.close()
+
+
+def stream_xlsx() -> Iterator[bytes]:
+    """
+    openpyxl write-only mode: rows go straight to a temp file instead of being
+    kept as cell objects. The zip container is only complete after save(), so
+    the file is streamed once all rows are written.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("ingredients")
+    ws.append(EXPORT_COLUMNS)
+    for row in iter_ingredient_rows():
+        ws.append(row)
+
+    out = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    wb.save(out)
+    yield from _stream_file(out)
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def stream_parquet() -> Iterator[bytes]:
+    """One row group per EXPORT_BATCH_SIZE rows (needs pyarrow)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        (c, pa.string() if c in ("display_name", "name", "brand", "memo") else pa.float64())
+        for c in EXPORT_COLUMNS
+    ])
+    out = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    writer = pq.ParquetWriter(out, schema)
+    batch = []
+
+    def write(rows):
+        columns = list(zip(*rows))
+        writer.write_batch(pa.record_batch([pa.array(col, type=f.type) for col, f in zip(columns, schema)], schema=schema))
+
+    for row in iter_ingredient_rows():
+        batch.append(row)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            write(batch)
+            batch = []
+    if batch:
+        write(batch)
+    writer.close()
+    yield from _stream_file(out)
+
+
+EXPORT_FORMATS = {
+    "xlsx": (stream_xlsx, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": (stream_csv, "text/csv; charset=utf-8"),
+    "parquet": (stream_parquet, "application/vnd.apache.parquet"),
+}
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import base64
+import json
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, func, literal_column, or_, select, text, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from ..models import Ingredient
+
+# Columns covered by the search index
+SEARCH_COLUMNS = ("name", "brand", "display_name", "memo")
+
+# SQLite: FTS5 table with the trigram tokenizer (substring matching, so it
+# also works for Korean without word segmentation), kept in sync by triggers.
+_FTS_TABLE = "ingredients_fts"
+_SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {_FTS_TABLE} USING fts5(
+        name, brand, display_name, memo,
+        content='ingredients', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS ingredients_fts_ai AFTER INSERT ON ingredients BEGIN
+        INSERT INTO {_FTS_TABLE}(rowid, name, brand, display_name, memo)
+        VALUES (new.id, new.name, new.brand, new.display_name, new.memo);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS ingredients_fts_ad AFTER DELETE ON ingredients BEGIN
+        INSERT INTO {_FTS_TABLE}({_FTS_TABLE}, rowid, name, brand, display_name, memo)
+        VALUES ('delete', old.id, old.name, old.brand, old.display_name, old.memo);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS ingredients_fts_au AFTER UPDATE ON ingredients BEGIN
+        INSERT INTO {_FTS_TABLE}({_FTS_TABLE}, rowid, name, brand, display_name, memo)
+        VALUES ('delete', old.id, old.name, old.brand, old.display_name, old.memo);
+        INSERT INTO {_FTS_TABLE}(rowid, name, brand, display_name, memo)
+        VALUES (new.id, new.name, new.brand, new.display_name, new.memo);
+    END""",
+]
+# Trigram index only helps terms of at least 3 characters
+_MIN_MATCH_CHARS = 3
+
+# Postgres: pg_trgm GIN index over one immutable expression; ILIKE on exactly
+# this expression is answered from the index.
+_PG_SEARCH_EXPR = (
+    "(coalesce(name, '') || ' ' || coalesce(brand, '') || ' ' || "
+    "coalesce(display_name, '') || ' ' || coalesce(memo, ''))"
+)
+_PG_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS ix_ingredients_search_trgm ON ingredients USING gin ({_PG_SEARCH_EXPR} gin_trgm_ops)",
+]
+
+
+def ensure_search_index(engine) -> bool:
+    """Create the full-text index if missing (called from init_db). False if unavailable."""
+    dialect = engine.dialect.name
+    try:
+        if dialect == "sqlite":
+            with engine.begin() as conn:
+                exists = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type='table' AND name=:n"), {"n": _FTS_TABLE}
+                ).first()
+                for ddl in _SQLITE_DDL:
+                    conn.exec_driver_sql(ddl)
+                if not exists:
+                    # Index the rows that were there before the table existed
+                    conn.exec_driver_sql(f"INSERT INTO {_FTS_TABLE}({_FTS_TABLE}) VALUES ('rebuild')")
+            return True
+        if dialect == "postgresql":
+            with engine.begin() as conn:
+                for ddl in _PG_DDL:
+                    conn.exec_driver_sql(ddl)
+            return True
+    except SQLAlchemyError as e:
+        print(f"⚠️ 검색 인덱스 생성 실패 (LIKE 검색으로 동작): {e.__class__.__name__}")
+    return False
+
+
+def _has_fts(db: Session) -> bool:
+    cached = db.info.get("has_fts")
+    if cached is None:
+        cached = db.get_bind().dialect.name == "sqlite" and db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type='table' AND name=:n"), {"n": _FTS_TABLE}
+        ).first() is not None
+        db.info["has_fts"] = cached
+    return cached
+
+
+def _like(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _fts_phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def search_filter(db: Session, q: str):
+    """
+    WHERE clause for ingredients matching every whitespace-separated term of q
+    (case-insensitive substring in any of SEARCH_COLUMNS); None for an empty q.
+    """
+    terms = (q or "").split()
+    if not terms:
+        return None
+    dialect = db.get_bind().dialect.name
+    clauses = []
+
+    if dialect == "postgresql":
+        expr = literal_column(_PG_SEARCH_EXPR)
+        clauses = [expr.ilike(_like(t), escape="\\") for t in terms]
+        return and_(*clauses)
+
+    indexed = [t for t in terms if len(t) >= _MIN_MATCH_CHARS] if _has_fts(db) else []
+    if indexed:
+        match = " AND ".join(_fts_phrase(t) for t in indexed)
+        fts_ids = select(literal_column("rowid")).select_from(text(_FTS_TABLE)).where(
+            text(f"{_FTS_TABLE} MATCH :fts_query").bindparams(fts_query=match)
+        )
+        clauses.append(Ingredient.id.in_(fts_ids))
+    for t in terms:
+        if t in indexed:
+            continue
+        # Too short for the trigram index: plain scan. SQLite's LIKE already
+        # ignores ASCII case; ilike() would add a lower() call per column and row.
+        clauses.append(or_(*[getattr(Ingredient, c).like(_like(t), escape="\\") for c in SEARCH_COLUMNS]))
+    return and_(*clauses)
+
+
+def encode_cursor(sort_key: str, ingredient_id: int) -> str:
+    raw = json.dumps([sort_key, ingredient_id], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, int]]:
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_key, ingredient_id = json.loads(raw.decode("utf-8"))
+        return str(sort_key), int(ingredient_id)
+    except (ValueError, TypeError):
+        return None
+
+
+@dataclass
+class IngredientPage:
+    items: List[Ingredient]
+    total: int
+    # Cursors for the neighbouring pages (None at either end)
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+
+def search_page(
+    db: Session,
+    q: str = "",
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: int = 50,
+    with_total: bool = True,
+) -> IngredientPage:
+    """
+    One page of ingredients in display order (sort_key, id), optionally
+    filtered by search_filter(q). Keyset pagination: `after` / `before` are
+    cursors from a previous page, so every page costs the same index range
+    scan regardless of how deep it is.
+    """
+    where = search_filter(db, q)
+    order = tuple_(Ingredient.sort_key, Ingredient.id)
+    stmt = select(Ingredient)
+    if where is not None:
+        stmt = stmt.where(where)
+
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before) if after_key is None else None
+    if before_key is not None:
+        stmt = stmt.where(order < tuple_(*before_key)).order_by(Ingredient.sort_key.desc(), Ingredient.id.desc())
+    else:
+        if after_key is not None:
+            stmt = stmt.where(order > tuple_(*after_key))
+        stmt = stmt.order_by(Ingredient.sort_key, Ingredient.id)
+
+    rows = list(db.execute(stmt.limit(limit + 1)).scalars())
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if before_key is not None:
+        rows.reverse()
+
+    if before_key is not None:
+        has_next, has_prev = True, more
+    else:
+        has_next, has_prev = more, after_key is not None
+
+    total = -1
+    if with_total:
+        count = select(func.count()).select_from(Ingredient)
+        if where is not None:
+            count = count.where(where)
+        total = int(db.execute(count).scalar() or 0)
+
+    return IngredientPage(
+        items=rows,
+        total=total,
+        next_cursor=encode_cursor(rows[-1].sort_key or "", rows[-1].id) if rows and has_next else None,
+        prev_cursor=encode_cursor(rows[0].sort_key or "", rows[0].id) if rows and has_prev else None,
+    )
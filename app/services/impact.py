@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from ..db import SessionLocal
+from ..models import Ingredient, ImpactReport, Recipe, RecipeItem
+from .calc import (
+    CALC_MODE,
+    NUTRIENT_FIELDS,
+    NUTRIENTS_ORDER,
+    TOTAL_KEYS,
+    NutrientMatrix,
+    _r,
+    batch_values,
+    compute_totals_batch,
+)
+from .recipes import NutrientValues
+
+# Nutrition claim cut-offs on the rounded per-100g label value ("below limit"
+# qualifies). A change that moves a recipe across one is reported separately.
+CLAIM_THRESHOLDS = [
+    ("kcal", 40.0, "저열량"),
+    ("kcal", 4.0, "무열량"),
+    ("sodium_mg", 120.0, "저나트륨"),
+    ("sodium_mg", 5.0, "무나트륨"),
+    ("sugars_g", 5.0, "저당류"),
+    ("sugars_g", 0.5, "무당류"),
+    ("fat_g", 3.0, "저지방"),
+    ("fat_g", 0.5, "무지방"),
+    ("trans_fat_g", 0.5, "트랜스지방 0.5g 미만"),
+    ("trans_fat_g", 0.2, "트랜스지방 0"),
+    ("sat_fat_g", 1.5, "저포화지방"),
+    ("sat_fat_g", 0.1, "무포화지방"),
+    ("chol_mg", 20.0, "저콜레스테롤"),
+    ("chol_mg", 5.0, "무콜레스테롤"),
+]
+
+# Most ids per IN (...) clause; SQLite caps bound parameters per statement
+IN_CHUNK = 500
+
+BASES = ("per_unit", "per_100g")
+_LABELS = {key: label for key, label, _ in NUTRIENTS_ORDER}
+_UNITS = {key: unit for key, _, unit in NUTRIENTS_ORDER}
+
+
+def _chunks(ids: Iterable[int]) -> Iterable[List[int]]:
+    ids = sorted(set(ids))
+    for i in range(0, len(ids), IN_CHUNK):
+        yield ids[i:i + IN_CHUNK]
+
+
+def capture_values(db: Session, ingredient_ids: Iterable[int]) -> Dict[int, NutrientValues]:
+    """Current values of the given ingredients (missing ones are left out)."""
+    columns = [getattr(Ingredient, col) for _, col in NUTRIENT_FIELDS]
+    values: Dict[int, NutrientValues] = {}
+    for chunk in _chunks(ingredient_ids):
+        for iid, *row in db.connection().execute(select(Ingredient.id, *columns).where(Ingredient.id.in_(chunk))):
+            values[iid] = tuple(float(v or 0.0) for v in row)
+    return values
+
+
+def enqueue_impact_analysis(
+    db: Session, trigger: str, before: Dict[int, Optional[NutrientValues]]
+) -> ImpactReport:
+    """
+    Add a pending report for ingredients whose values were before[id] (None:
+    the ingredient did not exist) before the change being committed. Add it
+    in the same transaction as the change and run run_impact_job(report.id)
+    after the commit. Does not commit.
+    """
+    report = ImpactReport(
+        trigger=trigger,
+        status="pending",
+        before_values=json.dumps({str(iid): values for iid, values in before.items()}),
+        ingredients_changed=len(before),
+        created_at=datetime.utcnow(),
+    )
+    db.add(report)
+    db.flush()
+    return report
+
+
+def analyze_impact(db: Session, before: Dict[int, Optional[NutrientValues]]) -> Dict[str, Any]:
+    """
+    Label values of every saved recipe using one of the changed ingredients,
+    with their values from before and as they are in the DB now. All recipes
+    are computed in one batch_values call per side (before / after) and
+    rounded with _r, so the values are exactly what compute_totals shows.
+    In decimal mode (CALC_MODE) the recipes whose unrounded values differ
+    are recomputed exactly with compute_totals_batch, one call per side.
+    """
+    recipe_ids = set()
+    for chunk in _chunks(before):
+        recipe_ids.update(db.execute(
+            select(RecipeItem.recipe_id).where(RecipeItem.ingredient_id.in_(chunk)).distinct()
+        ).scalars())
+    recipes = []
+    items: Dict[int, List[tuple]] = {}
+    for chunk in _chunks(recipe_ids):
+        recipes += db.execute(
+            select(Recipe.id, Recipe.recipe_name, Recipe.unit_weight_g).where(Recipe.id.in_(chunk))
+        ).all()
+        # Core rows (db.connection()), no ORM result processing: tens of thousands of items
+        for rid, iid, amount_g in db.connection().execute(
+            select(RecipeItem.recipe_id, RecipeItem.ingredient_id, RecipeItem.amount_g)
+            .where(RecipeItem.recipe_id.in_(chunk))
+            .order_by(RecipeItem.recipe_id, RecipeItem.position)
+        ):
+            items.setdefault(rid, []).append((iid, float(amount_g or 0.0)))
+    recipes.sort(key=lambda r: r[0])
+    if not recipes:
+        return {"ingredient_ids": sorted(before), "recipes_checked": 0, "labels_changed": 0,
+                "thresholds_crossed": 0, "recipes": []}
+
+    after_values = capture_values(db, (iid for rows in items.values() for iid, _ in rows))
+    before_values = dict(after_values)
+    for iid, values in before.items():
+        if values is None:
+            before_values.pop(iid, None)
+        else:
+            before_values[iid] = tuple(values)
+
+    import numpy as np
+
+    weights = [float(unit_weight_g or 0.0) for _, _, unit_weight_g in recipes]
+    flat_ids = np.array([iid for rid, _, _ in recipes for iid, _ in items[rid]], dtype=np.int64)
+    bounds = np.cumsum([0] + [len(items[rid]) for rid, _, _ in recipes])
+    amounts = [[amt for _, amt in items[rid]] for rid, _, _ in recipes]
+    values, batches, matrices = {}, {}, {}
+    for name, ingredient_values in (("before", before_values), ("after", after_values)):
+        matrix = NutrientMatrix.from_values(dict(sorted(ingredient_values.items())))
+        # matrix.rows() for every item at once: ids are sorted, so bisect them
+        rows = np.searchsorted(matrix.ids, flat_ids)
+        rows[rows >= len(matrix.ids)] = 0
+        rows = np.where(matrix.ids[rows] == flat_ids, rows, -1) if len(matrix.ids) else np.full_like(rows, -1)
+        batch = [(rows[bounds[r]:bounds[r + 1]], amounts[r]) for r in range(len(recipes))]
+        values[name] = batch_values(matrix, batch, weights)
+        batches[name], matrices[name] = batch, matrix
+
+    # Only unrounded values that differ can round differently; those are
+    # rounded with calc._r one by one, the rest of the label stays as it was.
+    (unit_b, per100_b), (unit_a, per100_a) = values["before"], values["after"]
+    differs = (unit_b != unit_a) | (per100_b != per100_a)
+    candidates = np.flatnonzero(differs.any(axis=1)).tolist()
+    exact = None
+    if CALC_MODE == "decimal":
+        exact = {
+            name: compute_totals_batch(
+                matrices[name], [batches[name][r] for r in candidates], [weights[r] for r in candidates]
+            )
+            for name in ("before", "after")
+        }
+    changed = []
+    crossed_count = 0
+    for i, r in enumerate(candidates):
+        rid, name, _ = recipes[r]
+        entry: Dict[str, Any] = {"recipe_id": rid, "recipe_name": name, "per_unit": {}, "per_100g": {}}
+        for j in np.flatnonzero(differs[r]).tolist():
+            key = TOTAL_KEYS[j]
+            for basis, b, a in (("per_unit", unit_b, unit_a), ("per_100g", per100_b, per100_a)):
+                if exact is not None:
+                    old, new = exact["before"][i][basis][key], exact["after"][i][basis][key]
+                else:
+                    old, new = _r(float(b[r, j]), _UNITS[key]), _r(float(a[r, j]), _UNITS[key])
+                if old != new:
+                    entry[basis][key] = [old, new]
+        if not entry["per_unit"] and not entry["per_100g"]:
+            continue
+        crossed = []
+        for key, limit, claim in CLAIM_THRESHOLDS:
+            if key in entry["per_100g"]:
+                old, new = entry["per_100g"][key]
+                if (old < limit) != (new < limit):
+                    crossed.append({"nutrient": key, "label": _LABELS[key], "claim": claim, "limit": limit,
+                                    "before": old, "after": new})
+        entry["crossed"] = crossed
+        crossed_count += bool(crossed)
+        changed.append(entry)
+    return {
+        "ingredient_ids": sorted(before),
+        "recipes_checked": len(recipes),
+        "labels_changed": len(changed),
+        "thresholds_crossed": crossed_count,
+        "recipes": changed,
+    }
+
+
+def run_impact_job(report_id: int) -> Optional[str]:
+    """
+    Run a pending report (background task / seed script). The pending ->
+    running update claims it, so a report picked up by another worker is
+    skipped. Returns the final status, None if it was not pending.
+    """
+    with SessionLocal() as db:
+        claimed = db.execute(
+            update(ImpactReport)
+            .where(ImpactReport.id == report_id, ImpactReport.status == "pending")
+            .values(status="running")
+        ).rowcount
+        db.commit()
+        if not claimed:
+            return None
+        report = db.get(ImpactReport, report_id)
+        started = time.perf_counter()
+        try:
+            before = {int(iid): values for iid, values in json.loads(report.before_values).items()}
+            result = analyze_impact(db, before)
+        except Exception as e:
+            db.rollback()
+            report.status = "failed"
+            report.error = f"{e.__class__.__name__}: {e}"
+        else:
+            report.status = "done"
+            report.recipes_checked = result["recipes_checked"]
+            report.labels_changed = result["labels_changed"]
+            report.thresholds_crossed = result["thresholds_crossed"]
+            report.report = json.dumps(result, ensure_ascii=False)
+        report.finished_at = datetime.utcnow()
+        report.duration_ms = round((time.perf_counter() - started) * 1000.0, 3)
+        db.commit()
+        return report.status
+
+
+def run_pending_impact_jobs() -> int:
+    """Reports left pending (e.g. the worker stopped before its background task ran)."""
+    with SessionLocal() as db:
+        pending = db.execute(
+            select(ImpactReport.id).where(ImpactReport.status == "pending").order_by(ImpactReport.id)
+        ).scalars().all()
+    return sum(1 for report_id in pending if run_impact_job(report_id) is not None)
+
+
+def impact_report_out(report: ImpactReport, with_recipes: bool = False) -> Dict[str, Any]:
+    out = {
+        "id": report.id,
+        "trigger": report.trigger,
+        "status": report.status,
+        "ingredients_changed": report.ingredients_changed,
+        "recipes_checked": report.recipes_checked,
+        "labels_changed": report.labels_changed,
+        "thresholds_crossed": report.thresholds_crossed,
+        "created_at": report.created_at.isoformat(),
+        "finished_at": report.finished_at.isoformat() if report.finished_at else None,
+        "duration_ms": report.duration_ms,
+        "error": report.error,
+    }
+    if with_recipes:
+        result = json.loads(report.report) if report.report else {}
+        out["ingredient_ids"] = result.get("ingredient_ids", [])
+        out["recipes"] = result.get("recipes", [])
+    return out
+
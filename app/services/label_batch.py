@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from .pdf import build_label_pdf, preload_fonts
+
+# Worker processes for label rendering (0 = one per CPU core, at most 4 so a
+# small instance isn't filled with reportlab processes)
+LABEL_PDF_WORKERS = int(os.getenv("LABEL_PDF_WORKERS", "0")) or min(os.cpu_count() or 1, 4)
+
+# Renders allowed in flight on the pool before new requests get a 503: each
+# single label (/label.pdf) counts one, a batch its in-flight window
+LABEL_PDF_MAX_PENDING = int(os.getenv("LABEL_PDF_MAX_PENDING", "0")) or LABEL_PDF_WORKERS * 4
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_label_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: workers start clean instead of forking uvicorn's threads / DB connections
+            _pool = ProcessPoolExecutor(
+                max_workers=LABEL_PDF_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=preload_fonts,
+            )
+        return _pool
+
+
+def shutdown_label_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _render(job: Dict[str, Any]) -> bytes:
+    # Runs in a worker process; job holds build_label_pdf keyword arguments.
+    return build_label_pdf(**job)
+
+
+class LabelRenderBusy(Exception):
+    """Raised instead of queueing when LABEL_PDF_MAX_PENDING renders are in flight."""
+
+
+# Renders in flight: single labels on the event loop, batches in threadpool threads
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+def _add_pending(n: int) -> None:
+    global _pending
+    with _pending_lock:
+        _pending += n
+
+
+def batch_window(jobs: int) -> int:
+    """Renders a batch of that many jobs keeps in flight on the pool."""
+    return min(LABEL_PDF_WORKERS * 2, jobs)
+
+
+def label_pool_busy(renders: int = 1) -> bool:
+    """Whether that many more renders would go over LABEL_PDF_MAX_PENDING."""
+    return renders > 0 and _pending + renders > LABEL_PDF_MAX_PENDING
+
+
+async def render_label_async(job: Dict[str, Any]) -> bytes:
+    """Render one label on the worker pool without holding a request thread."""
+    if label_pool_busy():
+        raise LabelRenderBusy()
+    _add_pending(1)
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_label_pool(), _render, job)
+    finally:
+        _add_pending(-1)
+
+
+def render_labels(jobs: List[Dict[str, Any]]) -> Iterator[Tuple[int, bytes]]:
+    """
+    Yield (job index, PDF bytes) as workers finish, not in job order.
+    Only a few jobs per worker are in flight, so finished PDFs don't pile up
+    in memory while the consumer is still streaming earlier ones.
+    """
+    pool = get_label_pool()
+    window = batch_window(len(jobs))
+    pending = {}
+    next_job = 0
+    # Counted against LABEL_PDF_MAX_PENDING only once rendering starts, so a
+    # response that is never streamed holds nothing
+    _add_pending(window)
+    try:
+        while next_job < len(jobs) or pending:
+            while next_job < len(jobs) and len(pending) < window:
+                pending[pool.submit(_render, jobs[next_job])] = next_job
+                next_job += 1
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield pending.pop(fut), fut.result()
+    finally:
+        # Client went away / a render failed: drop the work that hasn't started
+        for fut in pending:
+            fut.cancel()
+        _add_pending(-window)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable file object collecting what zipfile writes, drained per entry."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+
+def stream_labels_zip(jobs: List[Dict[str, Any]], filenames: List[str]) -> Iterator[bytes]:
+    """ZIP of one PDF per job, each entry streamed as soon as its render finishes."""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for i, pdf_bytes in render_labels(jobs):
+            zf.writestr(filenames[i], pdf_bytes)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def merge_labels_pdf(jobs: List[Dict[str, Any]]) -> bytes:
+    """
+    One multi-page PDF in job order. Pages render in parallel; the document
+    itself can only be written once every part is done.
+    """
+    from pypdf import PdfWriter
+
+    parts: List[Optional[bytes]] = [None] * len(jobs)
+    for i, pdf_bytes in render_labels(jobs):
+        parts[i] = pdf_bytes
+
+    writer = PdfWriter()
+    for pdf_bytes in parts:
+        writer.append(io.BytesIO(pdf_bytes))
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
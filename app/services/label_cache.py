@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Any, List, Optional
+
+from . import calc
+
+# In-memory tier (LRU, bounded by both entry count and total bytes)
+LABEL_CACHE_MAX_ENTRIES = int(os.getenv("LABEL_CACHE_MAX_ENTRIES", "512"))
+LABEL_CACHE_MAX_BYTES = int(os.getenv("LABEL_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Optional on-disk tier; empty = disabled
+LABEL_CACHE_DIR = os.getenv("LABEL_CACHE_DIR", "")
+LABEL_CACHE_DISK_MAX_BYTES = int(os.getenv("LABEL_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Bump when build_label_pdf's output changes so old cached labels are not reused
+LABEL_LAYOUT_VERSION = 1
+
+
+def label_cache_key(recipe: Dict[str, Any], items: List[Dict[str, Any]], generated_on: date) -> str:
+    """
+    Hash of everything the label depends on: the normalized recipe, the full
+    contents of the ingredient rows it uses (so any edit to one of them changes
+    the key), calc.py's rounding settings and calculation mode, and the
+    printed date.
+    """
+    payload = {
+        "layout": LABEL_LAYOUT_VERSION,
+        "recipe_name": (recipe.get("recipe_name") or "").strip(),
+        "unit_weight_g": float(recipe.get("unit_weight_g") or 0.0),
+        "items": [
+            [list(dataclasses.astuple(it["ingredient"])), float(it["amount_g"] or 0.0)]
+            for it in items
+        ],
+        "rounding": [calc.ROUND_KCAL, calc.ROUND_MG, calc.ROUND_G, calc.CALC_MODE, calc.CALC_ROUNDING],
+        "date": generated_on.isoformat(),
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LabelCache:
+    def __init__(
+        self,
+        max_entries: int = LABEL_CACHE_MAX_ENTRIES,
+        max_bytes: int = LABEL_CACHE_MAX_BYTES,
+        disk_dir: str = LABEL_CACHE_DIR,
+        disk_max_bytes: int = LABEL_CACHE_DISK_MAX_BYTES,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._disk_bytes: Optional[int] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+        data = self._disk_get(key)
+        if data is not None:
+            self.disk_hits += 1
+            self._memory_put(key, data)
+            return data
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes) -> None:
+        self._memory_put(key, data)
+        self._disk_put(key, data)
+
+    def _memory_put(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = data
+            self._bytes += len(data)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.pdf")
+
+    def _disk_get(self, key: str) -> Optional[bytes]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # mtime = last use, for LRU eviction
+            return data
+        except OSError:
+            return None
+
+    def _disk_put(self, key: str, data: bytes) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)  # atomic: other workers never read a partial file
+        except OSError:
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+            else:
+                self._disk_bytes += len(data)
+            if self._disk_bytes > self.disk_max_bytes:
+                self._disk_evict()
+
+    def _disk_files(self):
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if not name.endswith(".pdf"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def _disk_evict(self) -> None:
+        # Oldest-used first, down to 90% of the budget so we don't evict on every put
+        files = sorted(self._disk_files(), key=lambda f: f[2])
+        total = sum(size for _, size, _ in files)
+        target = self.disk_max_bytes * 0.9
+        for path, size, _ in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self.evictions += 1
+            except OSError:
+                continue
+        self._disk_bytes = total
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "disk_dir": self.disk_dir or None,
+            "disk_bytes": self._disk_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+label_cache = LabelCache()
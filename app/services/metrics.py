@@ -0,0 +1,367 @@
+from __future__ import annotations
+
+import io
+import itertools
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Per-request phase timings, Server-Timing header and the /metrics histograms
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+# Optional bearer token for /metrics (empty = no auth, e.g. scraped on a private network)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# Sampled profiling (can also be switched on at runtime from /admin/profiling):
+# fraction of requests profiled, and only captures at least this slow are kept
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "500"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+# cProfile (always available) or pyinstrument (if installed; follows awaits properly)
+PROFILER = os.getenv("PROFILER", "cprofile")
+
+# Upper bounds in seconds, Prometheus' default buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, rendered in the Prometheus text format."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total, n) for labels, (counts, total, n) in self._series.items()]
+        for labels, counts, total, n in sorted(series):
+            base = [f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels)]
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                bucket_labels = ",".join(base + ['le="%s"' % le])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = f"{{{','.join(base)}}}" if base else ""
+            lines.append(f"{self.name}_sum{suffix} {total:.6f}")
+            lines.append(f"{self.name}_count{suffix} {n}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Request handling time (until the response body is sent).",
+    ("method", "route", "status"),
+)
+SPAN_SECONDS = Histogram(
+    "app_span_duration_seconds", "Time spent in an instrumented phase, per request and phase.",
+    ("span",),
+)
+QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Time per SQL statement (cursor execute).",
+    (), QUERY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed per request.",
+    ("route",), COUNT_BUCKETS,
+)
+
+
+class RequestTimings:
+    """Accumulated phase durations of one request (a phase can run several times)."""
+
+    __slots__ = ("spans", "queries", "query_s")
+
+    def __init__(self):
+        self.spans: Dict[str, List[float]] = {}  # name -> [seconds, calls]
+        self.queries = 0
+        self.query_s = 0.0
+
+    def add(self, name: str, seconds: float) -> None:
+        entry = self.spans.get(name)
+        if entry is None:
+            self.spans[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def server_timing(self, total_s: float) -> str:
+        parts = [f"{name};dur={s * 1000:.2f}" for name, (s, _) in self.spans.items()]
+        if self.queries:
+            parts.append(f'db;dur={self.query_s * 1000:.2f};desc="{self.queries} queries"')
+        parts.append(f"total;dur={total_s * 1000:.2f}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Time a phase of the current request (Server-Timing + app_span_duration_seconds).
+    Outside a measured request this is a single ContextVar lookup.
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+# --- SQL statements ------------------------------------------------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    QUERY_SECONDS.observe(elapsed)
+    timings = _current.get()
+    if timings is not None:
+        timings.queries += 1
+        timings.query_s += elapsed
+
+
+def instrument_queries(sync_engine) -> None:
+    """Count and time the statements of an engine (for the async engine pass .sync_engine)."""
+    from sqlalchemy import event
+
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# --- sampled profiling -----------------------------------------------------------
+
+class Profiler:
+    """
+    Profiles a random sample of requests and keeps the captures of the slow
+    ones (PROFILE_KEEP most recent). One capture at a time: cProfile sees every
+    thread-local call, so concurrent requests on the event loop thread show up
+    in it too; pyinstrument's async mode attributes awaits to the request.
+    Only the event loop thread is profiled: def endpoints run in the threadpool.
+    """
+
+    def __init__(self, sample_rate: float = PROFILE_SAMPLE_RATE, slow_ms: float = PROFILE_SLOW_MS,
+                 keep: int = PROFILE_KEEP, kind: str = PROFILER):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.kind = kind
+        self.until: Optional[float] = None  # monotonic deadline set from /admin/profiling
+        self._busy = threading.Lock()  # held while a capture runs
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._captures: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._keep = keep
+        self.sampled = 0
+        self.kept = 0
+
+    @property
+    def armed(self) -> bool:
+        if self.sample_rate <= 0:
+            return False
+        if self.until is not None and time.monotonic() > self.until:
+            self.sample_rate, self.until = 0.0, None
+            return False
+        return True
+
+    def configure(self, sample_rate: float, slow_ms: Optional[float] = None,
+                  duration_s: Optional[float] = None, kind: Optional[str] = None) -> None:
+        self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+        if slow_ms is not None:
+            self.slow_ms = max(float(slow_ms), 0.0)
+        if kind is not None:
+            self.kind = kind
+        self.until = time.monotonic() + duration_s if duration_s else None
+
+    def start(self) -> Optional[Tuple[str, Any]]:
+        """A running profiler for this request, or None (not sampled / another capture running)."""
+        if random.random() >= self.sample_rate or not self._busy.acquire(blocking=False):
+            return None
+        try:
+            if self.kind == "pyinstrument":
+                try:
+                    from pyinstrument import Profiler as _Pyinstrument
+                except ImportError:
+                    self.kind = "cprofile"
+                else:
+                    prof = _Pyinstrument(async_mode="enabled")
+                    prof.start()
+                    self.sampled += 1
+                    return "pyinstrument", prof
+            import cProfile
+
+            prof = cProfile.Profile()
+            prof.enable()
+            self.sampled += 1
+            return "cprofile", prof
+        except Exception:
+            self._busy.release()
+            raise
+
+    def stop(self, handle: Tuple[str, Any], method: str, path: str, status: int, elapsed_s: float) -> None:
+        kind, prof = handle
+        try:
+            if kind == "pyinstrument":
+                prof.stop()
+            else:
+                prof.disable()
+        finally:
+            self._busy.release()
+        if elapsed_s * 1000 < self.slow_ms:
+            return
+        if kind == "pyinstrument":
+            report = prof.output_text(unicode=True, color=False)
+        else:
+            import pstats
+
+            out = io.StringIO()
+            pstats.Stats(prof, stream=out).sort_stats("cumulative").print_stats(60)
+            report = out.getvalue()
+        capture_id = next(self._ids)
+        with self._lock:
+            self._captures[capture_id] = {
+                "id": capture_id,
+                "method": method,
+                "path": path,
+                "status": status,
+                "ms": round(elapsed_s * 1000, 3),
+                "profiler": kind,
+                "captured_at": datetime.now().isoformat(timespec="seconds"),
+                "report": report,
+            }
+            while len(self._captures) > self._keep:
+                self._captures.popitem(last=False)
+        self.kept += 1
+
+    def captures(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            captures = list(self._captures.values())
+        return [{k: v for k, v in c.items() if k != "report"} for c in reversed(captures)]
+
+    def capture(self, capture_id: int) -> Optional[Dict[str, Any]]:
+        return self._captures.get(capture_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sample_rate": self.sample_rate if self.armed else 0.0,
+            "slow_ms": self.slow_ms,
+            "profiler": self.kind,
+            "seconds_left": round(self.until - time.monotonic(), 1) if self.until else None,
+            "sampled": self.sampled,
+            "kept": self.kept,
+            "captures": len(self._captures),
+        }
+
+
+profiler = Profiler()
+
+
+# --- middleware ---------------------------------------------------------------------
+
+class TimingMiddleware:
+    """
+    Pure ASGI middleware (does not buffer streamed bodies). With metrics off
+    and no profiling armed it just calls through. Otherwise it measures the
+    request, adds a Server-Timing header (phases finished before the headers
+    are sent) and feeds the /metrics histograms.
+    """
+
+    def __init__(self, app, enabled: bool = METRICS_ENABLED, profiler: Profiler = profiler):
+        self.app = app
+        self.enabled = enabled
+        self.profiler = profiler
+        self._routes: Dict[Any, str] = {}
+
+    def _route_label(self, scope) -> str:
+        # Route template, not the raw path (keeps label cardinality bounded)
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        label = self._routes.get(endpoint)
+        if label is None:
+            label = "unmatched"
+            for route in scope["app"].router.routes:
+                if getattr(route, "endpoint", None) is endpoint or getattr(route, "app", None) is endpoint:
+                    label = route.path
+                    break
+            self._routes[endpoint] = label
+        return label
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (self.enabled or self.profiler.armed):
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        handle = self.profiler.start() if self.profiler.armed else None
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.enabled:
+                    header = timings.server_timing(time.perf_counter() - started).encode("latin-1")
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+            if handle is not None:
+                self.profiler.stop(handle, scope["method"], scope["path"], status, elapsed)
+            if self.enabled:
+                route = self._route_label(scope)
+                REQUEST_SECONDS.observe(elapsed, scope["method"], route, str(status))
+                REQUEST_QUERIES.observe(timings.queries, route)
+                for name, (seconds, _) in timings.spans.items():
+                    SPAN_SECONDS.observe(seconds, name)
+
+
+def render_metrics(samples: Callable[[], Dict[str, Tuple[str, str, float]]] = dict) -> str:
+    """Prometheus text exposition: the histograms plus samples() {name: (type, help, value)}."""
+    lines: List[str] = []
+    for hist in (REQUEST_SECONDS, SPAN_SECONDS, QUERY_SECONDS, REQUEST_QUERIES):
+        lines.extend(hist.render())
+    for name, (kind, help_text, value) in samples().items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
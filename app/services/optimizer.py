@@ -0,0 +1,359 @@
+from __future__ import annotations
+
+import itertools
+import math
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .calc import (
+    NUTRIENT_FIELDS,
+    NUTRIENTS_ORDER,
+    ROUND_G,
+    ROUND_KCAL,
+    ROUND_MG,
+    TOTAL_KEYS,
+    NutrientMatrix,
+    batch_values,
+    compute_totals,
+)
+
+# Rounded candidates evaluated per solve (all of them in one batch_values call)
+MAX_CANDIDATES = 4096
+# Changed amounts up to this many are rounded up/down in every combination
+# (2^11 = 2048 candidates); above it, a seeded random sample
+EXHAUSTIVE_ROUNDING = 11
+
+BASES = ("per_unit", "per_100g")
+_COL = {key: j for j, key in enumerate(TOTAL_KEYS)}
+_SUM_COL = {key: j for j, (key, _) in enumerate(NUTRIENT_FIELDS)}
+
+
+class OptimizeError(ValueError):
+    """Invalid optimization request (unknown nutrient / ingredient, bad bounds)."""
+
+
+def optimizer_available() -> bool:
+    try:
+        import scipy.optimize  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+@dataclass
+class Target:
+    nutrient: str  # a TOTAL_KEYS entry
+    basis: str = "per_unit"
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+
+@dataclass
+class OptimizeResult:
+    status: str  # "ok" / "unrounded" (no rounded candidate met the targets) / "infeasible"
+    ingredient_ids: List[int]
+    original_g: List[float]
+    amounts_g: List[float]
+    totals: Optional[Dict[str, Any]]
+    candidates_evaluated: int
+    solve_ms: float
+    evaluate_ms: float
+
+
+def _merge_items(items: Sequence[Tuple[int, float]]) -> Tuple[List[int], List[float]]:
+    # A repeated ingredient becomes one variable (amounts added up, first position kept)
+    order: List[int] = []
+    amounts: Dict[int, float] = {}
+    for iid, amt in items:
+        if iid not in amounts:
+            order.append(iid)
+            amounts[iid] = 0.0
+        amounts[iid] += float(amt or 0.0)
+    return order, [amounts[iid] for iid in order]
+
+
+def _decimals(nutrient: str) -> int:
+    """Decimals the label shows for a nutrient (_r)."""
+    unit = {key: unit for key, _, unit in NUTRIENTS_ORDER}[nutrient]
+    return {"kcal": ROUND_KCAL, "mg": ROUND_MG}.get(unit, ROUND_G)
+
+
+def _lp_bounds(t: Target) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Bounds on the unrounded value that make the label value meet the target,
+    with 0.1 label digit to spare so rounding the amounts to step_g keeps them met.
+    (max 10.25 at one decimal: shown <= 10.2, so raw <= 10.2 + 0.04.)
+    """
+    grid = 10.0 ** -_decimals(t.nutrient)
+    lp_min = lp_max = None
+    if t.max is not None:
+        lp_max = math.floor(t.max / grid + 1e-9) * grid + 0.4 * grid
+    if t.min is not None:
+        lp_min = math.ceil(t.min / grid - 1e-9) * grid - 0.4 * grid
+    return lp_min, lp_max
+
+
+def _satisfies(per_unit, per_100g, targets: Sequence[Target]):
+    """Boolean mask of candidates whose label values (rounded as on the label) meet every target."""
+    import numpy as np
+
+    ok = np.ones(per_unit.shape[0], dtype=bool)
+    for t in targets:
+        values = (per_unit if t.basis == "per_unit" else per_100g)[:, _COL[t.nutrient]]
+        shown = np.round(values, _decimals(t.nutrient))
+        if t.min is not None:
+            ok &= shown >= t.min
+        if t.max is not None:
+            ok &= shown <= t.max
+    return ok
+
+
+def _meets(totals: Dict[str, Any], targets: Sequence[Target]) -> bool:
+    for t in targets:
+        value = totals[t.basis][t.nutrient]
+        if (t.min is not None and value < t.min) or (t.max is not None and value > t.max):
+            return False
+    return True
+
+
+def optimize_recipe(
+    matrix: NutrientMatrix,
+    catalog,
+    items: Sequence[Tuple[int, float]],
+    unit_weight_g: float,
+    targets: Sequence[Target],
+    bounds: Optional[Dict[int, Tuple[Optional[float], Optional[float]]]] = None,
+    candidate_ids: Sequence[int] = (),
+    keep_total: bool = True,
+    step_g: float = 0.1,
+    minimize: Optional[str] = None,
+) -> OptimizeResult:
+    """
+    Smallest change to a recipe's amounts (sum of |grams changed|) that meets
+    every target on the label values, with the unit weight fixed.
+
+    items: [(ingredient_id, amount_g), ...]; candidate_ids: ingredients that may
+    be added (substitutions: the solver can move grams from a recipe ingredient
+    to one of them); bounds: {ingredient_id: (min_g, max_g)}, default 0..inf;
+    keep_total: keep the sum of amounts (batch size) unchanged; minimize: a
+    nutrient to push down while meeting the targets (change is the tie-break).
+
+    Linear programme over the amounts: every summed nutrient is linear in them,
+    and so is kcal except for calc_kcal's floor on digestible carbs, handled
+    with an extra variable d >= max(digestible, 0) (exact for upper bounds and
+    for minimizing, conservative for lower bounds). The LP optimum is then
+    rounded to step_g in many combinations and all of those candidates are
+    evaluated in one batch, keeping the smallest change whose rounded label
+    values still meet the targets.
+    """
+    import numpy as np
+    from scipy.optimize import linprog
+
+    bounds = bounds or {}
+    for t in targets:
+        if t.nutrient not in _COL:
+            raise OptimizeError(f"unknown nutrient: {t.nutrient}")
+        if t.basis not in BASES:
+            raise OptimizeError(f"basis must be one of: {', '.join(BASES)}")
+        if t.min is not None and t.max is not None and t.min > t.max:
+            raise OptimizeError(f"{t.nutrient}: min > max")
+        if t.basis == "per_100g" and not unit_weight_g > 0:
+            raise OptimizeError("per_100g targets need a unit weight")
+    if minimize is not None and minimize not in _COL:
+        raise OptimizeError(f"unknown nutrient: {minimize}")
+
+    ids, x0 = _merge_items(items)
+    for iid in candidate_ids:
+        if iid not in ids:
+            ids.append(iid)
+            x0.append(0.0)
+    rows = matrix.rows(ids)
+    unknown = [iid for iid, row in zip(ids, rows) if row < 0]
+    if unknown:
+        raise OptimizeError(f"unknown ingredient ids: {unknown}")
+    if not ids:
+        raise OptimizeError("recipe has no ingredients")
+
+    n = len(ids)
+    x0_arr = np.asarray(x0, dtype=np.float64)
+    lo = np.zeros(n)
+    hi = np.full(n, np.inf)
+    for i, iid in enumerate(ids):
+        b_lo, b_hi = bounds.get(iid, (None, None))
+        if b_lo is not None:
+            lo[i] = max(float(b_lo), 0.0)
+        if b_hi is not None:
+            hi[i] = float(b_hi)
+        if lo[i] > hi[i]:
+            raise OptimizeError(f"ingredient {iid}: min_g > max_g")
+
+    # Per-gram coefficient of each summed nutrient (per unit), shape (nutrients, n)
+    coef = matrix.values[rows].T / 100.0
+    digestible = coef[_SUM_COL["carbs_g"]] - coef[_SUM_COL["fiber_g"]] - coef[_SUM_COL["allulose_g"]]
+    rest = 2.0 * coef[_SUM_COL["fiber_g"]] + 4.0 * coef[_SUM_COL["protein_g"]] + 9.0 * coef[_SUM_COL["fat_g"]]
+    uses_kcal = any(t.nutrient == "kcal" for t in targets) or minimize == "kcal"
+
+    # Variables: x (n amounts), t (n, |x - x0|), d (1, kcal only)
+    nv = 2 * n + (1 if uses_kcal else 0)
+    d = 2 * n
+    A_ub: List[np.ndarray] = []
+    b_ub: List[float] = []
+
+    def row(x_coef=None, d_coef=0.0):
+        r = np.zeros(nv)
+        if x_coef is not None:
+            r[:n] = x_coef
+        if d_coef:
+            r[d] = d_coef
+        return r
+
+    for i in range(n):
+        r = np.zeros(nv)
+        r[i], r[n + i] = 1.0, -1.0  # x - t <= x0
+        A_ub.append(r)
+        b_ub.append(x0_arr[i])
+        r = np.zeros(nv)
+        r[i], r[n + i] = -1.0, -1.0  # -x - t <= -x0
+        A_ub.append(r)
+        b_ub.append(-x0_arr[i])
+    if uses_kcal:
+        A_ub.append(row(digestible, -1.0))  # digestible(x) - d <= 0
+        b_ub.append(0.0)
+
+    for t in targets:
+        scale = 1.0 if t.basis == "per_unit" else 100.0 / unit_weight_g
+        lp_min, lp_max = _lp_bounds(t)
+        if t.nutrient == "kcal":
+            if lp_max is not None:
+                A_ub.append(row(scale * rest, 4.0 * scale))  # 4d + rest <= max
+                b_ub.append(lp_max)
+            if lp_min is not None:
+                A_ub.append(row(-scale * (4.0 * digestible + rest)))  # 4 digestible + rest >= min
+                b_ub.append(-lp_min)
+        else:
+            c = scale * coef[_SUM_COL[t.nutrient]]
+            if lp_max is not None:
+                A_ub.append(row(c))
+                b_ub.append(lp_max)
+            if lp_min is not None:
+                A_ub.append(row(-c))
+                b_ub.append(-lp_min)
+
+    A_eq = b_eq = None
+    total0 = float(x0_arr.sum())
+    if keep_total:
+        A_eq = [row(np.ones(n))]
+        b_eq = [total0]
+
+    objective = np.zeros(nv)
+    objective[n:2 * n] = 1.0
+    if minimize is not None:
+        objective[n:2 * n] = 1e-6
+        if minimize == "kcal":
+            objective[:n] += rest
+            objective[d] = 4.0
+        else:
+            objective[:n] += coef[_SUM_COL[minimize]]
+
+    var_bounds = [(lo[i], None if np.isinf(hi[i]) else hi[i]) for i in range(n)]
+    var_bounds += [(0, None)] * n + ([(0, None)] if uses_kcal else [])
+
+    started = time.perf_counter()
+    solution = linprog(
+        objective, A_ub=np.array(A_ub), b_ub=np.array(b_ub), A_eq=A_eq, b_eq=b_eq,
+        bounds=var_bounds, method="highs",
+    )
+    solve_ms = (time.perf_counter() - started) * 1000
+    if solution.status != 0:
+        return OptimizeResult("infeasible", ids, x0, [], None, 0, round(solve_ms, 3), 0.0)
+
+    x_star = np.clip(solution.x[:n], lo, hi)
+    started = time.perf_counter()
+    candidates = _rounded_candidates(x0_arr, x_star, lo, hi, step_g, keep_total, total0)
+    chosen = None
+    if len(candidates):
+        per_unit, per_100g = batch_values(matrix, [(rows, c) for c in candidates], [unit_weight_g] * len(candidates))
+        ok = _satisfies(per_unit, per_100g, targets)
+        change = np.abs(candidates - x0_arr).sum(axis=1)
+        order = np.lexsort((change, per_unit[:, _COL[minimize]])) if minimize else np.argsort(change, kind="stable")
+        for i in order:
+            if not ok[i]:
+                continue
+            # np.round can differ from round() on exact ties: confirm with compute_totals
+            totals = _totals(catalog, ids, candidates[i], unit_weight_g)
+            if _meets(totals, targets):
+                chosen = (candidates[i], totals)
+                break
+    evaluate_ms = (time.perf_counter() - started) * 1000
+
+    if chosen is None:
+        amounts = x_star
+        status = "unrounded"
+        totals = _totals(catalog, ids, amounts, unit_weight_g)
+    else:
+        (amounts, totals), status = chosen, "ok"
+    return OptimizeResult(
+        status, ids, x0, [float(a) for a in amounts], totals,
+        len(candidates), round(solve_ms, 3), round(evaluate_ms, 3),
+    )
+
+
+def _totals(catalog, ids, amounts, unit_weight_g: float) -> Dict[str, Any]:
+    hydrated = [
+        {"ingredient": catalog.get(iid), "amount_g": float(a)}
+        for iid, a in zip(ids, amounts)
+        if a > 0
+    ]
+    return compute_totals(hydrated, unit_weight_g=unit_weight_g)
+
+
+def _rounded_candidates(x0, x_star, lo, hi, step_g: float, keep_total: bool, total0: float):
+    """
+    The LP solution rounded to step_g, one row per candidate. Unchanged amounts
+    are kept as they are; each changed one is rounded down or up. With
+    keep_total, the largest changed amount absorbs the rounding difference.
+    """
+    import numpy as np
+
+    changed = np.flatnonzero(np.abs(x_star - x0) > 1e-9)
+    if step_g <= 0 or len(changed) == 0:
+        return np.where(np.abs(x_star - x0) > 1e-9, x_star, x0)[None, :]
+
+    balance = None
+    if keep_total:
+        balance = changed[np.argmax(x_star[changed])]
+        changed = changed[changed != balance]
+
+    down = np.clip(np.floor(x_star / step_g) * step_g, lo, hi)
+    up = np.clip(np.ceil(x_star / step_g) * step_g, lo, hi)
+    m = len(changed)
+    if m <= EXHAUSTIVE_ROUNDING:
+        choices = np.array(list(itertools.product((0, 1), repeat=m)), dtype=bool).reshape(-1, m)
+    else:
+        rng = random.Random(0)
+        nearest = (x_star[changed] - down[changed]) * 2 >= step_g
+        picks = {tuple(nearest)}
+        for j in range(m):  # nearest, and nearest with one amount flipped
+            flipped = nearest.copy()
+            flipped[j] = not flipped[j]
+            picks.add(tuple(flipped))
+        while len(picks) < MAX_CANDIDATES:
+            picks.add(tuple(rng.random() < 0.5 for _ in range(m)))
+        choices = np.array(sorted(picks), dtype=bool)
+
+    base = x_star.copy()
+    unchanged = np.ones(len(x0), dtype=bool)
+    unchanged[changed] = False
+    if balance is not None:
+        unchanged[balance] = False
+    base[unchanged] = x0[unchanged]
+    candidates = np.repeat(base[None, :], len(choices), axis=0)
+    candidates[:, changed] = np.where(choices, up[changed], down[changed])
+    if balance is not None:
+        others = candidates.sum(axis=1) - candidates[:, balance]
+        candidates[:, balance] = total0 - others
+        keep = (candidates[:, balance] >= lo[balance] - 1e-9) & (candidates[:, balance] <= hi[balance] + 1e-9)
+        candidates = candidates[keep]
+    return candidates
@@ -3,20 +3,75 @@ from __future__ import annotations
 import os
 from datetime import datetime
 from io import BytesIO
-from typing import Dict, Any, List
+import threading
+from typing import TYPE_CHECKING, Dict, Any, List
 
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.units import mm
-from reportlab.pdfgen import canvas
+# reportlab is imported inside the functions below: it is only needed once a
+# label is rendered (or fonts are preloaded by the warm-up after startup).
+if TYPE_CHECKING:
+    from reportlab.pdfgen import canvas
 
 
 # Register a Korean TTF font bundled with the project.
-# Put the font file here:
+# Put the font files here:
 #   app/assets/fonts/NotoSansKR-Regular.ttf
+#   app/assets/fonts/NotoSansKR-Bold.ttf   (optional; bold text falls back to Regular)
+# This file is located at: app/services/pdf.py
+_FONT_DIR = os.getenv(
+    "LABEL_FONT_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "assets", "fonts")),
+)
 _FONT_NAME = "NotoSansKR"
-_FONT_REGISTERED = False
+_FONT_BOLD_NAME = "NotoSansKR-Bold"
+_FONT_FILES = {
+    _FONT_NAME: "NotoSansKR-Regular.ttf",
+    _FONT_BOLD_NAME: "NotoSansKR-Bold.ttf",
+}
+# font name -> registered? (a missing/broken file is remembered too)
+_FONT_REGISTERED: Dict[str, bool] = {}
+_FONT_LOCK = threading.Lock()
+
+
+def _register(font_name: str) -> bool:
+    """Parse and register one TTF once per process."""
+    if font_name in _FONT_REGISTERED:
+        return _FONT_REGISTERED[font_name]
+
+    with _FONT_LOCK:
+        if font_name in _FONT_REGISTERED:
+            return _FONT_REGISTERED[font_name]
+
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+
+        font_path = os.path.join(_FONT_DIR, _FONT_FILES[font_name])
+        ok = False
+        if os.path.exists(font_path):
+            try:
+                pdfmetrics.registerFont(TTFont(font_name, font_path))
+                ok = True
+            except Exception:
+                ok = False
+        _FONT_REGISTERED[font_name] = ok
+        return ok
+
+
+def preload_fonts() -> None:
+    """
+    Parse the label fonts up front (app startup, label worker start) so the
+    first PDF doesn't pay for reading the TTF files. Registered fonts live in
+    reportlab's process-wide registry and are shared by every later PDF.
+    """
+    from reportlab.pdfbase import pdfmetrics
+
+    regular = _register(_FONT_NAME)
+    bold = _register(_FONT_BOLD_NAME)
+    if regular:
+        pdfmetrics.registerFontFamily(
+            _FONT_NAME,
+            normal=_FONT_NAME,
+            bold=_FONT_BOLD_NAME if bold else _FONT_NAME,
+        )
 
 
 def _register_font() -> bool:
@@ -24,35 +79,17 @@ def _register_font() -> bool:
     Try to register Korean font once.
     Returns True if registered, False otherwise (fallback will be used).
     """
-    global _FONT_REGISTERED
-    if _FONT_REGISTERED:
-        return True
-
-    # This file is located at: app/services/pdf.py
-    # We want: app/assets/fonts/NotoSansKR-Regular.ttf
-    font_path = os.path.abspath(
-        os.path.join(os.path.dirname(__file__), "..", "assets", "fonts", "NotoSansKR-Regular.ttf")
-    )
+    return _register(_FONT_NAME)
 
-    if not os.path.exists(font_path):
-        return False
 
-    try:
-        pdfmetrics.registerFont(TTFont(_FONT_NAME, font_path))
-        _FONT_REGISTERED = True
-        return True
-    except Exception:
-        return False
-
-
-def _set_font(c: canvas.Canvas, size: int, bold: bool = False) -> None:
+def _set_font(c: "canvas.Canvas", size: int, bold: bool = False) -> None:
     """
     Set a usable font. If Korean font is available, use it; otherwise fallback to Helvetica.
     Note: Helvetica cannot render Korean.
     """
-    if _register_font():
-        # NotoSansKR doesn't have a separate built-in "bold" file here.
-        # If you want bold, add NotoSansKR-Bold.ttf and register separately.
+    if bold and _register(_FONT_BOLD_NAME):
+        c.setFont(_FONT_BOLD_NAME, size)
+    elif _register_font():
         c.setFont(_FONT_NAME, size)
     else:
         c.setFont("Helvetica-Bold" if bold else "Helvetica", size)
@@ -65,8 +102,14 @@ def build_label_pdf(
     items: List[Dict[str, Any]],
     generated_at: datetime,
 ) -> bytes:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
+    from reportlab.pdfgen import canvas
+
     buf = BytesIO()
-    c = canvas.Canvas(buf, pagesize=A4)
+    # invariant: no CreationDate / random document ID, so the same label is the
+    # same bytes in every worker and after a restart (the ETag is a strong one)
+    c = canvas.Canvas(buf, pagesize=A4, invariant=1)
     width, height = A4
 
     x = 20 * mm
@@ -81,7 +124,8 @@ def build_label_pdf(
     y -= 6 * mm
     c.drawString(x, y, f"1개 무게: {unit_weight_g:.1f} g")
     y -= 6 * mm
-    c.drawString(x, y, f"산출일: {generated_at.strftime('%Y-%m-%d %H:%M')}")
+    # 날짜만 표기: 같은 날 같은 레시피의 라벨은 캐시(label_cache)에서 재사용
+    c.drawString(x, y, f"산출일: {generated_at.strftime('%Y-%m-%d')}")
     y -= 10 * mm
 
     # Table header
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import os
+import secrets
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..models import RecipeDraft
+
+# Recipes kept decoded-ready in memory per worker (the DB row is the source of truth)
+RECIPE_STORE_CACHE_SIZE = int(os.getenv("RECIPE_STORE_CACHE_SIZE", "1024"))
+# Drafts not saved or viewed for this long are deleted (matches the session cookie lifetime)
+RECIPE_DRAFT_MAX_AGE_DAYS = float(os.getenv("RECIPE_DRAFT_MAX_AGE_DAYS", "14"))
+# A viewed draft's updated_at is moved forward at most this often (one write per draft and day)
+RECIPE_DRAFT_TOUCH_INTERVAL = timedelta(hours=float(os.getenv("RECIPE_DRAFT_TOUCH_HOURS", "24")))
+# Expired drafts are pruned on save at most this often per worker (and once at startup)
+RECIPE_DRAFT_PRUNE_INTERVAL = float(os.getenv("RECIPE_DRAFT_PRUNE_INTERVAL", "3600"))
+
+# Ingredient ids are packed as int32 (the same range as the Integer primary key)
+MAX_INGREDIENT_ID = 2**31 - 1
+
+# (recipe_name, unit_weight_g, packed ingredient ids, packed amounts)
+Packed = Tuple[str, float, bytes, bytes]
+
+
+def _little_endian(a: array) -> array:
+    if sys.byteorder != "little":
+        a.byteswap()
+    return a
+
+
+def pack_items(items: List[Dict[str, Any]]) -> Tuple[bytes, bytes]:
+    """[{"ingredient_id", "amount_g"}, ...] -> (int32 ids, float64 amounts), little-endian."""
+    ids = array("i", (int(it["ingredient_id"]) for it in items))
+    amounts = array("d", (float(it["amount_g"]) for it in items))
+    return _little_endian(ids).tobytes(), _little_endian(amounts).tobytes()
+
+
+def unpack_items(ids_raw: bytes, amounts_raw: bytes) -> List[Dict[str, Any]]:
+    ids = array("i")
+    ids.frombytes(ids_raw)
+    amounts = array("d")
+    amounts.frombytes(amounts_raw)
+    _little_endian(ids)
+    _little_endian(amounts)
+    return [{"ingredient_id": iid, "amount_g": amt} for iid, amt in zip(ids, amounts)]
+
+
+def empty_recipe() -> Dict[str, Any]:
+    return {"recipe_name": "", "unit_weight_g": 0.0, "items": []}
+
+
+def _to_recipe(packed: Packed) -> Dict[str, Any]:
+    name, unit_weight_g, ids_raw, amounts_raw = packed
+    return {
+        "recipe_name": name,
+        "unit_weight_g": unit_weight_g,
+        "items": unpack_items(ids_raw, amounts_raw),
+    }
+
+
+class RecipeStore:
+    """
+    Server-side storage for the recipe being edited; the session cookie only
+    carries the draft id. Every save writes a new id and deletes the old row,
+    so a cached entry is never stale and the LRU needs no cross-worker
+    invalidation: a worker that has not seen the new id simply loads it.
+    Reading a draft keeps it alive: its updated_at is moved forward once it
+    is older than RECIPE_DRAFT_TOUCH_INTERVAL.
+    """
+
+    def __init__(self, max_entries: int = RECIPE_STORE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # draft id -> (packed recipe, updated_at as last written)
+        self._entries: "OrderedDict[str, Tuple[Packed, datetime]]" = OrderedDict()
+        self._pruned_at = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.touches = 0
+        self.pruned = 0
+
+    def _cached(self, draft_id: str) -> Optional[Tuple[Packed, datetime]]:
+        with self._lock:
+            entry = self._entries.get(draft_id)
+            if entry is not None:
+                self._entries.move_to_end(draft_id)
+                self.hits += 1
+            return entry
+
+    def _remember(self, draft_id: str, entry: Tuple[Packed, datetime]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[draft_id] = entry
+            self._entries.move_to_end(draft_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _forget(self, draft_id: str) -> None:
+        with self._lock:
+            self._entries.pop(draft_id, None)
+
+    def _load(self, db: Session, draft_id: str) -> Optional[Tuple[Packed, datetime]]:
+        row = db.execute(
+            select(
+                RecipeDraft.recipe_name, RecipeDraft.unit_weight_g,
+                RecipeDraft.ingredient_ids, RecipeDraft.amounts_g, RecipeDraft.updated_at,
+            ).where(RecipeDraft.id == draft_id)
+        ).first()
+        if row is None:
+            return None
+        name, unit_weight_g, ids_raw, amounts_raw, updated_at = row
+        packed = (name or "", float(unit_weight_g or 0.0), bytes(ids_raw or b""), bytes(amounts_raw or b""))
+        return packed, updated_at
+
+    def _touch(self, db: Session, draft_id: str, entry: Tuple[Packed, datetime]) -> None:
+        """Move updated_at forward (commits) if it is older than RECIPE_DRAFT_TOUCH_INTERVAL."""
+        now = datetime.utcnow()
+        if now - entry[1] < RECIPE_DRAFT_TOUCH_INTERVAL:
+            return
+        db.execute(update(RecipeDraft).where(RecipeDraft.id == draft_id).values(updated_at=now))
+        db.commit()
+        self.touches += 1
+        self._remember(draft_id, (entry[0], now))
+
+    def get(self, db: Session, draft_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not draft_id:
+            return None
+        entry = self._cached(draft_id)
+        if entry is None:
+            self.misses += 1
+            entry = self._load(db, draft_id)
+            if entry is None:
+                return None
+            self._remember(draft_id, entry)
+        self._touch(db, draft_id, entry)
+        return _to_recipe(entry[0])
+
+    async def get_async(self, adb: AsyncSession, draft_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not draft_id:
+            return None
+        entry = self._cached(draft_id)
+        if entry is None:
+            self.misses += 1
+            entry = await adb.run_sync(self._load, draft_id)
+            if entry is None:
+                return None
+            self._remember(draft_id, entry)
+        if datetime.utcnow() - entry[1] >= RECIPE_DRAFT_TOUCH_INTERVAL:
+            await adb.run_sync(self._touch, draft_id, entry)
+        return _to_recipe(entry[0])
+
+    def save(self, db: Session, recipe: Dict[str, Any], replaces: Optional[str] = None) -> str:
+        """Store recipe under a new id (commits) and drop the draft it replaces."""
+        ids_raw, amounts_raw = pack_items(recipe.get("items", []))
+        packed: Packed = (
+            (recipe.get("recipe_name") or "").strip(),
+            float(recipe.get("unit_weight_g") or 0.0),
+            ids_raw,
+            amounts_raw,
+        )
+        draft_id = secrets.token_urlsafe(16)
+        now = datetime.utcnow()
+        db.add(RecipeDraft(
+            id=draft_id,
+            recipe_name=packed[0],
+            unit_weight_g=packed[1],
+            ingredient_ids=ids_raw,
+            amounts_g=amounts_raw,
+            updated_at=now,
+        ))
+        if replaces:
+            db.execute(delete(RecipeDraft).where(RecipeDraft.id == replaces))
+        db.commit()
+
+        if replaces:
+            self._forget(replaces)
+        self._remember(draft_id, (packed, now))
+        # A long-running worker only saw the startup prune: catch up now and then
+        if time.monotonic() - self._pruned_at >= RECIPE_DRAFT_PRUNE_INTERVAL:
+            self.prune(db)
+        return draft_id
+
+    def delete(self, db: Session, draft_id: Optional[str]) -> None:
+        if not draft_id:
+            return
+        db.execute(delete(RecipeDraft).where(RecipeDraft.id == draft_id))
+        db.commit()
+        self._forget(draft_id)
+
+    def prune(self, db: Session, max_age_days: float = RECIPE_DRAFT_MAX_AGE_DAYS) -> int:
+        """Delete drafts whose cookie has expired anyway; returns the row count."""
+        self._pruned_at = time.monotonic()
+        cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+        result = db.execute(delete(RecipeDraft).where(RecipeDraft.updated_at < cutoff))
+        db.commit()
+        self.pruned += result.rowcount or 0
+        with self._lock:
+            for draft_id in [k for k, (_, updated_at) in self._entries.items() if updated_at < cutoff]:
+                del self._entries[draft_id]
+        return result.rowcount or 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "touches": self.touches,
+            "pruned": self.pruned,
+        }
+
+
+recipe_store = RecipeStore()
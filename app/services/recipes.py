@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session, object_session
+
+from ..models import Ingredient, Recipe, RecipeItem
+from .calc import (
+    CALC_MODE,
+    NUTRIENT_FIELDS,
+    NutrientMatrix,
+    compute_totals,
+    compute_totals_batch,
+    totals_from_sums,
+)
+
+SUM_KEYS = [key for key, _ in NUTRIENT_FIELDS]
+
+# Per-100g values of one ingredient, in NUTRIENT_FIELDS order
+NutrientValues = Tuple[float, ...]
+
+
+def ingredient_values(ing: Optional[Any]) -> Optional[NutrientValues]:
+    """None for a missing ingredient (contributes nothing, like in compute_totals)."""
+    if ing is None:
+        return None
+    return tuple(float(getattr(ing, col) or 0.0) for _, col in NUTRIENT_FIELDS)
+
+
+def recipe_sums(recipe: Recipe) -> Dict[str, float]:
+    return {key: float(getattr(recipe, key) or 0.0) for key in SUM_KEYS}
+
+
+def recipe_totals(recipe: Recipe) -> Dict[str, Any]:
+    """compute_totals result from the cached sums (no ingredient lookups in float mode)."""
+    if CALC_MODE == "decimal":
+        # The cached sums are binary floats: exact totals come from the items
+        ingredients = _load_ingredients(object_session(recipe), (it.ingredient_id for it in recipe.items))
+        return compute_totals(_hydrate(recipe, ingredients), float(recipe.unit_weight_g or 0.0))
+    return totals_from_sums(recipe_sums(recipe), float(recipe.unit_weight_g or 0.0))
+
+
+def _hydrate(recipe: Recipe, ingredients: Dict[int, Ingredient]) -> List[Dict[str, Any]]:
+    return [
+        {"ingredient": ingredients[it.ingredient_id], "amount_g": it.amount_g}
+        for it in recipe.items
+        if it.ingredient_id in ingredients
+    ]
+
+
+def _load_ingredients(db: Session, ids) -> Dict[int, Ingredient]:
+    ids = set(ids)
+    if not ids:
+        return {}
+    return {ing.id: ing for ing in db.execute(select(Ingredient).where(Ingredient.id.in_(ids))).scalars()}
+
+
+def recompute_recipe(db: Session, recipe: Recipe, ingredients: Optional[Dict[int, Ingredient]] = None) -> None:
+    """Full recompute of the cached sums, exactly as compute_totals sums them."""
+    if ingredients is None:
+        ingredients = _load_ingredients(db, (it.ingredient_id for it in recipe.items))
+    raw = compute_totals(_hydrate(recipe, ingredients), unit_weight_g=0.0, mode="float")["raw_per_unit"]
+    for key in SUM_KEYS:
+        setattr(recipe, key, raw[key])
+
+
+def save_recipe(
+    db: Session,
+    recipe_name: str,
+    unit_weight_g: float,
+    items: Sequence[Tuple[int, float]],
+    recipe: Optional[Recipe] = None,
+) -> Tuple[Recipe, List[int]]:
+    """
+    Create (recipe=None) or replace a saved recipe and compute its sums.
+    items: [(ingredient_id, amount_g), ...]. Returns (recipe, unknown ingredient ids);
+    nothing is added to the session when some ids are unknown. Does not commit.
+    """
+    ingredients = _load_ingredients(db, (iid for iid, _ in items))
+    unknown = sorted({iid for iid, _ in items if iid not in ingredients})
+    if unknown:
+        return recipe, unknown
+
+    if recipe is None:
+        recipe = Recipe()
+        db.add(recipe)
+    recipe.recipe_name = (recipe_name or "").strip()
+    recipe.unit_weight_g = float(unit_weight_g or 0.0)
+    recipe.items = [
+        RecipeItem(position=pos, ingredient_id=int(iid), amount_g=float(amt or 0.0))
+        for pos, (iid, amt) in enumerate(items)
+    ]
+    recipe.updated_at = datetime.utcnow()
+    recompute_recipe(db, recipe, ingredients)
+    return recipe, []
+
+
+def apply_ingredient_change(
+    db: Session,
+    ingredient_id: int,
+    old: Optional[NutrientValues],
+    new: Optional[NutrientValues],
+) -> int:
+    """
+    Update the cached sums of the recipes using ingredient_id after its values
+    changed from old to new (None = ingredient did not exist / was deleted).
+    Only those recipes are touched: each item adds amount/100 x new and takes
+    away amount/100 x old. Call before committing the ingredient change, in
+    the same transaction. Returns the number of recipes updated.
+    """
+    if old == new:
+        return 0
+    uses = db.execute(
+        select(RecipeItem.recipe_id, RecipeItem.amount_g)
+        .where(RecipeItem.ingredient_id == ingredient_id)
+        .order_by(RecipeItem.recipe_id, RecipeItem.position)
+    ).all()
+    if not uses:
+        return 0
+
+    now = datetime.utcnow()
+    zeros = (0.0,) * len(SUM_KEYS)
+    old = old or zeros
+    new = new or zeros
+    changed = [(key, before, after) for key, before, after in zip(SUM_KEYS, old, new) if before != after]
+    deltas: Dict[int, Dict[str, float]] = {}
+    for recipe_id, amount_g in uses:
+        delta = deltas.setdefault(recipe_id, dict.fromkeys((key for key, _, _ in changed), 0.0))
+        factor = float(amount_g or 0.0) / 100.0
+        for key, before, after in changed:
+            delta[key] += factor * after - factor * before
+
+    # col = col + :delta in SQL (one executemany): a read-modify-write through
+    # the ORM would lose a concurrent update of the same recipe
+    table = Recipe.__table__
+    db.execute(
+        update(table)
+        .where(table.c.id == bindparam("recipe_id"))
+        .values(updated_at=bindparam("now"), **{key: table.c[key] + bindparam(f"d_{key}") for key, _, _ in changed}),
+        [
+            {"recipe_id": recipe_id, "now": now, **{f"d_{key}": value for key, value in delta.items()}}
+            for recipe_id, delta in deltas.items()
+        ],
+    )
+    # Recipes already loaded in the session re-read their sums on next access
+    for obj in list(db.identity_map.values()):
+        if isinstance(obj, Recipe) and obj.id in deltas:
+            db.expire(obj, [*(key for key, _, _ in changed), "updated_at"])
+    return len(deltas)
+
+
+def recompute_all_recipes(db: Session) -> Dict[str, Any]:
+    """
+    Full recompute of every saved recipe (after bulk ingredient changes such
+    as the Excel seed). Also reports how far the incrementally maintained
+    sums had drifted from an exact recompute. Does not commit.
+    """
+    recipes = db.execute(select(Recipe)).scalars().all()
+    ingredients = _load_ingredients(
+        db, db.execute(select(RecipeItem.ingredient_id).distinct()).scalars()
+    )
+    max_drift = 0.0
+    for recipe in recipes:
+        before = recipe_sums(recipe)
+        recompute_recipe(db, recipe, ingredients)
+        after = recipe_sums(recipe)
+        max_drift = max([max_drift, *(abs(after[k] - before[k]) for k in SUM_KEYS)])
+    return {"recipes": len(recipes), "max_drift": max_drift}
+
+
+def substitution_impact(
+    db: Session,
+    matrix: NutrientMatrix,
+    ingredient_id: int,
+    substitute_ids: Sequence[int],
+) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Label change of every saved recipe using ingredient_id if it were replaced
+    (same grams) by each of substitute_ids. Returns {substitute_id: [{recipe_id,
+    recipe_name, per_unit: {key: [before, after]}, per_100g: {...}}, ...]} with
+    only the rounded values that change. All variants are computed in one
+    compute_totals_batch call against the catalog matrix.
+    """
+    recipe_ids = db.execute(
+        select(RecipeItem.recipe_id).where(RecipeItem.ingredient_id == ingredient_id).distinct()
+    ).scalars().all()
+    impact: Dict[int, List[Dict[str, Any]]] = {sid: [] for sid in substitute_ids}
+    if not recipe_ids:
+        return impact
+    recipes = db.execute(
+        select(Recipe.id, Recipe.recipe_name, Recipe.unit_weight_g).where(Recipe.id.in_(recipe_ids)).order_by(Recipe.id)
+    ).all()
+    items: Dict[int, List[Tuple[int, float]]] = {rid: [] for rid, _, _ in recipes}
+    for rid, iid, amount_g in db.execute(
+        select(RecipeItem.recipe_id, RecipeItem.ingredient_id, RecipeItem.amount_g)
+        .where(RecipeItem.recipe_id.in_(recipe_ids))
+        .order_by(RecipeItem.recipe_id, RecipeItem.position)
+    ):
+        items[rid].append((iid, float(amount_g or 0.0)))
+
+    variants = [ingredient_id, *substitute_ids]
+    batch, weights = [], []
+    for rid, _, unit_weight_g in recipes:
+        iids = [iid for iid, _ in items[rid]]
+        amounts = [amt for _, amt in items[rid]]
+        for variant in variants:
+            swapped = [variant if iid == ingredient_id else iid for iid in iids]
+            batch.append((matrix.rows(swapped), amounts))
+            weights.append(float(unit_weight_g or 0.0))
+    totals = compute_totals_batch(matrix, batch, weights)
+
+    for r, (rid, name, _) in enumerate(recipes):
+        before = totals[r * len(variants)]
+        for v, sid in enumerate(substitute_ids, start=1):
+            after = totals[r * len(variants) + v]
+            entry: Dict[str, Any] = {"recipe_id": rid, "recipe_name": name}
+            for basis in ("per_unit", "per_100g"):
+                entry[basis] = {
+                    key: [before[basis][key], value]
+                    for key, value in after[basis].items()
+                    if value != before[basis][key]
+                }
+            impact[sid].append(entry)
+    return impact
@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import copy
+import heapq
+import operator
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import chain, islice
+from typing import Any, Callable, Dict, FrozenSet, Iterator, List, Optional, Tuple
+
+from .catalog import Catalog, IngredientSnapshot
+
+# A candidate list longer than this is intersected with the postings of the
+# query's other bigrams, rarest first, at most INTERSECT_LISTS of them
+INTERSECT_MIN = 256
+INTERSECT_LISTS = 3
+# Substring candidates verified per query at most. A query made only of one
+# very common gram (e.g. "99999": its one bigram is in thousands of names)
+# returns the matches among that many candidates; typing more narrows it down.
+MAX_VERIFY = 1024
+# Changed ingredients a patched index carries before it is rebuilt instead
+MAX_PATCH_ROWS = 2000
+
+# Compatibility jamo for the 19 initial consonants, in Unicode syllable order
+_CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+_CHOSEONG_SET = frozenset(_CHOSEONG)
+_HANGUL_FIRST = 0xAC00
+_HANGUL_LAST = 0xD7A3
+_SYLLABLES_PER_CHOSEONG = 21 * 28
+
+# str.translate table: every precomposed syllable -> its initial consonant
+_TO_CHOSEONG = {
+    code: _CHOSEONG[(code - _HANGUL_FIRST) // _SYLLABLES_PER_CHOSEONG]
+    for code in range(_HANGUL_FIRST, _HANGUL_LAST + 1)
+}
+
+
+def normalize(s: str) -> str:
+    return "".join((s or "").casefold().split())
+
+
+def to_choseong(s: str) -> str:
+    """'치아씨드' -> 'ㅊㅇㅆㄷ' (non-Hangul characters are kept as-is)."""
+    return s.translate(_TO_CHOSEONG)
+
+
+def _is_choseong_query(q: str) -> bool:
+    return bool(q) and all(ch in _CHOSEONG_SET for ch in q)
+
+
+class _Prefix:
+    """Sorted keys for prefix lookup by bisection."""
+
+    def __init__(self, keys: List[str]):
+        self.by_position = keys
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.keys = [keys[pos] for pos in order]
+        self.positions = array("i", order)
+
+    def lookup(self, q: str, limit: int):
+        i = bisect_left(self.keys, q)
+        keys = self.keys
+        while i < len(keys) and limit > 0 and keys[i].startswith(q):
+            yield self.positions[i]
+            i += 1
+            limit -= 1
+
+
+class _Grams:
+    """Unigram/bigram posting lists over the normalized fields of each ingredient."""
+
+    def __init__(self, fields: List[Tuple[str, ...]]):
+        # All fields of a position in one string: normalized text has no "\0",
+        # so a match never spans two fields
+        self.joined = ["\0".join(parts) for parts in fields]
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for pos, parts in enumerate(fields):
+            grams = set()
+            for part in parts:
+                grams.update(part)
+                grams.update(map(operator.add, part, part[1:]))
+            for gram in grams:
+                postings[gram].append(pos)
+        # Positions follow catalog (display) order, so every list is sorted.
+        self.postings = {gram: array("i", plist) for gram, plist in postings.items()}
+
+    def contains(self, pos: int, q: str) -> bool:
+        return q in self.joined[pos]
+
+    def candidates(self, q: str):
+        if len(q) == 1:
+            return self.postings.get(q, array("i"))
+        lists = []
+        for gram in {q[i:i + 2] for i in range(len(q) - 1)}:
+            plist = self.postings.get(gram)
+            if plist is None:
+                return array("i")
+            lists.append(plist)
+        lists.sort(key=len)
+        best = lists[0]
+        if len(best) <= INTERSECT_MIN or len(lists) == 1:
+            return best
+        # Very common grams (digits, "ur", ...): bisect the candidates into the
+        # next rarest lists, vectorized, instead of verifying each one
+        import numpy as np
+
+        found = np.frombuffer(best, dtype=np.intc)
+        for plist in lists[1:1 + INTERSECT_LISTS]:
+            other = np.frombuffer(plist, dtype=np.intc)
+            at = np.minimum(np.searchsorted(other, found), len(other) - 1)
+            found = found[other[at] == found]
+            if len(found) <= INTERSECT_MIN:
+                break
+        return found.tolist()
+
+    def matches(self, q: str) -> Iterator[int]:
+        """Positions containing q, in order; at most MAX_VERIFY candidates are checked."""
+        joined = self.joined
+        for pos in islice(self.candidates(q), MAX_VERIFY):
+            if q in joined[pos]:
+                yield pos
+
+
+class IngredientSearchIndex:
+    """
+    In-memory typeahead index over display_name, name and brand.
+    Ranking: display_name prefix, then name/brand prefix (both by bisection
+    over sorted keys), then substring matches in catalog display order.
+    Substring candidates come from the rarest bigram of the query and are
+    verified with a plain `in` check. A query made only of initial consonants
+    (e.g. 'ㅊㅇㅆ') is matched against the choseong form of the names as well.
+
+    patched() returns a copy for a catalog that differs in a few ingredients:
+    the built structures are shared and skip the changed rows, and the
+    changed ingredients get a small index of their own whose matches are
+    merged in at their display position.
+    """
+
+    def __init__(self, ingredients: Tuple[IngredientSnapshot, ...], order_keys: Tuple[Tuple[str, int], ...] = ()):
+        self.ingredients = ingredients
+        # (sort_key, id) per position; patching needs them in sorted order
+        self.order_keys = order_keys if all(a < b for a, b in zip(order_keys, order_keys[1:])) else ()
+        display, names, brands = [], [], []
+        for ing in ingredients:
+            display.append(normalize(ing.display_name))
+            names.append(normalize(ing.name))
+            brands.append(normalize(ing.brand))
+        display_choseong = [to_choseong(t) for t in display]
+
+        self._text = _Grams(list(zip(display, names, brands)))
+        # display_name already holds "name | brand", so it covers all three here
+        self._choseong = _Grams([(t,) for t in display_choseong])
+        self._display = _Prefix(display)
+        self._display_choseong = _Prefix(display_choseong)
+        self._name = _Prefix(names)
+        self._brand = _Prefix(brands)
+
+        # Set by patched(): positions of changed ingredients, an index of
+        # their current rows and the rank of each of those among positions
+        self._position_of: Optional[Dict[int, int]] = None
+        self.dead: FrozenSet[int] = frozenset()
+        self.delta: Optional[IngredientSearchIndex] = None
+        self.delta_ranks: Tuple[tuple, ...] = ()
+        self.patches = 0
+
+    @classmethod
+    def build(cls, catalog: Catalog) -> "IngredientSearchIndex":
+        return cls(catalog.ingredients, catalog.order_keys)
+
+    def patched(self, catalog: Catalog, changed: FrozenSet[int]) -> "IngredientSearchIndex":
+        """Index for catalog, which differs from this index's catalog in the changed ids."""
+        if not self.order_keys:
+            return IngredientSearchIndex.build(catalog)
+        if self._position_of is None:
+            self._position_of = {ing.id: pos for pos, ing in enumerate(self.ingredients)}
+        dead = set(self.dead)
+        delta_ids = {ing.id for ing in self.delta.ingredients} if self.delta else set()
+        for iid in changed:
+            pos = self._position_of.get(iid)
+            if pos is not None:
+                dead.add(pos)
+            delta_ids.discard(iid)
+            if catalog.get(iid) is not None:
+                delta_ids.add(iid)
+        if len(dead) + len(delta_ids) > MAX_PATCH_ROWS:
+            return IngredientSearchIndex.build(catalog)
+
+        keys = [key for key in catalog.order_keys if key[1] in delta_ids]
+        index = copy.copy(self)
+        index.dead = frozenset(dead)
+        index.delta = IngredientSearchIndex(tuple(catalog.get(iid) for _, iid in keys)) if keys else None
+        # A changed row goes before the base position its (sort_key, id) bisects to
+        index.delta_ranks = tuple((bisect_left(self.order_keys, key), 0, key) for key in keys)
+        index.patches = self.patches + 1
+        return index
+
+    def _stages(self, q: str, limit: int) -> List[Tuple[Optional[Callable[[int], str]], Iterator[int]]]:
+        """
+        Ranking stages in order, as (key of a position for prefix stages or
+        None, matching positions in rank order).
+        """
+        choseong = _is_choseong_query(q)
+        prefixes = [self._display, self._display_choseong] if choseong else [self._display]
+        prefixes += [self._name, self._brand]
+        stages = [(p.by_position.__getitem__, p.lookup(q, limit)) for p in prefixes]
+        stages.append((None, self._text.matches(q)))
+        if choseong:
+            stages.append((None, self._choseong.matches(q)))
+        return stages
+
+    def _streams(self, q: str, limit: int) -> List[Iterator[IngredientSnapshot]]:
+        if self.delta is None and not self.dead:
+            return [map(self.ingredients.__getitem__, positions) for _, positions in self._stages(q, limit)]
+        # Dead rows can fill a prefix lookup's limit: look up that many more
+        base = self._stages(q, limit + len(self.dead))
+        delta = self.delta._stages(q, limit) if self.delta else [(None, iter(()))] * len(base)
+        return [
+            self._merged(key_of, positions, delta_key_of, delta_positions)
+            for (key_of, positions), (delta_key_of, delta_positions) in zip(base, delta)
+        ]
+
+    def _merged(self, key_of, positions, delta_key_of, delta_positions) -> Iterator[IngredientSnapshot]:
+        """One stage of a patched index: live base matches and changed rows in rank order."""
+        ingredients, dead = self.ingredients, self.dead
+        ranks, delta_ingredients = self.delta_ranks, self.delta.ingredients if self.delta else ()
+        if key_of is None:
+            live = (((pos, 1), ingredients[pos]) for pos in positions if pos not in dead)
+            changed = ((ranks[pos], delta_ingredients[pos]) for pos in delta_positions)
+        else:
+            live = (((key_of(pos), (pos, 1)), ingredients[pos]) for pos in positions if pos not in dead)
+            changed = (((delta_key_of(pos), ranks[pos]), delta_ingredients[pos]) for pos in delta_positions)
+        for _, ing in heapq.merge(live, changed, key=operator.itemgetter(0)):
+            yield ing
+
+    def search(self, query: str, limit: int = 20) -> List[IngredientSnapshot]:
+        q = normalize(query)
+        if not q or limit <= 0:
+            return []
+        found: List[IngredientSnapshot] = []
+        seen = set()
+        for ing in chain.from_iterable(self._streams(q, limit)):
+            if ing.id not in seen:
+                seen.add(ing.id)
+                found.append(ing)
+                if len(found) >= limit:
+                    break
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        changed = len(self.delta.ingredients) if self.delta else 0
+        return {
+            "size": len(self.ingredients) - len(self.dead) + changed,
+            "patches": self.patches,
+            "changed": changed,
+            "dead": len(self.dead),
+        }
+
+
+def get_search_index(catalog: Catalog) -> IngredientSearchIndex:
+    return catalog.derived(
+        "search_index",
+        IngredientSearchIndex.build,
+        patch=lambda index, c, changed: index.patched(c, changed),
+    )
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, FrozenSet, List, Optional, Tuple
+
+from .calc import NUTRIENT_FIELDS
+from .catalog import Catalog, get_nutrient_matrix
+
+if TYPE_CHECKING:
+    import numpy as np  # imported on first use below (keeps `import app.main` light)
+
+# Nearest candidates by the fast float32 distance that are re-ranked exactly
+RERANK = 256
+# A patched index with more deleted rows than this share is rebuilt instead
+MAX_DEAD_FRACTION = 0.25
+
+
+class NutrientVectorIndex:
+    """
+    Nearest-neighbour index over the per-100g nutrient profile of every
+    ingredient (all NUTRIENT_FIELDS columns). Each column is divided by its
+    standard deviation over the catalog, so sodium in mg does not outweigh
+    fat in g; distance is Euclidean in that space.
+
+    Vectors are kept as one float32 matrix with squared norms, so a query is
+    a single matrix-vector product (|v|^2 - 2 v.q + |q|^2) over the catalog;
+    the best RERANK rows are then re-ranked with exact float64 distances.
+
+    patched() returns a copy with changed ingredients overwritten, added or
+    marked deleted, keeping the scales of the full build.
+    """
+
+    def __init__(self, ids: np.ndarray, values: np.ndarray, scales: Optional[np.ndarray] = None):
+        import numpy as np
+
+        values = np.asarray(values, dtype=np.float64).reshape(len(ids), len(NUTRIENT_FIELDS))
+        if scales is None:
+            scales = values.std(axis=0) if len(ids) else np.ones(len(NUTRIENT_FIELDS))
+            scales = np.where(scales > 0, scales, 1.0)
+        self.scales = scales
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.exact = values / scales
+        self.vectors = np.ascontiguousarray(self.exact, dtype=np.float32)
+        self.norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+        self.alive = np.ones(len(self.ids), dtype=bool)
+        self.row_of: Dict[int, int] = {int(iid): i for i, iid in enumerate(self.ids)}
+        self.patches = 0
+
+    @classmethod
+    def build(cls, catalog: Catalog) -> "NutrientVectorIndex":
+        matrix = get_nutrient_matrix(catalog)
+        return cls(matrix.ids, matrix.values)
+
+    def __len__(self) -> int:
+        return int(self.alive.sum())
+
+    def patched(self, catalog: Catalog, changed: FrozenSet[int]) -> "NutrientVectorIndex":
+        """Index for catalog, which differs from this index's catalog in the changed ids."""
+        import numpy as np
+
+        dead = len(self.ids) - len(self)
+        if dead + len(changed) > MAX_DEAD_FRACTION * max(len(self.ids), 1):
+            return NutrientVectorIndex.build(catalog)
+
+        index = NutrientVectorIndex.__new__(NutrientVectorIndex)
+        index.scales = self.scales
+        index.row_of = dict(self.row_of)
+        index.patches = self.patches + 1
+        alive = self.alive.copy()
+        updated: List[Tuple[int, int]] = []
+        added: List[int] = []
+        for iid in sorted(changed):
+            row = index.row_of.get(iid)
+            if catalog.get(iid) is None:
+                if row is not None:
+                    alive[row] = False
+                    del index.row_of[iid]
+            elif row is None:
+                added.append(iid)
+            else:
+                updated.append((row, iid))
+
+        exact = self.exact
+        ids = self.ids
+        if updated or added:
+            def values(iids):
+                return np.array(
+                    [[getattr(catalog.get(iid), col) for _, col in NUTRIENT_FIELDS] for iid in iids],
+                    dtype=np.float64,
+                ).reshape(len(iids), len(NUTRIENT_FIELDS)) / self.scales
+
+            exact = exact.copy()
+            if updated:
+                rows = np.array([row for row, _ in updated], dtype=np.intp)
+                exact[rows] = values([iid for _, iid in updated])
+            if added:
+                for i, iid in enumerate(added):
+                    index.row_of[iid] = len(ids) + i
+                exact = np.vstack([exact, values(added)])
+                ids = np.concatenate([ids, np.array(added, dtype=np.int64)])
+                alive = np.concatenate([alive, np.ones(len(added), dtype=bool)])
+        index.ids = ids
+        index.exact = exact
+        index.alive = alive
+        if exact is self.exact:
+            index.vectors, index.norms = self.vectors, self.norms
+        else:
+            index.vectors = np.ascontiguousarray(exact, dtype=np.float32)
+            index.norms = np.einsum("ij,ij->i", index.vectors, index.vectors)
+        return index
+
+    def nearest(self, ingredient_id: int, k: int = 10) -> List[Tuple[int, float]]:
+        """
+        The k ingredients closest to ingredient_id (itself excluded) as
+        [(ingredient_id, distance), ...], closest first; ties by id.
+        Empty if ingredient_id is not in the index.
+        """
+        import numpy as np
+
+        row = self.row_of.get(int(ingredient_id))
+        if row is None or k <= 0:
+            return []
+        q = self.vectors[row]
+        approx = self.norms - 2.0 * (self.vectors @ q)
+        approx[~self.alive] = np.inf
+        approx[row] = np.inf
+        n_alive = len(self) - 1
+        take = min(max(k, RERANK), n_alive)
+        if take <= 0:
+            return []
+        rows = np.argpartition(approx, take - 1)[:take] if take < len(approx) else np.arange(len(approx))
+        rows = rows[np.isfinite(approx[rows])]
+
+        diff = self.exact[rows] - self.exact[row]
+        dist = np.sqrt(np.einsum("ij,ij->i", diff, diff))
+        order = np.lexsort((self.ids[rows], dist))[:k]
+        return [(int(self.ids[rows[i]]), float(dist[i])) for i in order]
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "size": len(self),
+            "rows": len(self.ids),
+            "patches": self.patches,
+            "scales": {key: float(s) for (key, _), s in zip(NUTRIENT_FIELDS, self.scales)},
+        }
+
+
+def get_similarity_index(catalog: Catalog) -> NutrientVectorIndex:
+    return catalog.derived(
+        "similarity_index",
+        NutrientVectorIndex.build,
+        patch=lambda index, c, changed: index.patched(c, changed),
+    )
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import struct
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence
+
+from .calc import CALC_MODE, NUTRIENT_FIELDS, NUTRIENTS_ORDER, ROUND_G, ROUND_KCAL, ROUND_MG
+from .catalog import Catalog, get_nutrient_matrix
+from .compression import compress
+
+# Binary catalog snapshot for the browser calculator (app/static/calc.js):
+#
+#   b"NCAT" | uint32 header length | header JSON (utf-8) | sections
+#
+# All numbers are little-endian and every section starts at a multiple of 8,
+# so the client maps them straight into typed arrays. The header lists each
+# section's byte offset: ingredient ids (int32), one column per
+# NUTRIENT_FIELDS entry, and display names (uint32 offsets + utf-8 bytes).
+#
+# A nutrient column is int16 / int32 with a decimal scale when every value
+# is exactly k / 10^d as a double (the usual case: values typed with a few
+# decimals), else float64. The client divides k by 10^d, which gives back
+# the same double, so its sums match compute_totals bit for bit. float32
+# would not: 0.1 as a float32 is not the 0.1 the server sums.
+# The header's "mode" is calc.CALC_MODE; the client only implements "float".
+SNAPSHOT_MAGIC = b"NCAT"
+SNAPSHOT_FORMAT = 1
+# Most decimals tried for an integer column
+MAX_DECIMALS = 6
+_INT32_LIMIT = 2 ** 31 - 1
+_INT16_LIMIT = 2 ** 15 - 1
+
+
+@dataclass
+class CatalogSnapshot:
+    version: int
+    count: int
+    digest: str
+    # encoding ("identity", "gzip") -> bytes
+    bodies: Dict[str, bytes] = field(default_factory=dict)
+
+
+def _column(values) -> tuple:
+    """(type, decimals, little-endian bytes) for one nutrient column."""
+    import numpy as np
+
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    if np.isfinite(values).all():
+        for decimals in range(MAX_DECIMALS + 1):
+            scale = float(10 ** decimals)
+            scaled = np.round(values * scale)
+            if np.abs(scaled).max(initial=0.0) > _INT32_LIMIT:
+                break
+            if np.array_equal(scaled / scale, values):
+                if np.abs(scaled).max(initial=0.0) <= _INT16_LIMIT:
+                    return "i16", decimals, scaled.astype("<i2").tobytes()
+                return "i32", decimals, scaled.astype("<i4").tobytes()
+    return "f64", 0, values.astype("<f8").tobytes()
+
+
+def _pad(buf: bytearray) -> None:
+    buf.extend(b"\0" * (-len(buf) % 8))
+
+
+def encode_snapshot(version: int, ids: Sequence[int], columns, names: List[str]) -> bytes:
+    """
+    ids: one per ingredient; columns: (ingredients x NUTRIENT_FIELDS) per-100g
+    values; names: display names. Returns the uncompressed snapshot.
+    """
+    import numpy as np
+
+    sections: List[tuple] = [("ids", np.asarray(ids, dtype="<i4").tobytes())]
+    fields = []
+    for j, (key, col) in enumerate(NUTRIENT_FIELDS):
+        kind, decimals, data = _column(columns[:, j])
+        fields.append({"key": key, "column": col, "type": kind, "decimals": decimals})
+        sections.append((key, data))
+    encoded = [name.encode("utf-8") for name in names]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    sections.append(("name_offsets", offsets.tobytes()))
+    sections.append(("names", b"".join(encoded)))
+
+    header: Dict[str, Any] = {
+        "format": SNAPSHOT_FORMAT,
+        "catalog_version": version,
+        "count": len(ids),
+        "mode": CALC_MODE,
+        "rounding": {"kcal": ROUND_KCAL, "mg": ROUND_MG, "g": ROUND_G},
+        "nutrients": [list(row) for row in NUTRIENTS_ORDER],
+        "fields": fields,
+        "sections": {},
+    }
+    # Offsets depend on the header length, which depends on the offsets:
+    # lay out with placeholders until the header length settles.
+    while True:
+        raw = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        start = len(SNAPSHOT_MAGIC) + 4 + len(raw)
+        pos = start + (-start % 8)
+        layout = {}
+        for name, data in sections:
+            layout[name] = {"offset": pos, "length": len(data)}
+            pos += len(data) + (-len(data) % 8)
+        if layout == header["sections"]:
+            break
+        header["sections"] = layout
+
+    buf = bytearray(SNAPSHOT_MAGIC)
+    buf += struct.pack("<I", len(raw))
+    buf += raw
+    for _, data in sections:
+        _pad(buf)
+        buf += data
+    return bytes(buf)
+
+
+def build_snapshot(catalog: Catalog) -> CatalogSnapshot:
+    import numpy as np
+
+    matrix = get_nutrient_matrix(catalog)
+    # Rows by id: the id column becomes an increasing sequence, which gzip packs well
+    order = np.argsort(matrix.ids, kind="stable")
+    ingredients = catalog.ingredients
+    body = encode_snapshot(
+        catalog.version,
+        matrix.ids[order],
+        matrix.values[order],
+        [ingredients[i].display_name for i in order.tolist()],
+    )
+    return CatalogSnapshot(
+        version=catalog.version,
+        count=len(matrix),
+        digest=hashlib.sha256(body).hexdigest()[:16],
+        bodies={"identity": body, "gzip": compress(body, "gzip")},
+    )
+
+
+def get_catalog_snapshot(catalog: Catalog) -> CatalogSnapshot:
+    return catalog.derived("snapshot", build_snapshot)
@@ -0,0 +1,146 @@
+// 브라우저 영양성분 계산 (app/services/calc.py의 compute_totals와 같은 결과)
+// 원재료 값은 /api/catalog/snapshot (app/services/snapshot.py 형식)에서 받아 오고,
+// 마지막으로 받은 스냅샷은 Cache Storage에 보관해 오프라인에서도 계산합니다.
+// 서버와 같은지 확인: python bench/calc_parity.py
+(function (root) {
+  'use strict';
+
+  const MAGIC = 'NCAT';
+  const CACHE_NAME = 'nutrition-catalog';
+  // 10^d (정확한 double)
+  const POW10 = [1, 10, 100, 1000, 10000, 100000, 1000000];
+
+  function parseSnapshot(buffer) {
+    const view = new DataView(buffer);
+    const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    if (magic !== MAGIC) throw new Error('not a catalog snapshot');
+    const headerLength = view.getUint32(4, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)));
+    if (header.format !== 1) throw new Error('unsupported snapshot format ' + header.format);
+
+    const count = header.count;
+    const sections = header.sections;
+    const ids = new Int32Array(buffer, sections.ids.offset, count);
+    const columns = {};
+    for (const f of header.fields) {
+      const offset = sections[f.key].offset;
+      if (f.type === 'f64') {
+        columns[f.key] = new Float64Array(buffer, offset, count);
+      } else {
+        // k / 10^d: 서버가 저장한 값과 같은 double
+        const scaled = f.type === 'i16' ? new Int16Array(buffer, offset, count) : new Int32Array(buffer, offset, count);
+        const values = new Float64Array(count);
+        const scale = POW10[f.decimals];
+        for (let i = 0; i < count; i++) values[i] = scaled[i] / scale;
+        columns[f.key] = values;
+      }
+    }
+    const nameOffsets = new Uint32Array(buffer, sections.name_offsets.offset, count + 1);
+    const nameBytes = new Uint8Array(buffer, sections.names.offset, sections.names.length);
+    const decoder = new TextDecoder();
+
+    const rowOf = new Map();
+    for (let i = 0; i < count; i++) rowOf.set(ids[i], i);
+
+    return {
+      version: header.catalog_version,
+      count,
+      // 서버 계산 방식 (CALC_MODE): 이 파일은 "float"만 계산
+      mode: header.mode || 'float',
+      rounding: header.rounding,
+      nutrients: header.nutrients,  // [key, label, unit] (NUTRIENTS_ORDER)
+      fields: header.fields.map(f => f.key),
+      ids,
+      columns,
+      rowOf,
+      name(id) {
+        const i = rowOf.get(id);
+        if (i === undefined) return null;
+        return decoder.decode(nameBytes.subarray(nameOffsets[i], nameOffsets[i + 1]));
+      },
+    };
+  }
+
+  // Python round(x, n): 정확한 이진 값 기준 반올림, 정확히 절반이면 짝수 쪽
+  function pyRound(x, n) {
+    if (!Number.isFinite(x)) return x;
+    // x * 10^n이 정확히 .5로 끝나는 경우는 x * 2^(n+1)이 홀수인 경우뿐
+    const scaled = x * 2 ** (n + 1);
+    const tie = scaled * 5 ** n;  // 2 * x * 10^n, 정수 범위 안에서는 정확
+    if (Number.isInteger(scaled) && Math.abs(scaled % 2) === 1 && Math.abs(tie) < 2 ** 53) {
+      const lower = (tie - 1) / 2;
+      const even = lower % 2 === 0 ? lower : lower + 1;
+      return even === 0 ? (x < 0 ? -0 : 0) : even / POW10[n];
+    }
+    if (Math.abs(x) >= 1e21) return x;
+    // toFixed도 정확한 이진 값 기준 (절반일 때만 Python과 다름, 위에서 처리)
+    const r = Number(x.toFixed(n));
+    return r === 0 && x < 0 ? -0 : r;
+  }
+
+  function round(snapshot, value, unit) {
+    const rounding = snapshot.rounding;
+    if (unit === 'kcal') return pyRound(value, rounding.kcal);
+    if (unit === 'mg') return pyRound(value, rounding.mg);
+    return pyRound(value, rounding.g);
+  }
+
+  function calcKcal(carbs, fiber, allulose, protein, fat) {
+    const digestible = Math.max(carbs - fiber - allulose, 0.0);
+    return 4.0 * digestible + 2.0 * fiber + 4.0 * protein + 9.0 * fat;
+  }
+
+  // items: [{ingredient_id, amount_g}], 카탈로그에 없는 원재료는 건너뜀 (서버와 동일)
+  function computeTotals(snapshot, items, unitWeightG) {
+    const sums = {};
+    for (const key of snapshot.fields) sums[key] = 0.0;
+    for (const it of items) {
+      const row = snapshot.rowOf.get(Number(it.ingredient_id));
+      if (row === undefined) continue;
+      const factor = (Number(it.amount_g) || 0.0) / 100.0;
+      for (const key of snapshot.fields) sums[key] += factor * snapshot.columns[key][row];
+    }
+
+    const rawPerUnit = {
+      kcal: calcKcal(sums.carbs_g, sums.fiber_g, sums.allulose_g, sums.protein_g, sums.fat_g),
+      ...sums,
+    };
+    const rawPer100g = {};
+    const weight = Number(unitWeightG) || 0.0;
+    const ratio = weight > 0 ? 100.0 / weight : 0.0;
+    for (const key in rawPerUnit) rawPer100g[key] = weight > 0 ? rawPerUnit[key] * ratio : 0.0;
+
+    const perUnit = {};
+    const per100g = {};
+    for (const [key, , unit] of snapshot.nutrients) {
+      perUnit[key] = round(snapshot, rawPerUnit[key] || 0.0, unit);
+      per100g[key] = round(snapshot, rawPer100g[key] || 0.0, unit);
+    }
+    return { per_unit: perUnit, per_100g: per100g, raw_per_unit: rawPerUnit, raw_per_100g: rawPer100g };
+  }
+
+  // 결과 화면(Jinja의 float 출력)과 같은 표기: 72 -> "72.0"
+  function formatValue(value) {
+    return Number.isInteger(value) ? value.toFixed(1) : String(value);
+  }
+
+  async function loadSnapshot(url) {
+    const cache = root.caches ? await root.caches.open(CACHE_NAME).catch(() => null) : null;
+    let response = null;
+    try {
+      // ETag로 확인: 카탈로그가 그대로면 304 → 브라우저 HTTP 캐시 사용
+      response = await fetch(url, { cache: 'no-cache' });
+      if (!response.ok) response = null;
+      else if (cache) await cache.put(url, response.clone());
+    } catch (e) {
+      response = null;  // 오프라인
+    }
+    if (!response && cache) response = (await cache.match(url)) || null;
+    if (!response) throw new Error('catalog snapshot unavailable');
+    return parseSnapshot(await response.arrayBuffer());
+  }
+
+  const api = { parseSnapshot, computeTotals, pyRound, calcKcal, formatValue, loadSnapshot };
+  if (typeof module !== 'undefined' && module.exports) module.exports = api;
+  else root.NutritionCalc = api;
+})(typeof self !== 'undefined' ? self : this);
@@ -0,0 +1,93 @@
+"""
+Float vs decimal arithmetic of compute_totals_batch (calc.CALC_MODE) on the
+same recipes, in memory (synthetic catalog from bench/synth.py, no DB).
+
+For each recipe length it reports the best and median time per batch of
+every mode / rounding rule, run interleaved so background noise hits all of
+them alike, and how many recipes get a different label (rounded per-unit or
+per-100g value) than in float mode. Exits with status 1 when decimal
+half_up is slower than float by more than --threshold (best of runs).
+
+    python bench/calc_modes.py                          # 10k ingredients, 1-500 item recipes
+    python bench/calc_modes.py --catalog 200000 --items 20 100 --repeat 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.services.calc import NUTRIENT_FIELDS, NutrientMatrix, compute_totals_batch  # noqa: E402
+from bench.synth import make_ingredients, make_recipe  # noqa: E402
+
+# (mode, rounding); the first one is the reference
+MODES = [("float", None), ("decimal", "half_up"), ("decimal", "half_even"), ("decimal", "regulatory")]
+BATCH = 256
+DEFAULT_THRESHOLD = 0.25
+
+
+def _label(totals) -> tuple:
+    return tuple(totals["per_unit"].values()) + tuple(totals["per_100g"].values())
+
+
+def run(catalog: int, items_list, repeat: int, threshold: float) -> bool:
+    rows = make_ingredients(catalog)
+    matrix = NutrientMatrix.from_values(
+        {i + 1: [row[col] for _, col in NUTRIENT_FIELDS] for i, row in enumerate(rows)}
+    )
+    matrix.fixed_values()  # built once per catalog, like the cached matrix
+    ids = list(range(1, catalog + 1))
+    weights = [95.0] * BATCH
+
+    ok = True
+    print(f"catalog {catalog:,} ingredients, {BATCH} recipes per batch, best of {repeat}")
+    print(f"{'items':>5}  {'mode':<20} {'best ms':>9} {'p50 ms':>9} {'recipes/s':>11} {'vs float':>9} {'labels changed':>15}")
+    for items in items_list:
+        batch = []
+        for seed in range(BATCH):
+            recipe = make_recipe(ids, items, seed)
+            batch.append((matrix.rows([iid for iid, _ in recipe]), [amt for _, amt in recipe]))
+
+        times = {m: [] for m in MODES}
+        results = {}
+        for _ in range(repeat):
+            for mode, rounding in MODES:
+                started = time.perf_counter()
+                results[mode, rounding] = compute_totals_batch(matrix, batch, weights, mode=mode, rounding=rounding)
+                times[mode, rounding].append((time.perf_counter() - started) * 1000)
+
+        reference = [_label(t) for t in results[MODES[0]]]
+        base = min(times[MODES[0]])
+        for m in MODES:
+            best = min(times[m])
+            changed = sum(a != b for a, b in zip(reference, (_label(t) for t in results[m])))
+            name = m[0] if m[1] is None else f"{m[0]}/{m[1]}"
+            print(
+                f"{items:>5}  {name:<20} {best:>9.3f} {statistics.median(times[m]):>9.3f}"
+                f" {BATCH / best * 1000:>11,.0f} {best / base:>8.2f}x {changed:>15}"
+            )
+        if min(times["decimal", "half_up"]) > base * (1 + threshold):
+            ok = False
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalog", type=int, default=10_000, help="synthetic catalog size")
+    parser.add_argument("--items", type=int, nargs="+", default=[1, 20, 100, 500], help="recipe lengths")
+    parser.add_argument("--repeat", type=int, default=20, help="runs per mode (best and median kept)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown of decimal half_up against float")
+    args = parser.parse_args()
+
+    ok = run(args.catalog, args.items, args.repeat, args.threshold)
+    print("OK" if ok else "FAIL: decimal mode slower than float")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""
+Parity check between app/services/calc.py and the browser calculator
+(app/static/calc.js) on a shared set of test vectors (bench/calc_vectors.json).
+
+The vectors hold a small ingredient catalog, recipes over it and the
+compute_totals result of each (rounded and unrounded), plus Python round()
+cases around the .5 ties. The check
+
+  1. recomputes every vector with calc.py (a change there that would make
+     clients disagree with the server fails here first),
+  2. encodes the catalog as a binary snapshot (app/services/snapshot.py),
+     runs calc.js on it under node and compares every value bit for bit.
+
+Exits with status 1 on any mismatch; step 2 is skipped when node is not
+installed.
+
+    python bench/calc_parity.py              # check
+    python bench/calc_parity.py --write      # regenerate the vectors from calc.py
+"""
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.services.calc import NUTRIENT_FIELDS, compute_totals  # noqa: E402
+from app.services.snapshot import encode_snapshot  # noqa: E402
+
+VECTORS_PATH = os.path.join(ROOT, "bench", "calc_vectors.json")
+CALC_JS = os.path.join(ROOT, "app", "static", "calc.js")
+COLUMNS = [col for _, col in NUTRIENT_FIELDS]
+BASES = ("per_unit", "per_100g", "raw_per_unit", "raw_per_100g")
+
+# Values that make label values land exactly on a rounding tie
+_TIES = [0.5, 0.25, 0.75, 1.25, 2.5, 0.125, 12.5, 0.05, 0.15, 0.35]
+
+
+def _value(rng: random.Random) -> float:
+    kind = rng.random()
+    if kind < 0.15:
+        return 0.0
+    if kind < 0.55:
+        return round(rng.uniform(0, 90), 2)      # typed with decimals (int32 column)
+    if kind < 0.75:
+        return rng.choice(_TIES) * rng.choice([1, 2, 4, 10])
+    return rng.uniform(0, 900)                    # full precision (float64 column)
+
+
+def make_vectors(seed: int = 20241016) -> dict:
+    rng = random.Random(seed)
+    ingredients = []
+    for i in range(80):
+        row = {"id": i * 7 + 1, "display_name": f"원재료 {i} | Brand"}
+        for col in COLUMNS:
+            row[col] = _value(rng)
+        ingredients.append(row)
+    # Columns that encode as int16 (1 decimal) and int32 (2 decimals, large); the rest stay float64
+    for row in ingredients:
+        row["sodium_mg_100g"] = round(row["sodium_mg_100g"], 1)
+        row["chol_mg_100g"] = round(rng.uniform(0, 900), 2)
+    ids = [row["id"] for row in ingredients]
+
+    recipes = []
+    for r in range(200):
+        items = []
+        for _ in range(rng.randint(0, 20)):
+            iid = rng.choice(ids) if rng.random() < 0.95 else 999999   # missing ingredient
+            kind = rng.random()
+            if kind < 0.5:
+                amount = round(rng.uniform(0.5, 500), 1)
+            elif kind < 0.7:
+                amount = rng.choice([100.0, 50.0, 200.0, 25.0, 10.0])
+            elif kind < 0.9:
+                amount = rng.uniform(0, 300)
+            else:
+                amount = 0.0
+            items.append([iid, amount])
+        weight_kind = rng.random()
+        if weight_kind < 0.05:
+            unit_weight = 0.0
+        elif weight_kind < 0.08:
+            unit_weight = -10.0
+        elif weight_kind < 0.5:
+            unit_weight = rng.choice([100.0, 50.0, 200.0, 80.0, 95.0])
+        else:
+            unit_weight = round(rng.uniform(10, 600), 1)
+        recipes.append({"unit_weight_g": unit_weight, "items": items})
+
+    rounds = []
+    for _ in range(1000):
+        n = rng.choice([0, 1, 2])
+        x = rng.randint(-20000, 20000) / (2 ** rng.randint(0, 6)) if rng.random() < 0.5 else rng.uniform(-1000, 1000)
+        rounds.append([x, n])
+    for x in (0.5, 1.5, 2.5, -0.5, -2.5, 0.25, 0.35, 0.45, 2.675, 1e-9, 123456.05):
+        for n in (0, 1, 2):
+            rounds.append([x, n])
+
+    return {"ingredients": ingredients, "recipes": recipes, "round": rounds}
+
+
+def compute_expected(vectors: dict) -> dict:
+    by_id = {row["id"]: SimpleNamespace(**row) for row in vectors["ingredients"]}
+    for recipe in vectors["recipes"]:
+        hydrated = [
+            {"ingredient": by_id[iid], "amount_g": amount} for iid, amount in recipe["items"] if iid in by_id
+        ]
+        totals = compute_totals(hydrated, recipe["unit_weight_g"])
+        recipe["expected"] = {basis: totals[basis] for basis in BASES}
+    vectors["round"] = [[x, n, round(x, n)] for x, n, *_ in vectors["round"]]
+    return vectors
+
+
+def _same(a, b) -> bool:
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return a == b and math.copysign(1.0, a) == math.copysign(1.0, b)
+
+
+def check_python(vectors: dict) -> list:
+    fresh = compute_expected(json.loads(json.dumps(vectors)))
+    mismatches = []
+    for i, (old, new) in enumerate(zip(vectors["recipes"], fresh["recipes"])):
+        for basis in BASES:
+            for key, value in new["expected"][basis].items():
+                if not _same(old["expected"][basis][key], value):
+                    mismatches.append(f"recipe {i} {basis}.{key}: vectors {old['expected'][basis][key]!r}, calc.py {value!r}")
+    for (x, n, expected), (_, _, value) in zip(vectors["round"], fresh["round"]):
+        if not _same(expected, value):
+            mismatches.append(f"round({x!r}, {n}): vectors {expected!r}, python {value!r}")
+    return mismatches
+
+
+_NODE_CHECK = r"""
+const fs = require('fs');
+const calc = require(process.argv[1]);
+const buf = fs.readFileSync(process.argv[2]);
+const vectors = JSON.parse(fs.readFileSync(process.argv[3], 'utf8'));
+const snapshot = calc.parseSnapshot(buf.buffer.slice(buf.byteOffset, buf.byteOffset + buf.byteLength));
+const mismatches = [];
+let checked = 0;
+vectors.recipes.forEach((recipe, i) => {
+  const items = recipe.items.map(([id, amount]) => ({ ingredient_id: id, amount_g: amount }));
+  const totals = calc.computeTotals(snapshot, items, recipe.unit_weight_g);
+  for (const basis of ['per_unit', 'per_100g', 'raw_per_unit', 'raw_per_100g']) {
+    for (const [key, expected] of Object.entries(recipe.expected[basis])) {
+      checked++;
+      if (!Object.is(totals[basis][key], expected)) {
+        mismatches.push(`recipe ${i} ${basis}.${key}: python ${expected}, js ${totals[basis][key]}`);
+      }
+    }
+  }
+});
+for (const [x, n, expected] of vectors.round) {
+  checked++;
+  const got = calc.pyRound(x, n);
+  if (!Object.is(got, expected) && !(got === 0 && expected === 0)) {
+    mismatches.push(`round(${x}, ${n}): python ${expected}, js ${got}`);
+  }
+}
+for (const row of vectors.ingredients) {
+  checked++;
+  if (snapshot.name(row.id) !== row.display_name) mismatches.push(`name ${row.id}: ${snapshot.name(row.id)}`);
+}
+console.log(JSON.stringify({ checked, mismatches }));
+"""
+
+
+def check_js(vectors: dict) -> tuple:
+    import numpy as np
+
+    rows = vectors["ingredients"]
+    body = encode_snapshot(
+        1,
+        [row["id"] for row in rows],
+        np.array([[row[col] for col in COLUMNS] for row in rows], dtype=np.float64),
+        [row["display_name"] for row in rows],
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_path = os.path.join(tmp, "snapshot.bin")
+        with open(snapshot_path, "wb") as f:
+            f.write(body)
+        out = subprocess.run(
+            ["node", "-e", _NODE_CHECK, CALC_JS, snapshot_path, VECTORS_PATH],
+            capture_output=True, text=True,
+        )
+    if out.returncode != 0:
+        return 0, [f"node failed: {out.stderr.strip()}"]
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    return result["checked"], result["mismatches"]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--write", action="store_true", help="regenerate bench/calc_vectors.json from calc.py")
+    args = parser.parse_args()
+
+    if args.write:
+        vectors = compute_expected(make_vectors())
+        with open(VECTORS_PATH, "w", encoding="utf-8") as f:
+            json.dump(vectors, f, ensure_ascii=False, separators=(",", ":"))
+        print(f"wrote {VECTORS_PATH}: {len(vectors['recipes'])} recipes, {len(vectors['round'])} round() cases")
+        return 0
+
+    with open(VECTORS_PATH, encoding="utf-8") as f:
+        vectors = json.load(f)
+
+    failed = False
+    mismatches = check_python(vectors)
+    print(f"calc.py: {len(vectors['recipes'])} recipes, {len(mismatches)} mismatches")
+    if mismatches:
+        failed = True
+        print("\n".join("  " + m for m in mismatches[:20]))
+
+    if shutil.which("node") is None:
+        print("calc.js: skipped (node not installed)")
+    else:
+        checked, mismatches = check_js(vectors)
+        print(f"calc.js: {checked} values, {len(mismatches)} mismatches")
+        if mismatches:
+            failed = True
+            print("\n".join("  " + m for m in mismatches[:20]))
+
+    print("FAIL" if failed else "OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
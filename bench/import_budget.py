@@ -0,0 +1,73 @@
+"""
+Cold-start budget check for `import app.main`.
+
+Each run imports the app in a fresh interpreter (so nothing is cached in
+sys.modules) and reports the median wall time. Exits with status 1 when the
+median exceeds the budget, or when a heavy library that should only load on
+first use (PDF rendering, exports, batch math) is already imported.
+
+    python bench/import_budget.py                # default budget
+    STARTUP_BUDGET_MS=1200 python bench/import_budget.py --runs 7
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1200"))
+
+# Must not be in sys.modules right after `import app.main`
+LAZY_MODULES = ["numpy", "reportlab", "openpyxl", "pypdf", "pandas", "pyarrow"]
+
+_PROBE = """
+import json, sys, time
+t = time.perf_counter()
+import app.main
+elapsed = (time.perf_counter() - t) * 1000
+print(json.dumps({"ms": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+def measure_once() -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    args = parser.parse_args()
+
+    samples = [measure_once() for _ in range(args.runs)]
+    times = sorted(s["ms"] for s in samples)
+    median = statistics.median(times)
+    loaded = sorted({m for s in samples for m in s["loaded"]})
+
+    print(f"import app.main: median {median:.0f} ms (min {times[0]:.0f}, max {times[-1]:.0f}, runs {args.runs})")
+    print(f"budget: {args.budget_ms:.0f} ms")
+
+    failed = False
+    if median > args.budget_ms:
+        print(f"FAIL: over budget by {median - args.budget_ms:.0f} ms")
+        failed = True
+    if loaded:
+        print(f"FAIL: loaded at import time: {', '.join(loaded)}")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
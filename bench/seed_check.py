@@ -0,0 +1,152 @@
+"""
+Regression check for seed_from_excel.py with a tiny chunk size, on both
+write paths: the native upsert (the (name, brand) unique index exists) and
+the keyed insert/update fallback (a DB whose duplicate rows kept the index
+from being created).
+
+The sheet repeats keys across chunks, so a key inserted by one chunk is
+updated by a later one. After the seed every key must hold the values of
+its last row, and a second seed of the same sheet must only update.
+Each case runs in its own interpreter (DATABASE_URL and SEED_CHUNK_SIZE
+are read at import). Exits with status 1 on any failure.
+
+    python bench/seed_check.py
+    python bench/seed_check.py --chunk 3 --rows 50
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Existing row duplicated in the fallback case, so the unique index cannot exist
+_DUPLICATE = {"name": "중복 원재료", "brand": "무브랜드", "display_name": "중복 원재료 | 무브랜드"}
+
+
+def make_rows(n: int):
+    """n synthetic rows, then every third one again with other values (same key, later chunk)."""
+    from bench.synth import make_ingredients
+
+    rows = make_ingredients(n, seed=11)
+    repeats = [dict(row, sodium_mg_100g=row["sodium_mg_100g"] + 1000.0, memo="갱신") for row in rows[::3]]
+    return rows + repeats
+
+
+def write_sheet(path: str, rows) -> None:
+    from openpyxl import Workbook
+
+    from seed_from_excel import COLMAP, EXCEL_SHEET
+
+    headers = list(COLMAP)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(EXCEL_SHEET)
+    ws.append(headers)
+    for row in rows:
+        ws.append([row.get(COLMAP[h]) for h in headers])
+    wb.save(path)
+
+
+def run_case(with_index: bool, n: int) -> dict:
+    """Worker side: seed twice and report what the DB holds."""
+    import contextlib
+    import io
+
+    from sqlalchemy import insert, select, text
+
+    from app.db import SessionLocal, has_unique_index, init_db
+    from app.models import Ingredient
+
+    init_db()
+    if not with_index:
+        with SessionLocal() as db:
+            db.execute(text("DROP INDEX IF EXISTS uq_ingredients_name_brand"))
+            db.execute(insert(Ingredient), [_DUPLICATE, _DUPLICATE])
+            db.commit()
+
+    import seed_from_excel
+
+    counts = []
+    for _ in range(2):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            seed_from_excel.main()
+        counts.append(out.getvalue())
+
+    expected = {}
+    for row in make_rows(n):
+        expected[row["name"], row["brand"]] = (round(row["sodium_mg_100g"], 6), row["memo"] or "")
+    with SessionLocal() as db:
+        stored = {}
+        for name, brand, sodium, memo in db.execute(
+            select(Ingredient.name, Ingredient.brand, Ingredient.sodium_mg_100g, Ingredient.memo)
+        ):
+            # the sheet stores floats shortened; an empty memo is "" or None depending on the path
+            stored.setdefault((name, brand or ""), []).append((round(sodium, 6), memo or ""))
+    wrong = [
+        f"{key}: {stored.get(key)} != {value}"
+        for key, value in expected.items()
+        if stored.get(key) != [value]
+    ]
+    return {
+        "index": has_unique_index("ingredients", "uq_ingredients_name_brand"),
+        "rows": sum(len(v) for v in stored.values()),
+        "expected_rows": len(expected) + (0 if with_index else 2),
+        "wrong": wrong[:5],
+        "second_run": next((line.strip() for line in counts[1].splitlines() if "추가" in line), counts[1]),
+    }
+
+
+def main() -> int:
+    if len(sys.argv) > 1 and sys.argv[1] == "--_case":
+        print(json.dumps(run_case(sys.argv[2] == "1", int(sys.argv[3])), ensure_ascii=False))
+        return 0
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk", type=int, default=2, help="SEED_CHUNK_SIZE for the seed")
+    parser.add_argument("--rows", type=int, default=30, help="distinct keys in the sheet")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="seed-check-")
+    ok = True
+    try:
+        sheet = os.path.join(workdir, "seed.xlsx")
+        write_sheet(sheet, make_rows(args.rows))
+        for with_index in (True, False):
+            db_path = os.path.join(workdir, f"seed-{int(with_index)}.db")
+            env = dict(
+                os.environ,
+                DATABASE_URL=f"sqlite:///{db_path}",
+                EXCEL_PATH=sheet,
+                SEED_CHUNK_SIZE=str(args.chunk),
+            )
+            cmd = [sys.executable, __file__, "--_case", "1" if with_index else "0", str(args.rows)]
+            out = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True)
+            path = "upsert" if with_index else "insert/update"
+            if out.returncode != 0:
+                print(f"  {path}: FAILED\n{out.stderr[-2000:]}")
+                ok = False
+                continue
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            good = (
+                result["index"] == with_index
+                and result["rows"] == result["expected_rows"]
+                and not result["wrong"]
+                and "추가 0," in result["second_run"]
+            )
+            ok = ok and good
+            print(f"  {path:<14} {'ok' if good else 'FAIL'}  {json.dumps(result, ensure_ascii=False)}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Synthetic, reproducible data for the benchmarks: an ingredient catalog of any
+size (Korean and English names, realistic nutrient ranges), recipes of any
+length drawn from it, and an Excel sheet in the seed_from_excel.py layout.
+The same seed always gives the same data.
+"""
+import random
+from typing import Dict, List, Tuple
+
+_KO_BASES = [
+    "밀가루", "박력분", "강력분", "아몬드가루", "버터", "무염버터", "설탕", "알룰로스", "에리스리톨",
+    "달걀", "우유", "생크림", "치아씨드", "귀리가루", "코코아파우더", "말차가루", "초코칩", "크림치즈",
+    "베이킹파우더", "소금", "바닐라익스트랙", "꿀", "흑임자", "호두", "피칸", "건포도", "요거트",
+]
+_EN_BASES = [
+    "Almond flour", "Butter", "Cocoa", "Oat flour", "Whey protein", "Inulin", "Psyllium", "Cream cheese",
+    "Matcha", "Coconut oil", "Vanilla", "Baking soda", "Chia seed", "Flaxseed", "Dark chocolate",
+]
+_BRANDS = ["", "무브랜드", "서울우유", "곰표", "Bob's Red Mill", "앵커", "Valrhona", "큐원", "백설", "NOW"]
+
+NUTRIENT_RANGES = {
+    "sodium_mg_100g": (0.0, 900.0),
+    "carbs_g_100g": (0.0, 90.0),
+    "sugars_g_100g": (0.0, 60.0),
+    "fiber_g_100g": (0.0, 40.0),
+    "allulose_g_100g": (0.0, 5.0),
+    "fat_g_100g": (0.0, 90.0),
+    "trans_fat_g_100g": (0.0, 1.0),
+    "sat_fat_g_100g": (0.0, 50.0),
+    "chol_mg_100g": (0.0, 300.0),
+    "protein_g_100g": (0.0, 80.0),
+}
+
+
+def make_ingredients(n: int, seed: int = 0) -> List[Dict]:
+    """n ingredient rows (Ingredient column dicts, without id/sort_key), unique (name, brand)."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        base = rng.choice(_KO_BASES) if rng.random() < 0.7 else rng.choice(_EN_BASES)
+        name = f"{base} {i}"
+        brand = rng.choice(_BRANDS)
+        row = {
+            "name": name,
+            "brand": brand,
+            "display_name": f"{name} | {brand}" if brand else name,
+            "base_g": 100.0,
+            "memo": "라벨 사진" if rng.random() < 0.1 else "",
+        }
+        for col, (lo, hi) in NUTRIENT_RANGES.items():
+            row[col] = round(rng.uniform(lo, hi), 2) if rng.random() < 0.85 else 0.0
+        rows.append(row)
+    return rows
+
+
+def make_recipe(ingredient_ids: List[int], length: int, seed: int = 0) -> List[Tuple[int, float]]:
+    """length (ingredient_id, amount_g) pairs; ids may repeat, as in real recipes."""
+    rng = random.Random(seed)
+    return [(rng.choice(ingredient_ids), round(rng.uniform(0.5, 500.0), 1)) for _ in range(length)]
+
+
+def write_catalog(db, n: int, seed: int = 0, chunk: int = 5000) -> List[int]:
+    """Bulk-insert a synthetic catalog through the app models; returns the ids in insert order."""
+    from sqlalchemy import insert, select
+
+    from app.models import Ingredient, make_sort_key
+
+    rows = make_ingredients(n, seed)
+    for row in rows:
+        row["sort_key"] = make_sort_key(row["display_name"])
+    for start in range(0, len(rows), chunk):
+        db.execute(insert(Ingredient), rows[start:start + chunk])
+    db.commit()
+    return list(db.execute(select(Ingredient.id).order_by(Ingredient.id)).scalars())
+
+
+def write_excel(path: str, n: int, seed: int = 0) -> None:
+    """A seed_from_excel.py input sheet with n synthetic rows."""
+    from openpyxl import Workbook
+
+    from seed_from_excel import COLMAP, EXCEL_SHEET
+
+    headers = list(COLMAP)
+    fields = [COLMAP[h] for h in headers]
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(EXCEL_SHEET)
+    ws.append(headers)
+    for row in make_ingredients(n, seed):
+        ws.append([row.get(f) for f in fields])
+    wb.save(path)
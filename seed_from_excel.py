@@ -1,12 +1,24 @@
 import os
 import math
+import time
 from openpyxl import load_workbook
-from sqlalchemy.orm import Session
-from app.db import Base, engine, SessionLocal
-from app.models import Ingredient
+from sqlalchemy import insert, select, update
+from app.db import SessionLocal, has_unique_index, init_db, engine
+from app.models import ImpactReport, Ingredient, RecipeItem, make_sort_key
+from app.services.catalog import mark_catalog_changed
+from app.services.impact import capture_values, enqueue_impact_analysis, run_impact_job
+from app.services.recipes import recompute_all_recipes
+
+try:
+    import resource  # peak RSS (Unix only)
+except ImportError:
+    resource = None
 
 EXCEL_SHEET = "원재료_DB"
 
+# 한 번에 DB로 보내는 행 수
+SEED_CHUNK_SIZE = int(os.getenv("SEED_CHUNK_SIZE", "1000"))
+
 COLMAP = {
     "원재료 선택명(자동: 원재료|브랜드)": "display_name",
     "원재료명": "name",
@@ -25,6 +37,23 @@ COLMAP = {
     "메모(출처/라벨)": "memo",
 }
 
+NUMERIC_FIELDS = [
+    "base_g",
+    "sodium_mg_100g",
+    "carbs_g_100g",
+    "sugars_g_100g",
+    "fiber_g_100g",
+    "allulose_g_100g",
+    "fat_g_100g",
+    "trans_fat_g_100g",
+    "sat_fat_g_100g",
+    "chol_mg_100g",
+    "protein_g_100g",
+]
+
+# (name, brand) 충돌 시 덮어쓰는 컬럼
+UPDATE_FIELDS = ["display_name", "sort_key", *NUMERIC_FIELDS, "memo"]
+
 def safe_num(v):
     try:
         if v is None:
@@ -35,61 +64,161 @@ def safe_num(v):
     except Exception:
         return 0.0
 
-def main():
-    excel_path = os.getenv("EXCEL_PATH", "영양성분계산기_오터.xlsx")
-    if not os.path.exists(excel_path):
-        raise FileNotFoundError(f"엑셀 파일을 찾을 수 없습니다: {excel_path}")
-
-
-    Base.metadata.create_all(bind=engine)
-
-    wb = load_workbook(excel_path, data_only=True)
-    ws = wb[EXCEL_SHEET]
-
-    headers = [cell.value for cell in ws[1]]
-    idx = {COLMAP[h]: i for i, h in enumerate(headers) if h in COLMAP}
-
-    with SessionLocal() as db:
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            name = str(row[idx["name"]] or "").strip()
-            brand = str(row[idx["brand"]] or "").strip()
+def iter_excel_rows(excel_path):
+    """읽기 전용 모드로 한 행씩 읽어 Ingredient 컬럼 dict로 변환"""
+    wb = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        ws = wb[EXCEL_SHEET]
+        rows = ws.iter_rows(values_only=True)
+        headers = next(rows, ())
+        idx = {COLMAP[h]: i for i, h in enumerate(headers) if h in COLMAP}
+
+        def cell(row, field):
+            i = idx.get(field)
+            return row[i] if i is not None and i < len(row) else None
+
+        for row in rows:
+            name = str(cell(row, "name") or "").strip()
+            brand = str(cell(row, "brand") or "").strip()
             if not name:
                 continue
 
             display_name = (
-                str(row[idx.get("display_name")] or "").strip()
+                str(cell(row, "display_name") or "").strip()
                 if "display_name" in idx
                 else f"{name} | {brand}".strip(" |")
             )
+            memo = cell(row, "memo")
+
+            values = {
+                "name": name,
+                "brand": brand,
+                "display_name": display_name,
+                "sort_key": make_sort_key(display_name),
+                "memo": str(memo).strip() if memo else None,
+            }
+            for field in NUMERIC_FIELDS:
+                values[field] = safe_num(cell(row, field))
+            yield values
+    finally:
+        wb.close()
+
+def _upsert_statement():
+    # (name, brand) 유니크 인덱스를 이용한 DB 자체 upsert
+    # 중복 데이터 때문에 인덱스가 만들어지지 못한 DB면 ON CONFLICT가 실패하므로
+    # 기존 키 조회 결과로 insert/update를 나누는 방식을 쓴다.
+    if not has_unique_index(Ingredient.__tablename__, "uq_ingredients_name_brand"):
+        print("⚠️ (원재료명, 브랜드) 유니크 인덱스가 없어 기존 키 기준 insert/update로 적재합니다.")
+        return None
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return None
+    stmt = dialect_insert(Ingredient)
+    return stmt.on_conflict_do_update(
+        index_elements=["name", "brand"],
+        set_={field: stmt.excluded[field] for field in UPDATE_FIELDS},
+    )
+
+def flush_chunk(db, chunk, existing, upsert):
+    """
+    chunk: {(name, brand): values} — 같은 키가 여러 번 나오면 마지막 행 사용(기존 동작과 동일).
+    existing: {(name, brand): id}, 새로 추가된 행의 id도 채워 넣는다 (다음 청크에 같은 키가 다시 나오면 갱신).
+    """
+    rows = list(chunk.values())
+    new_rows = [r for r in rows if (r["name"], r["brand"]) not in existing]
+
+    if upsert is not None:
+        db.execute(upsert, rows)
+    else:
+        updates = [{"id": existing[(r["name"], r["brand"])], **r} for r in rows if (r["name"], r["brand"]) in existing]
+        if new_rows:
+            db.execute(insert(Ingredient), new_rows)
+        if updates:
+            db.execute(update(Ingredient), updates)
+
+    if new_rows:
+        # 새 키는 existing에 없던 키라, 유니크 인덱스가 없는 DB라도 방금 넣은 행뿐이다
+        keys = {(r["name"], r["brand"]) for r in new_rows}
+        for iid, name, brand in db.execute(
+            select(Ingredient.id, Ingredient.name, Ingredient.brand)
+            .where(Ingredient.name.in_({name for name, _ in keys}))
+        ):
+            if (name, brand or "") in keys:
+                existing[(name, brand or "")] = iid
+    return len(new_rows), len(rows) - len(new_rows)
 
-            ing = (
-                db.query(Ingredient)
-                .filter(Ingredient.name == name, Ingredient.brand == brand)
-                .first()
-            )
-            if not ing:
-                ing = Ingredient(name=name, brand=brand)
-                db.add(ing)
-
-            ing.display_name = display_name
-            ing.base_g = safe_num(row[idx.get("base_g")])
-            ing.sodium_mg_100g = safe_num(row[idx.get("sodium_mg_100g")])
-            ing.carbs_g_100g = safe_num(row[idx.get("carbs_g_100g")])
-            ing.sugars_g_100g = safe_num(row[idx.get("sugars_g_100g")])
-            ing.fiber_g_100g = safe_num(row[idx.get("fiber_g_100g")])
-            ing.allulose_g_100g = safe_num(row[idx.get("allulose_g_100g")])
-            ing.fat_g_100g = safe_num(row[idx.get("fat_g_100g")])
-            ing.trans_fat_g_100g = safe_num(row[idx.get("trans_fat_g_100g")])
-            ing.sat_fat_g_100g = safe_num(row[idx.get("sat_fat_g_100g")])
-            ing.chol_mg_100g = safe_num(row[idx.get("chol_mg_100g")])
-            ing.protein_g_100g = safe_num(row[idx.get("protein_g_100g")])
-
-            memo = row[idx.get("memo")] if "memo" in idx else None
-            ing.memo = str(memo).strip() if memo else None
+def main():
+    excel_path = os.getenv("EXCEL_PATH", "영양성분계산기_오터.xlsx")
+    if not os.path.exists(excel_path):
+        raise FileNotFoundError(f"엑셀 파일을 찾을 수 없습니다: {excel_path}")
+
+    init_db()
 
+    started = time.perf_counter()
+    total_rows = inserted = updated = 0
+    upsert = _upsert_statement()
+
+    with SessionLocal() as db:
+        # 기존 (원재료명, 브랜드) 키는 처음에 한 번만 조회
+        existing = {
+            (name, brand or ""): iid
+            for iid, name, brand in db.execute(select(Ingredient.id, Ingredient.name, Ingredient.brand))
+        }
+        # 저장 레시피에 쓰인 원재료의 적재 전 값 (표시값 변화 분석용)
+        used_before = capture_values(db, db.execute(select(RecipeItem.ingredient_id).distinct()).scalars())
+
+        chunk = {}
+        touched = set()
+        for values in iter_excel_rows(excel_path):
+            total_rows += 1
+            chunk[(values["name"], values["brand"])] = values
+            touched.add((values["name"], values["brand"]))
+            if len(chunk) >= SEED_CHUNK_SIZE:
+                ins, upd = flush_chunk(db, chunk, existing, upsert)
+                inserted, updated = inserted + ins, updated + upd
+                chunk = {}
+        if chunk:
+            ins, upd = flush_chunk(db, chunk, existing, upsert)
+            inserted, updated = inserted + ins, updated + upd
+
+        # 원재료 값이 일괄로 바뀌었으니 저장 레시피 합계는 전체 재계산
+        recipes = recompute_all_recipes(db)
+        # 변경 기록: 엑셀에 있던 행 전부 upsert로 남김 (새 행 id는 적재 후 조회)
+        touched_ids = [
+            iid
+            for iid, name, brand in db.execute(select(Ingredient.id, Ingredient.name, Ingredient.brand))
+            if (name, brand or "") in touched
+        ]
+        mark_catalog_changed(db, upserted=touched_ids)
+        used_after = capture_values(db, used_before)
+        changed = {iid: values for iid, values in used_before.items() if used_after.get(iid) != values}
+        report_id = enqueue_impact_analysis(db, "seed", changed).id if changed else None
         db.commit()
 
-    print("✅ 원재료 DB 초기 적재 완료 (openpyxl 방식)")
+    # 값이 바뀐 원재료를 쓰는 레시피의 표시값(반올림 후) 전후 비교 → /admin/impact-reports
+    impact = None
+    if report_id is not None:
+        run_impact_job(report_id)
+        with SessionLocal() as db:
+            impact = db.get(ImpactReport, report_id)
+
+    elapsed = time.perf_counter() - started
+    rate = total_rows / elapsed if elapsed > 0 else 0.0
+    print("✅ 원재료 DB 초기 적재 완료 (openpyxl 읽기 전용 + 일괄 upsert)")
+    print(f"   행 {total_rows}개 (추가 {inserted}, 갱신 {updated}) / {elapsed:.2f}초 / {rate:,.0f} 행/초")
+    print(f"   저장 레시피 {recipes['recipes']}개 합계 재계산")
+    if impact is not None:
+        print(f"   표시값 변화: 레시피 {impact.recipes_checked}개 중 {impact.labels_changed}개"
+              f" (강조표시 기준 통과/이탈 {impact.thresholds_crossed}개) → /admin/impact-reports/{impact.id}")
+    if resource is not None:
+        # ru_maxrss: Linux는 KB, macOS는 bytes
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_mb = peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+        print(f"   최대 메모리(RSS) {peak_mb:,.1f} MB")
 
 if __name__ == "__main__":
     main()